@@ -6,7 +6,9 @@ so that the core logic can remain free of heavy dependencies.
 
 from __future__ import annotations
 
-from typing import Optional
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import threading
 
 import numpy as np
 
@@ -24,49 +26,230 @@ except Exception:  # pragma: no cover
     Geod = None  # type: ignore
 
 from core.i2g_core import DemSampler
+from core.dem_grid import BilinearDemSampler, GridDemSampler
+
+
+def _meters_per_unit(ds) -> float:
+    """Approximate meters per CRS unit for a rasterio dataset."""
+    try:
+        crs = ds.crs
+        if crs and crs.is_geographic:
+            bounds = ds.bounds
+            lon = (bounds.left + bounds.right) / 2.0
+            lat = (bounds.bottom + bounds.top) / 2.0
+            if Geod is not None:
+                geod = Geod(ellps="WGS84")
+                _, _, dx = geod.inv(lon, lat, lon + 1.0, lat)
+                _, _, dy = geod.inv(lon, lat, lon, lat + 1.0)
+                return (abs(dx) + abs(dy)) / 2.0
+            return 111_320.0  # pragma: no cover - fallback
+    except Exception:  # pragma: no cover - defensive
+        pass
+    return 1.0
 
 
 class RasterioDemSampler(DemSampler):
-    """Sample elevations from a GeoTIFF using rasterio."""
+    """Sample elevations from a GeoTIFF using rasterio.
+
+    Queries go through a lazily opened :class:`TiledDemSampler`, so they are
+    bilinearly interpolated and only the blocks they touch are decoded.
+    """
 
-    def __init__(self, path: str):
+    def __init__(self, path: str, cache_bytes: int = 256 * 1024 * 1024):
         if rasterio is None:
             raise RuntimeError(
                 "rasterio import failed: %s" % (_RASTERIO_ERROR,),
             )
+        self.path = path
         self._ds = rasterio.open(path, "r")
         self._band = 1
         self._nodata = self._ds.nodata
         self._transform = self._ds.transform
-        self.meters_per_unit = 1.0
-        try:
-            crs = self._ds.crs
-            if crs and crs.is_geographic:
-                bounds = self._ds.bounds
-                lon = (bounds.left + bounds.right) / 2.0
-                lat = (bounds.bottom + bounds.top) / 2.0
-                if Geod is not None:
-                    geod = Geod(ellps="WGS84")
-                    _, _, dx = geod.inv(lon, lat, lon + 1.0, lat)
-                    _, _, dy = geod.inv(lon, lat, lon, lat + 1.0)
-                    self.meters_per_unit = (abs(dx) + abs(dy)) / 2.0
-                else:  # pragma: no cover - fallback
-                    self.meters_per_unit = 111_320.0
-        except Exception:  # pragma: no cover - defensive
-            self.meters_per_unit = 1.0
+        self.meters_per_unit = _meters_per_unit(self._ds)
+        self._cache_bytes = int(cache_bytes)
+        self._tiles: Optional[TiledDemSampler] = None
+        self._lock = threading.Lock()
 
     def close(self) -> None:
+        with self._lock:
+            if self._tiles is not None:
+                self._tiles.close()
+                self._tiles = None
         try:
             self._ds.close()
         except Exception:  # pragma: no cover - defensive
             pass
 
+    def sampler(self) -> "TiledDemSampler":
+        """Return the block-cached sampler used for queries."""
+        with self._lock:
+            if self._tiles is None:
+                self._tiles = TiledDemSampler(self.path, cache_bytes=self._cache_bytes,
+                                              band=self._band)
+            return self._tiles
+
     def elevation(self, x: float, y: float) -> Optional[float]:
         """Return elevation at ``(x, y)`` or ``None`` when unavailable."""
-        try:
-            val = next(self._ds.sample([(x, y)]))[0]
-            if val is None or (self._nodata is not None and np.isclose(val, self._nodata)):
-                return None
-            return float(val)
-        except Exception:
-            return None
+        return self.sampler().elevation(x, y)
+
+    def elevations(self, xs, ys) -> np.ndarray:
+        """Return elevations for arrays of coordinates (``NaN`` = unavailable)."""
+        return self.sampler().elevations(xs, ys)
+
+
+class InMemoryDemSampler(GridDemSampler):
+    """Load a GeoTIFF (or a window of it) into memory for fast sampling.
+
+    The band is read once through rasterio and sampled afterwards with
+    vectorized bilinear interpolation, see :class:`core.dem_grid.GridDemSampler`.
+    ``bounds`` (``left, bottom, right, top`` in the raster CRS) restricts the
+    read to a window, padded by one pixel so interpolation at the window
+    edges still has its neighbours.
+    """
+
+    def __init__(self, path: str, bounds=None, band: int = 1):
+        if rasterio is None:
+            raise RuntimeError(
+                "rasterio import failed: %s" % (_RASTERIO_ERROR,),
+            )
+        with rasterio.open(path, "r") as ds:
+            window = None
+            if bounds is not None:
+                window = padded_window(ds, bounds)
+            data = ds.read(band, window=window)
+            transform = ds.window_transform(window) if window is not None else ds.transform
+            super().__init__(data, transform, nodata=ds.nodata,
+                             meters_per_unit=_meters_per_unit(ds))
+        self.path = path
+
+    def close(self) -> None:
+        """Nothing to release; the dataset is closed after loading."""
+
+
+def padded_window(ds, bounds, pad: int = 1):
+    """Return an integer window covering ``bounds`` plus ``pad`` pixels."""
+    from rasterio.windows import Window, from_bounds
+
+    left, bottom, right, top = bounds
+    win = from_bounds(left, bottom, right, top, transform=ds.transform)
+    col0 = max(int(np.floor(win.col_off)) - pad, 0)
+    row0 = max(int(np.floor(win.row_off)) - pad, 0)
+    col1 = min(int(np.ceil(win.col_off + win.width)) + pad, ds.width)
+    row1 = min(int(np.ceil(win.row_off + win.height)) + pad, ds.height)
+    if col1 <= col0 or row1 <= row0:
+        raise ValueError("bounds do not overlap the raster")
+    return Window(col0, row0, col1 - col0, row1 - row0)
+
+
+class TiledDemSampler(BilinearDemSampler):
+    """Stream a large GeoTIFF through a size-bounded LRU cache of blocks.
+
+    Blocks follow the file's native tiling (strip-organised files fall back
+    to 256×256 windows) and are read on demand with windowed reads.  The
+    least recently used blocks are evicted once their total size exceeds
+    ``cache_bytes``.  ``hits`` and ``misses`` count block lookups and are
+    reported together with the current cache size by :meth:`cache_info`.
+
+    Sampling uses the same bilinear interpolation as
+    :class:`core.dem_grid.GridDemSampler`.
+    """
+
+    def __init__(self, path: str, cache_bytes: int = 256 * 1024 * 1024, band: int = 1):
+        if rasterio is None:
+            raise RuntimeError(
+                "rasterio import failed: %s" % (_RASTERIO_ERROR,),
+            )
+        self.path = path
+        self._ds = rasterio.open(path, "r")
+        self._band = band
+        self._nodata = self._ds.nodata
+        super().__init__((self._ds.height, self._ds.width), self._ds.transform,
+                         _meters_per_unit(self._ds))
+        bh, bw = self._ds.block_shapes[band - 1]
+        if bh < 16 or bw < 16:
+            bh = bw = 256
+        self.block_shape = (int(bh), int(bw))
+        self.cache_bytes = int(cache_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._blocks: "OrderedDict[Tuple[int, int], np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        with self._lock:
+            self._blocks.clear()
+            self._bytes = 0
+            try:
+                self._ds.close()
+            except Exception:  # pragma: no cover - defensive
+                pass
+
+    def cache_info(self) -> Dict[str, int]:
+        """Return hit/miss counters and the current cache occupancy."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "blocks": len(self._blocks),
+                "bytes": self._bytes,
+                "max_bytes": self.cache_bytes,
+            }
+
+    def _block(self, bi: int, bj: int) -> np.ndarray:
+        # Called with ``self._lock`` held.
+        key = (bi, bj)
+        blk = self._blocks.get(key)
+        if blk is not None:
+            self._blocks.move_to_end(key)
+            self.hits += 1
+            return blk
+        self.misses += 1
+        from rasterio.windows import Window
+
+        bh, bw = self.block_shape
+        h, w = self.shape
+        row0, col0 = bi * bh, bj * bw
+        win = Window(col0, row0, min(bw, w - col0), min(bh, h - row0))
+        data = self._masked(self._ds.read(self._band, window=win))
+        self._blocks[key] = data
+        self._bytes += data.nbytes
+        while self._bytes > self.cache_bytes and len(self._blocks) > 1:
+            _, old = self._blocks.popitem(last=False)
+            self._bytes -= old.nbytes
+        return data
+
+    def _masked(self, data: np.ndarray) -> np.ndarray:
+        data = data.astype(np.float32)
+        if self._nodata is not None and np.isfinite(self._nodata):
+            data[np.isclose(data, self._nodata)] = np.nan
+        data[~np.isfinite(data)] = np.nan
+        return data
+
+    def read_window(self, row0: int, row1: int, col0: int, col1: int) -> np.ndarray:
+        """Read a pixel rectangle with one windowed read, bypassing the block cache."""
+        from rasterio.windows import Window
+
+        h, w = self.shape
+        row0, row1 = max(int(row0), 0), min(int(row1), h)
+        col0, col1 = max(int(col0), 0), min(int(col1), w)
+        if row1 <= row0 or col1 <= col0:
+            return np.empty((max(row1 - row0, 0), max(col1 - col0, 0)))
+        with self._lock:
+            data = self._ds.read(self._band, window=Window(col0, row0, col1 - col0, row1 - row0))
+        return self._masked(data).astype(float)
+
+    def _gather(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        bh, bw = self.block_shape
+        bi = rows // bh
+        bj = cols // bw
+        n_bj = -(-self.shape[1] // bw)
+        keys = bi * n_bj + bj
+        out = np.empty(rows.shape, dtype=float)
+        with self._lock:
+            for key in np.unique(keys):
+                sel = keys == key
+                i, j = divmod(int(key), n_bj)
+                blk = self._block(i, j)
+                out[sel] = blk[rows[sel] - i * bh, cols[sel] - j * bw]
+        return out
@@ -11,7 +11,7 @@ import uvicorn
 
 from camera_models import save_bundle, load_bundle, list_bundles
 from geom3d import CameraIntrinsics, CameraPose, camera_ray_in_world, intersect_ray_with_plane, intersect_ray_with_dtm, GeoRef
-from dtm import DTM
+from dataset_pool import borrow_dtm
 
 app = FastAPI(title="Image→Ground API")
 
@@ -65,9 +65,8 @@ async def project_pixel(
     # Try DTM if bundle has terrain path
     pt = None
     try:
-        dtm = DTM(mesh_path)
-        pt = intersect_ray_with_dtm(o, d, dtm, GeoRef.from_dict(georef_dict) if georef_dict else None)
-        dtm.close()
+        with borrow_dtm(mesh_path) as dtm:
+            pt = intersect_ray_with_dtm(o, d, dtm, GeoRef.from_dict(georef_dict) if georef_dict else None)
     except Exception:
         pass
     if pt is None:
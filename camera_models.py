@@ -4,11 +4,16 @@
 # IO helpers for camera models and preparation bundles.
 
 from dataclasses import asdict, is_dataclass
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from pathlib import Path
 import json
+import math
+
+import numpy as np
 
 from geom3d import CameraIntrinsics, CameraPose, GeoRef  # noqa: F401 (GeoRef used by others)
+from core.i2g_core import CompiledCamera
+from core.zoom_table import ZoomTable
 
 CALIB_DIR = Path.cwd() / "calibrations"
 CALIB_DIR.mkdir(exist_ok=True)
@@ -40,11 +45,14 @@ def save_bundle(
     yaw_offset_deg: float = 0.0,
     pitch_offset_deg: float = 0.0,
     roll_offset_deg: float = 0.0,
+    zoom_table: Optional[Any] = None,
 ):
     """Persist a calibration bundle to disk.
 
     Orientation offsets are stored alongside other bundle data so that
     subsequent sessions can restore them without relying solely on RAM.
+    ``zoom_table`` (a :class:`core.zoom_table.ZoomTable` or its dict form)
+    stores zoom-dependent intrinsics with the bundle.
     """
     CALIB_DIR.mkdir(exist_ok=True, parents=True)
     data = {
@@ -59,6 +67,8 @@ def save_bundle(
         "pitch_offset_deg": float(pitch_offset_deg),
         "roll_offset_deg": float(roll_offset_deg),
     }
+    if zoom_table is not None:
+        data["zoom_table"] = _obj_to_dict(zoom_table) if not isinstance(zoom_table, dict) else zoom_table
     out = CALIB_DIR / f"{name}.json"
     out.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
     return str(out)
@@ -83,8 +93,38 @@ def load_bundle(name: str):
     meta.setdefault("yaw_offset_deg", float(d.get("yaw_offset_deg", 0.0)))
     meta.setdefault("pitch_offset_deg", float(d.get("pitch_offset_deg", 0.0)))
     meta.setdefault("roll_offset_deg", float(d.get("roll_offset_deg", 0.0)))
+    if d.get("zoom_table"):
+        meta.setdefault("zoom_table", d["zoom_table"])
     georef = d.get("georef", {})
     return intr, pose, terrain_path, meta, georef
 
+def zoom_table_from_meta(meta: Optional[Dict[str, Any]]) -> Optional[ZoomTable]:
+    """Zoom table stored with a bundle (see load_bundle's meta), or None."""
+    d = (meta or {}).get("zoom_table")
+    if not d:
+        return None
+    try:
+        return ZoomTable.from_dict(d)
+    except Exception:
+        return None
+
+def bundle_camera(name: str, ray_map=None):
+    """Compiled camera of a bundle in its georef's projected CRS.
+
+    Returns ``(camera, epsg)``.  The site frame's position and rotation are
+    moved into the projected CRS so cameras from different bundles (sharing
+    an EPSG) can be used together, e.g. for triangulation.
+    """
+    intr, pose, _, _, georef_d = load_bundle(name)
+    georef = GeoRef.from_dict(georef_d or {})
+    if not georef.projected_epsg:
+        raise ValueError(f"bundle {name!r} has no projected EPSG")
+    p = georef.local_to_geographic_array(pose.t_w())[0]
+    a = math.radians(georef.yaw_site_deg); c, s = math.cos(a), math.sin(a)
+    R_site = np.array([[c, -s, 0.0], [s, c, 0.0], [0.0, 0.0, 1.0]])
+    cam = CompiledCamera(intr.width, intr.height, intr.fx, intr.fy, intr.cx, intr.cy,
+                         (p["x"], p["y"], p["alt"]), R_site @ pose.R_wc(), ray_map)
+    return cam, int(georef.projected_epsg)
+
 def list_bundles():
     return [p.stem for p in CALIB_DIR.glob("*.json")]
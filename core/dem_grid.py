@@ -0,0 +1,404 @@
+"""Gridded DEM samplers with vectorized bilinear interpolation.
+
+The samplers in this module hold elevation rasters as NumPy arrays and
+answer scalar and array queries by inverting the raster's affine transform.
+They implement the :class:`core.i2g_core.DemSampler` interface, including the
+optional ``elevations`` batch method used by
+:func:`core.i2g_core.intersect_rays_with_dem`.
+
+Only NumPy is required here; reading rasters from disk is left to adapters
+such as :mod:`adapters.dem_rasterio`.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Iterator, Optional, Sequence, Tuple
+import math
+import sys
+import threading
+import numpy as np
+
+
+def _affine_coeffs(transform: Sequence[float]) -> Tuple[float, float, float, float, float, float]:
+    """Return the ``(a, b, c, d, e, f)`` coefficients of an affine transform.
+
+    Accepts a rasterio/affine ``Affine`` object or any sequence whose first
+    six items follow the same ordering: ``x = a*col + b*row + c`` and
+    ``y = d*col + e*row + f``.
+    """
+
+    if all(hasattr(transform, k) for k in "abcdef"):
+        vals = [getattr(transform, k) for k in "abcdef"]
+    else:
+        vals = list(transform)[:6]
+    a, b, c, d, e, f = (float(v) for v in vals)
+    return a, b, c, d, e, f
+
+
+class BilinearDemSampler:
+    """Base class for rasters sampled with bilinear interpolation.
+
+    Subclasses provide the raster ``shape`` and ``_gather`` which returns the
+    stored values (``NaN`` for nodata) for integer pixel indices.  Sampling
+    works in *center coordinates* where ``(col, row) = (j, i)`` is the center
+    of pixel ``(i, j)``; values between pixel centers are interpolated from
+    the four surrounding pixels.  If any contributing pixel is nodata the
+    result is ``NaN``.
+    """
+
+    meters_per_unit: float = 1.0
+
+    def __init__(self, shape: Tuple[int, int], transform: Sequence[float],
+                 meters_per_unit: float = 1.0) -> None:
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.transform = _affine_coeffs(transform)
+        self.meters_per_unit = float(meters_per_unit)
+        a, b, c, d, e, f = self.transform
+        det = a * e - b * d
+        if abs(det) < 1e-300:
+            raise ValueError("DEM transform is not invertible")
+        # Inverse affine: (x, y) -> (col, row)
+        self._inv = (e / det, -b / det, (b * f - e * c) / det,
+                     -d / det, a / det, (d * c - a * f) / det)
+
+    # ----- to be provided by subclasses -----
+    def _gather(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    # ----- coordinates -----
+    def center_coords(self, xs, ys) -> Tuple[np.ndarray, np.ndarray]:
+        """Map world coordinates to continuous pixel-center coordinates."""
+
+        x = np.asarray(xs, dtype=float)
+        y = np.asarray(ys, dtype=float)
+        ia, ib, ic, id_, ie, if_ = self._inv
+        cols = ia * x + ib * y + ic - 0.5
+        rows = id_ * x + ie * y + if_ - 0.5
+        return cols, rows
+
+    def world_coords(self, cols, rows) -> Tuple[np.ndarray, np.ndarray]:
+        """Inverse of :meth:`center_coords`."""
+
+        a, b, c, d, e, f = self.transform
+        cc = np.asarray(cols, dtype=float) + 0.5
+        rr = np.asarray(rows, dtype=float) + 0.5
+        return a * cc + b * rr + c, d * cc + e * rr + f
+
+    def ray_center_params(self, origin, direction) -> Tuple[float, float, float, float]:
+        """Express a world ray's XY track in center coordinates.
+
+        Returns ``(c0, dc, r0, dr)`` such that the ray at parameter ``t``
+        lies at column ``c0 + dc*t`` and row ``r0 + dr*t``.
+        """
+
+        ia, ib, _, id_, ie, _ = self._inv
+        c0, r0 = self.center_coords(origin[0], origin[1])
+        dc = ia * direction[0] + ib * direction[1]
+        dr = id_ * direction[0] + ie * direction[1]
+        return float(c0), float(dc), float(r0), float(dr)
+
+    def patch_corners(self, i: int, j: int) -> Optional[Tuple[float, float, float, float]]:
+        """Heights of the bilinear patch between pixel centers ``(i, j)`` and ``(i+1, j+1)``.
+
+        The corners are ordered as :func:`ray_patch_root` expects; ``None``
+        is returned when any of them is nodata.
+        """
+
+        z = self._gather(np.array([i, i, i + 1, i + 1]), np.array([j, j + 1, j, j + 1]))
+        if np.isnan(z).any():
+            return None
+        return float(z[0]), float(z[1]), float(z[2]), float(z[3])
+
+    def read_rows(self, row0: int, row1: int) -> np.ndarray:
+        """Return pixel rows ``row0:row1`` as a float array (``NaN`` = nodata)."""
+
+        return self.read_window(row0, row1, 0, self.shape[1])
+
+    def read_window(self, row0: int, row1: int, col0: int, col1: int) -> np.ndarray:
+        """Return pixels ``[row0:row1, col0:col1]`` as a float array (``NaN`` = nodata).
+
+        The bounds are clipped to the raster.  Subclasses that can read a
+        rectangle directly override this; the default gathers it pixel by
+        pixel.
+        """
+
+        h, w = self.shape
+        row0, row1 = max(int(row0), 0), min(int(row1), h)
+        col0, col1 = max(int(col0), 0), min(int(col1), w)
+        if row1 <= row0 or col1 <= col0:
+            return np.empty((max(row1 - row0, 0), max(col1 - col0, 0)))
+        rows, cols = np.mgrid[row0:row1, col0:col1]
+        return self._gather(rows.ravel(), cols.ravel()).reshape(row1 - row0, col1 - col0)
+
+    def max_pyramid(self):
+        """Return the max-elevation pyramid of this DEM, building it once.
+
+        When ``pyramid_path`` is set the pyramid is cached in that file (see
+        :func:`core.dem_pyramid.cache_path`) and reused while
+        ``pyramid_stamp`` still matches.
+        """
+
+        pyr = getattr(self, "_max_pyramid", None)
+        if pyr is None:
+            from core.dem_pyramid import MaxPyramid
+
+            path = getattr(self, "pyramid_path", None)
+            stamp = getattr(self, "pyramid_stamp", "")
+            if path:
+                pyr = MaxPyramid.load_or_build(self, path, stamp)
+            else:
+                pyr = MaxPyramid.build(self)
+            self._max_pyramid = pyr
+        return pyr
+
+    # ----- sampling -----
+    def sample_centers(self, cols, rows) -> np.ndarray:
+        """Bilinearly sample at pixel-center coordinates.
+
+        Points outside the raster extent (more than half a pixel beyond the
+        outermost centers) yield ``NaN``.
+        """
+
+        cc = np.atleast_1d(np.asarray(cols, dtype=float))
+        rr = np.atleast_1d(np.asarray(rows, dtype=float))
+        cc, rr = np.broadcast_arrays(cc, rr)
+        h, w = self.shape
+        out = np.full(cc.shape, np.nan)
+        inside = (
+            np.isfinite(cc) & np.isfinite(rr)
+            & (cc >= -0.5) & (cc <= w - 0.5) & (rr >= -0.5) & (rr <= h - 0.5)
+        )
+        if not inside.any():
+            return out
+
+        c = np.clip(cc[inside], 0.0, w - 1.0)
+        r = np.clip(rr[inside], 0.0, h - 1.0)
+        j0 = np.minimum(np.floor(c).astype(np.intp), max(w - 2, 0))
+        i0 = np.minimum(np.floor(r).astype(np.intp), max(h - 2, 0))
+        j1 = np.minimum(j0 + 1, w - 1)
+        i1 = np.minimum(i0 + 1, h - 1)
+        fx = c - j0
+        fy = r - i0
+
+        vals = (
+            self._gather(i0, j0), self._gather(i0, j1),
+            self._gather(i1, j0), self._gather(i1, j1),
+        )
+        weights = (
+            (1.0 - fx) * (1.0 - fy), fx * (1.0 - fy),
+            (1.0 - fx) * fy, fx * fy,
+        )
+        acc = np.zeros(c.shape)
+        bad = np.zeros(c.shape)
+        for v, wgt in zip(vals, weights):
+            nan = np.isnan(v)
+            acc += np.where(nan, 0.0, v) * wgt
+            bad += np.where(nan, wgt, 0.0)
+        acc[bad > 1e-9] = np.nan
+        out[inside] = acc
+        return out
+
+    def elevations(self, xs, ys) -> np.ndarray:
+        """Return elevations for arrays of projected coordinates.
+
+        Missing data and points outside the raster are reported as ``NaN``.
+        """
+
+        cols, rows = self.center_coords(xs, ys)
+        return self.sample_centers(cols, rows).reshape(np.shape(cols))
+
+    def elevation(self, x: float, y: float) -> Optional[float]:
+        """Return elevation at ``(x, y)`` or ``None`` when unavailable."""
+
+        val = float(self.elevations(x, y))
+        return val if math.isfinite(val) else None
+
+    # Alias matching :meth:`dtm.DTM.sample`
+    sample = elevation
+
+
+class GridDemSampler(BilinearDemSampler):
+    """DEM fully held in memory as a 2D NumPy array.
+
+    Parameters
+    ----------
+    array:
+        Elevation values of shape ``(rows, cols)``.
+    transform:
+        Affine transform of the array's top-left corner (see
+        :func:`_affine_coeffs`).  For a window of a larger raster pass the
+        window transform.
+    nodata:
+        Optional nodata value to mask.  Non-finite values are always masked.
+    meters_per_unit:
+        Size of one CRS unit in meters (``1.0`` for projected rasters).
+    """
+
+    def __init__(self, array: np.ndarray, transform: Sequence[float],
+                 nodata: Optional[float] = None, meters_per_unit: float = 1.0) -> None:
+        arr = np.asarray(array)
+        if arr.ndim != 2:
+            raise ValueError("DEM array must be two-dimensional")
+        dtype = np.float64 if arr.dtype == np.float64 else np.float32
+        arr = arr.astype(dtype, copy=True)
+        if nodata is not None and math.isfinite(float(nodata)):
+            arr[np.isclose(arr, nodata)] = np.nan
+        arr[~np.isfinite(arr)] = np.nan
+        super().__init__(arr.shape, transform, meters_per_unit)
+        self.array = arr
+
+    def _gather(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        return self.array[rows, cols].astype(float)
+
+    def read_rows(self, row0: int, row1: int) -> np.ndarray:
+        return self.array[max(int(row0), 0):int(row1)].astype(float)
+
+    def read_window(self, row0: int, row1: int, col0: int, col1: int) -> np.ndarray:
+        return self.array[max(int(row0), 0):int(row1), max(int(col0), 0):int(col1)].astype(float)
+
+
+def read_window(dem: BilinearDemSampler, x: float, y: float,
+                radius: float) -> Tuple[GridDemSampler, Tuple[int, int]]:
+    """Load the part of ``dem`` within ``radius`` (CRS units) of ``(x, y)``.
+
+    Returns an in-memory :class:`GridDemSampler` for the window and the
+    window's ``(row0, col0)`` offset in ``dem``.
+    """
+
+    h, w = dem.shape
+    cc, rr = dem.center_coords(x + radius * np.array([-1.0, 1.0, 1.0, -1.0]),
+                               y + radius * np.array([-1.0, -1.0, 1.0, 1.0]))
+    row0 = int(np.clip(math.floor(rr.min()), 0, h))
+    row1 = int(np.clip(math.ceil(rr.max()) + 2, 0, h))
+    col0 = int(np.clip(math.floor(cc.min()), 0, w))
+    col1 = int(np.clip(math.ceil(cc.max()) + 2, 0, w))
+    if row1 - row0 < 2 or col1 - col0 < 2:
+        raise ValueError("point is outside the DEM")
+    a, b, c, d, e, f = dem.transform
+    transform = (a, b, a * col0 + b * row0 + c, d, e, d * col0 + e * row0 + f)
+    array = dem.read_window(row0, row1, col0, col1)
+    return GridDemSampler(array, transform, meters_per_unit=dem.meters_per_unit), (row0, col0)
+
+
+# Guards the resource tracker while _attach_untracked suspends registration
+_tracker_lock = threading.Lock()
+
+
+@contextmanager
+def shared_grid(grid: GridDemSampler) -> Iterator[Tuple]:
+    """Copy ``grid`` into shared memory for the duration of the block.
+
+    Yields a small picklable handle for :func:`attach_shared_grid`, so
+    process pool workers map the window instead of each receiving a pickled
+    copy of the array.  The shared block is released on exit.
+    """
+
+    arr = grid.array
+    with _tracker_lock:
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    try:
+        view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+        view[...] = arr
+        del view
+        yield (shm.name, arr.shape, arr.dtype.str, grid.transform, grid.meters_per_unit)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _attach_untracked(name: str) -> shared_memory.SharedMemory:
+    """Open an existing shared block without registering it with the resource tracker.
+
+    Only :func:`shared_grid` unlinks the block.  Before Python 3.13 attaching
+    registers it as if the attaching process owned it, so a worker with its
+    own tracker warns about a leak, or unlinks the block, when it exits;
+    unregistering afterwards instead breaks the creator's own unlink when the
+    tracker is shared.
+    """
+
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    tracker = shared_memory.resource_tracker
+    with _tracker_lock:
+        register = tracker.register
+        tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            tracker.register = register
+
+
+def attach_shared_grid(handle: Tuple) -> GridDemSampler:
+    """Map a window published by :func:`shared_grid` without copying it."""
+
+    name, shape, dtype, transform, meters_per_unit = handle
+    shm = _attach_untracked(name)
+    grid = GridDemSampler.__new__(GridDemSampler)
+    BilinearDemSampler.__init__(grid, shape, transform, meters_per_unit)
+    # The published array is already masked; keep the mapping alive with it
+    grid.array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    grid._shm = shm
+    return grid
+
+
+def slab_interval(c0: float, dc: float, lo: float, hi: float) -> Tuple[float, float]:
+    """Parameter interval during which ``c0 + dc*t`` is inside ``[lo, hi]``."""
+
+    if dc == 0.0:
+        return (-math.inf, math.inf) if lo <= c0 <= hi else (math.inf, -math.inf)
+    ta, tb = (lo - c0) / dc, (hi - c0) / dc
+    return (ta, tb) if ta <= tb else (tb, ta)
+
+
+def ray_patch_root(corners: Tuple[float, float, float, float],
+                   u0: float, du: float, v0: float, dv: float,
+                   z0: float, dz: float, t0: float, t1: float) -> Optional[float]:
+    """Smallest ``t`` in ``[t0, t1]`` where a ray meets a bilinear patch.
+
+    The patch spans local coordinates ``u, v`` in ``[0, 1]`` with corner
+    heights ``(z00, z01, z10, z11)`` ordered as ``(v=0,u=0)``, ``(v=0,u=1)``,
+    ``(v=1,u=0)``, ``(v=1,u=1)``.  Along the ray ``u = u0 + du*t``,
+    ``v = v0 + dv*t`` and height ``z = z0 + dz*t``.  The height difference
+    between ray and patch is quadratic in ``t`` and solved analytically.
+    ``None`` is returned when the ray does not meet the patch in the range.
+    """
+
+    z00, z01, z10, z11 = corners
+    a = z01 - z00
+    b = z10 - z00
+    k = z00 - z01 - z10 + z11
+    c2 = -k * du * dv
+    c1 = dz - a * du - b * dv - k * (u0 * dv + v0 * du)
+    c0 = z0 - z00 - a * u0 - b * v0 - k * u0 * v0
+
+    # Solve around the segment start to keep the coefficients well scaled.
+    s1 = c1 + 2.0 * c2 * t0
+    s0 = c0 + c1 * t0 + c2 * t0 * t0
+    span = t1 - t0
+    tol = 1e-9 * max(1.0, abs(span))
+    if s0 == 0.0:
+        return t0
+    roots = []
+    if abs(c2) * max(span, 1.0) ** 2 <= 1e-12 * (abs(s1) * max(span, 1.0) + abs(s0)):
+        if s1 != 0.0:
+            roots.append(-s0 / s1)
+    else:
+        disc = s1 * s1 - 4.0 * c2 * s0
+        if disc >= 0.0:
+            sq = math.sqrt(disc)
+            # Numerically stable quadratic roots
+            q = -0.5 * (s1 + math.copysign(sq, s1))
+            if q != 0.0:
+                roots.append(q / c2)
+                roots.append(s0 / q)
+            else:
+                roots.append(0.0)
+    best = None
+    for r in roots:
+        if -tol <= r <= span + tol and (best is None or r < best):
+            best = r
+    if best is None:
+        return None
+    return t0 + min(max(best, 0.0), span)
@@ -0,0 +1,259 @@
+"""Hierarchical max-elevation pyramid for ray–terrain traversal.
+
+The DEM surface between four neighbouring pixel centers is a bilinear patch
+whose maximum lies on one of its corners.  A :class:`MaxPyramid` stores, for
+blocks of ``2**k × 2**k`` such patches, the highest corner inside the block.
+:func:`intersect_ray_with_pyramid` walks a ray through this quadtree: whole
+blocks are skipped while the ray stays above their maximum and the walk
+descends only where a crossing is possible.  At the finest level the ray is
+intersected analytically with each candidate patch, so hits are exact and
+thin ridges cannot be stepped over.
+
+Pyramids of DTM files are kept in the application cache (see
+:func:`cache_path`), trimmed to :data:`MAX_CACHE_BYTES` least recently used
+first.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+import hashlib
+import math
+import numpy as np
+
+from core import filecache
+from core.dem_grid import BilinearDemSampler, ray_patch_root, slab_interval
+
+# Rows of level-1 cells processed per strip while building from a sampler.
+_BUILD_STRIP = 128
+
+# Size budget of the pyramid cache
+MAX_CACHE_BYTES = 512 * 1024 ** 2
+
+
+def _block_max(a: np.ndarray) -> np.ndarray:
+    """Max over non-overlapping 2×2 blocks, padding odd edges with ``-inf``."""
+
+    h, w = a.shape
+    ph, pw = h + (h % 2), w + (w % 2)
+    if (ph, pw) != (h, w):
+        padded = np.full((ph, pw), -np.inf, dtype=a.dtype)
+        padded[:h, :w] = a
+        a = padded
+    return a.reshape(ph // 2, 2, pw // 2, 2).max(axis=(1, 3))
+
+
+class MaxPyramid:
+    """Max-elevation mip pyramid over the bilinear patches of a DEM.
+
+    ``levels[k - 1]`` holds level ``k``: entry ``(I, J)`` is the highest
+    elevation of all patches ``(i, j)`` with ``i >> k == I`` and
+    ``j >> k == J``.  Blocks containing nodata corners only count their
+    complete patches; all-nodata blocks are ``-inf``.  Level 0 (single
+    patches) is not stored – it is read from the DEM on demand.
+    """
+
+    def __init__(self, levels: List[np.ndarray], shape: Tuple[int, int]) -> None:
+        self.levels = levels
+        self.shape = (int(shape[0]), int(shape[1]))
+
+    @property
+    def top(self) -> int:
+        return len(self.levels)
+
+    # ----- construction -----
+    @classmethod
+    def build(cls, dem: BilinearDemSampler) -> "MaxPyramid":
+        """Build the pyramid by streaming the DEM in row strips."""
+
+        h, w = dem.shape
+        if h < 2 or w < 2:
+            raise ValueError("DEM must be at least 2x2 pixels")
+        ph, pw = h - 1, w - 1  # patch grid
+        n1 = (-(-ph // 2), -(-pw // 2))
+        level1 = np.empty(n1, dtype=np.float32)
+        for I0 in range(0, n1[0], _BUILD_STRIP):
+            I1 = min(I0 + _BUILD_STRIP, n1[0])
+            rows = dem.read_rows(2 * I0, min(2 * I1 + 1, h))
+            bad = np.isnan(rows)
+            vals = np.where(bad, -np.inf, rows)
+            # Patch maxima; patches with a nodata corner cannot be hit
+            pm = np.maximum(np.maximum(vals[:-1, :-1], vals[:-1, 1:]),
+                            np.maximum(vals[1:, :-1], vals[1:, 1:]))
+            pbad = bad[:-1, :-1] | bad[:-1, 1:] | bad[1:, :-1] | bad[1:, 1:]
+            pm[pbad] = -np.inf
+            level1[I0:I1] = _block_max(pm)[: I1 - I0]
+        levels = [level1]
+        while levels[-1].shape[0] > 1 or levels[-1].shape[1] > 1:
+            levels.append(_block_max(levels[-1]))
+        return cls(levels, (h, w))
+
+    # ----- persistence -----
+    def save(self, path, stamp: str = "") -> None:
+        """Write the pyramid to ``path`` (a file name or a binary file)."""
+
+        if not hasattr(path, "write"):
+            with open(path, "wb") as f:
+                return self.save(f, stamp)
+        arrays = {f"level{k + 1}": lvl for k, lvl in enumerate(self.levels)}
+        np.savez(path, shape=np.array(self.shape), stamp=np.array(stamp), **arrays)
+
+    @classmethod
+    def load(cls, path, stamp: Optional[str] = None) -> Optional["MaxPyramid"]:
+        """Load a saved pyramid, or ``None`` if missing, stale or unreadable."""
+
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                if stamp is not None and str(z["stamp"]) != stamp:
+                    return None
+                n = sum(1 for k in z.files if k.startswith("level"))
+                levels = [z[f"level{k + 1}"] for k in range(n)]
+                return cls(levels, tuple(z["shape"]))
+        except Exception:
+            return None
+
+    @classmethod
+    def load_or_build(cls, dem: BilinearDemSampler, path, stamp: str = "") -> "MaxPyramid":
+        """Reuse the file at ``path`` when valid, otherwise rebuild it.
+
+        A rebuilt pyramid is written atomically; when ``path`` is in a cache
+        directory (see :func:`cache_path`) that directory is trimmed after.
+        """
+
+        path = Path(path)
+        pyr = cls.load(path, stamp) if path.exists() else None
+        if pyr is not None and pyr.shape == tuple(dem.shape):
+            filecache.touch(path)
+            return pyr
+        pyr = cls.build(dem)
+        try:
+            filecache.atomic_write(path, lambda f: pyr.save(f, stamp))
+            prune_cache(path.parent, keep=path)
+        except OSError:
+            pass
+        return pyr
+
+
+def default_cache_dir() -> Path:
+    """``pyramids`` under :func:`core.filecache.cache_root`."""
+
+    return filecache.cache_root() / "pyramids"
+
+
+def cache_path(key: str, cache_dir: Optional[Union[str, Path]] = None) -> Path:
+    """File in the pyramid cache for ``key``, e.g. a DEM's path and band.
+
+    Pass the DEM's version as the ``stamp`` of :meth:`MaxPyramid.load_or_build`
+    so a rewritten DEM replaces its pyramid instead of adding another.
+    """
+
+    cache = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+    return cache / f"maxpyr_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]}.npz"
+
+
+def prune_cache(cache_dir: Optional[Union[str, Path]] = None, max_bytes: Optional[int] = None,
+                keep: Optional[Path] = None) -> int:
+    """Delete least recently used pyramids until the cache fits ``max_bytes``.
+
+    ``keep`` is never deleted.  Returns the number of files removed.
+    """
+
+    cache = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+    budget = MAX_CACHE_BYTES if max_bytes is None else int(max_bytes)
+    return filecache.prune(cache, budget, "maxpyr_*.npz", keep=keep)[0]
+
+
+def _exit_param(c0: float, dc: float, lo: float, hi: float) -> float:
+    """Parameter at which ``c0 + dc*t`` leaves ``[lo, hi]`` going forward."""
+
+    if dc > 0.0:
+        return (hi - c0) / dc
+    if dc < 0.0:
+        return (lo - c0) / dc
+    return math.inf
+
+
+def intersect_ray_with_pyramid(
+    ray_origin: np.ndarray,
+    ray_dir: np.ndarray,
+    dem: BilinearDemSampler,
+    pyramid: Optional[MaxPyramid] = None,
+    max_range_m: float = 5000.0,
+) -> Optional[Tuple[float, float, float]]:
+    """Intersect a ray with a gridded DEM using a max-elevation pyramid.
+
+    Parameters
+    ----------
+    ray_origin, ray_dir:
+        Ray in the DEM's CRS.  The direction is normalized internally.
+    dem:
+        A :class:`core.dem_grid.BilinearDemSampler`.
+    pyramid:
+        Pyramid built for ``dem``; ``dem.max_pyramid()`` is used when omitted.
+    max_range_m:
+        Search range along the ray in meters.
+
+    Returns
+    -------
+    tuple or None
+        ``(x, y, z)`` of the first crossing of the bilinear DEM surface, or
+        ``None`` when the ray misses within range.
+    """
+
+    o = np.asarray(ray_origin, dtype=float)
+    d = np.asarray(ray_dir, dtype=float)
+    d = d / np.linalg.norm(d)
+    if pyramid is None:
+        pyramid = dem.max_pyramid()
+    max_range = max_range_m / getattr(dem, "meters_per_unit", 1.0)
+
+    h, w = dem.shape
+    c0, dc, r0, dr = dem.ray_center_params(o, d)
+    z0, dz = float(o[2]), float(d[2])
+    tc = slab_interval(c0, dc, 0.0, w - 1.0)
+    tr = slab_interval(r0, dr, 0.0, h - 1.0)
+    t = max(0.0, tc[0], tr[0])
+    t_end = min(max_range, tc[1], tr[1])
+    if t > t_end:
+        return None
+
+    eps = 1e-9 * max(1.0, max_range)
+    top = pyramid.top
+    while t <= t_end:
+        # Patch containing the ray just after ``t``
+        te = min(t + eps, t_end)
+        j = min(max(int(math.floor(c0 + dc * te)), 0), w - 2)
+        i = min(max(int(math.floor(r0 + dr * te)), 0), h - 2)
+        t_next = None
+        for k in range(top, -1, -1):
+            size = 1 << k
+            J, I = j >> k, i >> k
+            t_out = min(
+                _exit_param(c0, dc, J * size, min((J + 1) * size, w - 1)),
+                _exit_param(r0, dr, I * size, min((I + 1) * size, h - 1)),
+                t_end,
+            )
+            if k > 0:
+                cell_max = float(pyramid.levels[k - 1][I, J])
+                if min(z0 + dz * t, z0 + dz * t_out) > cell_max:
+                    t_next = t_out
+                    break
+                continue
+            corners = dem.patch_corners(i, j)
+            if corners is not None:
+                hit = ray_patch_root(
+                    corners,
+                    c0 - j, dc, r0 - i, dr, z0, dz, t, t_out,
+                )
+                if hit is not None:
+                    x, y = o[0] + d[0] * hit, o[1] + d[1] * hit
+                    z = dem.elevation(float(x), float(y))
+                    if z is None:
+                        z = z0 + dz * hit
+                    return float(x), float(y), float(z)
+            t_next = t_out
+        if t_next is None or t_next >= t_end:
+            break
+        t = max(t_next, t + eps)
+    return None
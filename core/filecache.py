@@ -0,0 +1,113 @@
+"""Size-bounded directories of cached files, evicted least recently used first.
+
+Derived data such as map tiles, lens ray maps and viewsheds is kept in plain
+files.  Writes go through a temporary file and a rename so readers never see
+a partial file, a cache hit touches the file's mtime, and :func:`prune`
+deletes the files with the oldest mtime until the directory fits its byte
+budget.  Failing to write is left to the caller, which usually ignores it so
+a read-only cache only costs speed.
+
+All caches live in subdirectories of :func:`cache_root`, which is resolved on
+every call so the application, the API server and the tests agree on it.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import BinaryIO, Callable, List, Optional, Tuple, Union
+import os
+import threading
+
+PathLike = Union[str, Path]
+
+_root: Optional[Path] = None
+
+
+def cache_root() -> Path:
+    """Directory holding the application's caches (``./cache`` unless set)."""
+
+    return _root if _root is not None else Path.cwd() / "cache"
+
+
+def set_cache_root(path: Optional[PathLike]) -> None:
+    """Move every default cache under ``path``; ``None`` restores ``./cache``."""
+
+    global _root
+    _root = Path(path) if path is not None else None
+
+
+def touch(path: PathLike) -> None:
+    """Mark ``path`` as recently used; errors are ignored."""
+
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def atomic_write(path: PathLike, write: Callable[[BinaryIO], None]) -> int:
+    """Create ``path`` through ``write(file)`` on a temporary file and a rename.
+
+    Missing parent directories are created.  Returns the size of the new
+    file; raises :class:`OSError` (leaving no temporary file) on failure.
+    """
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            write(f)
+        size = tmp.stat().st_size
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        raise
+    return size
+
+
+def scan(root: PathLike, pattern: str = "*", recursive: bool = False) -> List[Tuple[int, Path, int]]:
+    """``(mtime_ns, path, size)`` of the files in ``root`` matching ``pattern``."""
+
+    root = Path(root)
+    out = []
+    if not root.is_dir():
+        return out
+    for p in (root.rglob(pattern) if recursive else root.glob(pattern)):
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        out.append((st.st_mtime_ns, p, st.st_size))
+    return out
+
+
+def prune(root: PathLike, max_bytes: int, pattern: str = "*", keep: Optional[Path] = None,
+          recursive: bool = False,
+          on_remove: Optional[Callable[[Path], None]] = None) -> Tuple[int, int]:
+    """Delete least recently used files until those matching fit ``max_bytes``.
+
+    ``keep`` is never deleted and ``on_remove`` is called for every deleted
+    file.  Returns ``(files_removed, bytes_freed)``.
+    """
+
+    files = sorted(scan(root, pattern, recursive))
+    total = sum(size for _, _, size in files)
+    removed = freed = 0
+    for _, p, size in files:
+        if total - freed <= max_bytes:
+            break
+        if keep is not None and p == keep:
+            continue
+        try:
+            p.unlink()
+        except OSError:
+            continue
+        freed += size
+        removed += 1
+        if on_remove is not None:
+            on_remove(p)
+    return removed, freed
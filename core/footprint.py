@@ -0,0 +1,149 @@
+"""Ground footprint of a camera's field of view.
+
+:func:`compute_footprint` samples the image border densely, casts all border
+rays against the DEM in one batch and returns the ground polygon.  Border
+rays that do not reach the terrain within range – above the horizon or
+looking past the DEM – are clipped at the skyline of a matching
+:class:`core.viewshed.Viewshed` when one is given, otherwise at the range
+limit along their azimuth, so the polygon stays closed and marks where the
+view is cut off.
+
+:func:`compute_footprints` does the same for several cameras in a single
+batched intersection.  Live footprints are computed together with the
+pose's ground LUT, see :class:`core.ground_lut.GroundLUTService`.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+import numpy as np
+
+from core.i2g_core import (
+    DemSampler,
+    Extrinsics,
+    Intrinsics,
+    PTZ,
+    _sample_elevations,
+    compile_camera,
+    intersect_rays_with_dem,
+)
+
+
+@dataclass
+class Footprint:
+    """Ground polygon of a camera view.
+
+    ``polygon`` is an ``(M, 3)`` array of border points in order (top edge
+    left→right, right edge, bottom edge right→left, left edge) and
+    ``clipped`` marks vertices whose ray missed the DEM and were placed on
+    the skyline or at the range limit.  ``uv`` holds the corresponding image
+    coordinates.
+    """
+
+    polygon: np.ndarray
+    clipped: np.ndarray
+    uv: np.ndarray
+
+    @property
+    def is_empty(self) -> bool:
+        return self.polygon.size == 0 or bool(self.clipped.all())
+
+    def ground_only(self) -> np.ndarray:
+        """Vertices that actually hit the terrain."""
+
+        return self.polygon[~self.clipped]
+
+
+def border_pixels(width: int, height: int, samples_per_edge: int = 32) -> np.ndarray:
+    """Pixel coordinates ``(K, 2)`` walking the image border clockwise."""
+
+    n = max(int(samples_per_edge), 1)
+    w, h = float(width - 1), float(height - 1)
+    t = np.linspace(0.0, 1.0, n, endpoint=False)
+    top = np.column_stack([t * w, np.zeros(n)])
+    right = np.column_stack([np.full(n, w), t * h])
+    bottom = np.column_stack([w - t * w, np.full(n, h)])
+    left = np.column_stack([np.zeros(n), h - t * h])
+    return np.vstack([top, right, bottom, left])
+
+
+def compute_footprints(
+    cameras: Sequence[Tuple],
+    dem: DemSampler,
+    samples_per_edge: int = 32,
+    max_range_m: float = 5000.0,
+    step_m: float = 20.0,
+) -> List[Footprint]:
+    """Footprints of several cameras with one batched DEM intersection.
+
+    Each camera is ``(intr, ptz, extr[, ray_map[, viewshed]])``: the
+    optional ``ray_map`` is that camera's lens undistortion map (see
+    :mod:`core.undistort`) and ``viewshed`` a :class:`core.viewshed.Viewshed`
+    whose skyline clips the camera's missed rays.
+    """
+
+    origins, dirs, uvs, sizes, viewsheds = [], [], [], [], []
+    for cam in cameras:
+        intr, ptz, extr = cam[:3]
+        ray_map = cam[3] if len(cam) > 3 else None
+        viewsheds.append(cam[4] if len(cam) > 4 else None)
+        uv = border_pixels(int(intr.width), int(intr.height), samples_per_edge)
+        o, d = compile_camera(intr, ptz, extr, ray_map).rays(uv[:, 0], uv[:, 1])
+        origins.append(o); dirs.append(d); uvs.append(uv); sizes.append(len(uv))
+    if not sizes:
+        return []
+    o = np.vstack(origins)
+    d = np.vstack(dirs)
+    hits = intersect_rays_with_dem(o, d, dem, max_range_m=max_range_m, step_m=step_m)
+
+    clipped = np.isnan(hits[:, 0])
+    if clipped.any():
+        # Place misses on the skyline, or at the range limit, along the
+        # ray's azimuth
+        max_range = max_range_m / getattr(dem, "meters_per_unit", 1.0)
+        dxy = d[:, :2]
+        n = np.linalg.norm(dxy, axis=1)
+        n[n < 1e-12] = 1.0
+        radius = np.full(len(d), max_range)
+        on_sky = np.zeros(len(d), dtype=bool)
+        camera = np.repeat(np.arange(len(sizes)), sizes)
+        for c, vs in enumerate(viewsheds):
+            sel = np.flatnonzero(clipped & (camera == c))
+            if vs is None or not sel.size or not vs.matches(o[sel[0]]):
+                continue
+            sky = vs.skyline_distance(dxy[sel, 0], dxy[sel, 1])
+            ok = np.isfinite(sky)
+            radius[sel[ok]] = np.minimum(sky[ok], max_range)
+            on_sky[sel[ok]] = True
+        far = o.copy()
+        far[:, :2] += dxy / n[:, None] * radius[:, None]
+        if on_sky.any():
+            z = _sample_elevations(dem, far[on_sky, 0], far[on_sky, 1])
+            far[on_sky, 2] = np.where(np.isfinite(z), z, far[on_sky, 2])
+        hits[clipped] = far[clipped]
+
+    out = []
+    start = 0
+    for uv, k in zip(uvs, sizes):
+        sl = slice(start, start + k)
+        out.append(Footprint(hits[sl], clipped[sl], uv))
+        start += k
+    return out
+
+
+def compute_footprint(
+    intr: Intrinsics,
+    ptz: PTZ,
+    extr: Extrinsics,
+    dem: DemSampler,
+    samples_per_edge: int = 32,
+    max_range_m: float = 5000.0,
+    step_m: float = 20.0,
+    viewshed=None,
+    ray_map=None,
+) -> Footprint:
+    """Ground footprint of one camera (see :func:`compute_footprints`)."""
+
+    return compute_footprints([(intr, ptz, extr, ray_map, viewshed)], dem, samples_per_edge,
+                              max_range_m, step_m)[0]
@@ -0,0 +1,299 @@
+"""Precomputed pixel→ground lookup tables for a fixed camera pose.
+
+For a given pan/tilt/zoom the ground point seen by every pixel is fixed, so
+instead of casting and marching a ray per click a :class:`GroundLUT` casts
+one batch of rays on a sparse pixel grid (every ``spacing_px`` pixels) and
+answers arbitrary pixels by bilinear interpolation of the four surrounding
+grid hits.  Cells whose corners missed the DEM or straddle a range
+discontinuity (ridge lines, horizon) are left to an exact per-pixel cast.
+
+:class:`GroundLUTService` keeps one LUT for the current pose and rebuilds it
+in a background thread whenever the pose moves beyond a tolerance; the same
+thread computes the pose's ground footprint (:mod:`core.footprint`).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import threading
+import numpy as np
+
+from core.footprint import compute_footprint
+from core.i2g_core import (
+    DemSampler,
+    Extrinsics,
+    Intrinsics,
+    PTZ,
+    compile_camera,
+    intersect_ray_with_dem,
+    intersect_rays_with_dem,
+)
+
+
+@dataclass(frozen=True)
+class PoseTolerance:
+    """Largest pose change for which a LUT is still considered valid."""
+
+    pan_deg: float = 0.02
+    tilt_deg: float = 0.02
+    zoom: float = 1e-3
+
+    def same_ptz(self, a: PTZ, b: PTZ) -> bool:
+        """Whether two PTZ readings are equal within this tolerance."""
+
+        return (
+            _pan_close(a.pan, b.pan, self.pan_deg)
+            and _close(a.tilt, b.tilt, self.tilt_deg)
+            and _close(a.zoom, b.zoom, self.zoom)
+        )
+
+
+def _close(a: Optional[float], b: Optional[float], tol: float) -> bool:
+    if a is None or b is None:
+        return a is None and b is None
+    return abs(float(a) - float(b)) <= tol
+
+
+def _pan_close(a: Optional[float], b: Optional[float], tol: float) -> bool:
+    if a is None or b is None:
+        return a is None and b is None
+    d = (float(a) - float(b) + 180.0) % 360.0 - 180.0
+    return abs(d) <= tol
+
+
+class GroundLUT:
+    """Sparse pixel→ground grid for one camera pose.
+
+    Parameters
+    ----------
+    intr, ptz, extr:
+        Camera model, as passed to :func:`core.i2g_core.compile_camera`.
+    dem:
+        DEM sampler used for the ray intersections.
+    spacing_px:
+        Grid spacing in pixels.  The last row/column always lies on the
+        image border.
+    max_range_m:
+        Search range along each ray.
+    max_range_jump:
+        Cells whose corner ranges differ by more than this fraction of their
+        mean range are not interpolated.
+    ray_map:
+        Optional lens undistortion map (see :mod:`core.undistort`).
+    """
+
+    def __init__(self, intr: Intrinsics, ptz: PTZ, extr: Extrinsics, dem: DemSampler,
+                 spacing_px: int = 16, max_range_m: float = 5000.0,
+                 max_range_jump: float = 0.25, ray_map: Optional[np.ndarray] = None) -> None:
+        self.intr = intr
+        self.ray_map = ray_map
+        self.ptz = PTZ(ptz.pan, ptz.tilt, ptz.zoom)
+        self.extr = extr
+        self.dem = dem
+        self.max_range_m = float(max_range_m)
+        self.max_range_jump = float(max_range_jump)
+        self.us = self._axis(int(intr.width), spacing_px)
+        self.vs = self._axis(int(intr.height), spacing_px)
+
+        uu, vv = np.meshgrid(self.us, self.vs)
+        self.camera = compile_camera(intr, self.ptz, extr, ray_map)
+        origins, dirs = self.camera.rays(uu.ravel(), vv.ravel())
+        hits = intersect_rays_with_dem(origins, dirs, dem, max_range_m=max_range_m)
+        self.points = hits.reshape(len(self.vs), len(self.us), 3)
+        cam = np.array([extr.x, extr.y, extr.z], dtype=float)
+        self.ranges = np.linalg.norm(self.points - cam, axis=-1)
+        # Filled in by GroundLUTService when it builds the LUT
+        self.footprint = None
+
+    @staticmethod
+    def _axis(n: int, spacing: int) -> np.ndarray:
+        spacing = max(int(spacing), 1)
+        ax = np.arange(0, max(n - 1, 0) + 1, spacing, dtype=float)
+        if ax[-1] < n - 1:
+            ax = np.append(ax, float(n - 1))
+        return ax
+
+    def matches(self, intr: Intrinsics, ptz: PTZ, extr: Extrinsics,
+                tol: PoseTolerance = PoseTolerance()) -> bool:
+        """Whether this LUT is valid for the given camera model."""
+
+        return intr == self.intr and extr == self.extr and tol.same_ptz(ptz, self.ptz)
+
+    def lookup(self, us, vs) -> np.ndarray:
+        """Interpolate ground points for pixel arrays.
+
+        Returns an ``(..., 3)`` array; entries that cannot be interpolated
+        reliably (outside the image, missed corners, range discontinuities)
+        are ``NaN``.
+        """
+
+        u = np.asarray(us, dtype=float)
+        v = np.asarray(vs, dtype=float)
+        u, v = np.broadcast_arrays(u, v)
+        shape = u.shape
+        u = u.ravel(); v = v.ravel()
+        out = np.full((u.size, 3), np.nan)
+        inside = (u >= self.us[0]) & (u <= self.us[-1]) & (v >= self.vs[0]) & (v <= self.vs[-1])
+        if not inside.any():
+            return out.reshape(shape + (3,))
+
+        ui, vi = u[inside], v[inside]
+        j = np.clip(np.searchsorted(self.us, ui, side="right") - 1, 0, len(self.us) - 2)
+        i = np.clip(np.searchsorted(self.vs, vi, side="right") - 1, 0, len(self.vs) - 2)
+        fx = ((ui - self.us[j]) / (self.us[j + 1] - self.us[j]))[:, None]
+        fy = ((vi - self.vs[i]) / (self.vs[i + 1] - self.vs[i]))[:, None]
+        p00 = self.points[i, j]; p01 = self.points[i, j + 1]
+        p10 = self.points[i + 1, j]; p11 = self.points[i + 1, j + 1]
+        res = (p00 * (1 - fx) * (1 - fy) + p01 * fx * (1 - fy)
+               + p10 * (1 - fx) * fy + p11 * fx * fy)
+
+        rr = np.stack([self.ranges[i, j], self.ranges[i, j + 1],
+                       self.ranges[i + 1, j], self.ranges[i + 1, j + 1]], axis=-1)
+        spread = rr.max(axis=-1) - rr.min(axis=-1)
+        jump = spread > self.max_range_jump * rr.mean(axis=-1)
+        res[jump] = np.nan
+        out[inside] = res
+        return out.reshape(shape + (3,))
+
+    def refine(self, u: float, v: float) -> Optional[Tuple[float, float, float]]:
+        """Exact ground point for one pixel, bypassing the grid."""
+
+        o, d = self.camera.ray(u, v)
+        return intersect_ray_with_dem(o, d, self.dem, max_range_m=self.max_range_m)
+
+    def ground_point(self, u: float, v: float, exact: bool = False) -> Optional[Tuple[float, float, float]]:
+        """Ground point for a pixel, falling back to :meth:`refine` as needed."""
+
+        if not exact:
+            p = self.lookup(u, v)
+            if np.all(np.isfinite(p)):
+                return float(p[0]), float(p[1]), float(p[2])
+        return self.refine(u, v)
+
+
+class GroundLUTService:
+    """Keeps a :class:`GroundLUT` for the current pose, built in the background.
+
+    Call :meth:`update` whenever telemetry arrives; a rebuild is started only
+    when the pose moved beyond ``tolerance`` from the current (or pending)
+    LUT.  At most one build runs at a time – requests arriving meanwhile are
+    coalesced and only the latest is built next.  :meth:`lut_for` returns
+    the LUT only when it matches the requested pose, so callers fall back to
+    an exact cast while a rebuild is in flight.
+
+    With ``footprint_samples`` set, each build also stores the pose's
+    :class:`core.footprint.Footprint` as ``lut.footprint``, clipped at the
+    skyline of the viewshed given to :meth:`set_viewshed`.
+    """
+
+    def __init__(self, spacing_px: int = 16, max_range_m: float = 5000.0,
+                 tolerance: PoseTolerance = PoseTolerance(),
+                 footprint_samples: Optional[int] = 32) -> None:
+        self.spacing_px = spacing_px
+        self.max_range_m = max_range_m
+        self.tolerance = tolerance
+        self.footprint_samples = footprint_samples
+        self._ray_map: Optional[np.ndarray] = None
+        self._viewshed = None
+        self._lock = threading.Lock()
+        self._lut: Optional[GroundLUT] = None
+        # Latest requested pose, the pose being built and the next one to build
+        self._wanted: Optional[Tuple] = None
+        self._building: Optional[Tuple] = None
+        self._queued: Optional[Tuple] = None
+        self._th: Optional[threading.Thread] = None
+
+    def current(self) -> Optional[GroundLUT]:
+        with self._lock:
+            return self._lut
+
+    def lut_for(self, intr: Intrinsics, ptz: PTZ, extr: Extrinsics,
+                dem: Optional[DemSampler] = None) -> Optional[GroundLUT]:
+        """The current LUT if it is valid for this pose (and DEM), else ``None``."""
+
+        lut = self.current()
+        if lut is None or (dem is not None and lut.dem is not dem):
+            return None
+        return lut if lut.matches(intr, ptz, extr, self.tolerance) else None
+
+    def invalidate(self) -> None:
+        """Drop the current LUT and ignore any build in flight."""
+
+        with self._lock:
+            self._lut = None
+            self._wanted = None
+            self._queued = None
+
+    def set_ray_map(self, ray_map: Optional[np.ndarray]) -> None:
+        """Use ``ray_map`` for future builds, dropping LUTs built without it."""
+
+        if ray_map is not self._ray_map:
+            self._ray_map = ray_map
+            self.invalidate()
+
+    def set_viewshed(self, viewshed) -> None:
+        """Clip future footprints at ``viewshed``'s skyline, rebuilding the LUT."""
+
+        if viewshed is not self._viewshed:
+            self._viewshed = viewshed
+            self.invalidate()
+
+    def _same(self, a: Optional[Tuple], b: Optional[Tuple]) -> bool:
+        if a is None or b is None:
+            return False
+        (ai, ap, ae, ad), (bi, bp, be, bd) = a, b
+        return ai == bi and ae == be and ad is bd and self.tolerance.same_ptz(ap, bp)
+
+    def update(self, intr: Intrinsics, ptz: PTZ, extr: Extrinsics, dem: DemSampler,
+               wait: bool = False) -> None:
+        """Ensure a LUT for this pose exists or is being built.
+
+        With ``wait=True`` block until pending builds have finished.
+        """
+
+        job = (intr, PTZ(ptz.pan, ptz.tilt, ptz.zoom), extr, dem)
+        with self._lock:
+            self._wanted = job
+            lut = self._lut
+            if lut is not None and self._same(job, (lut.intr, lut.ptz, lut.extr, lut.dem)):
+                self._queued = None
+            elif self._th is not None and self._th.is_alive():
+                # Coalesce: only the most recent pose is built next
+                self._queued = None if self._same(job, self._building) else job
+            else:
+                self._start(job)
+        if wait:
+            while True:
+                with self._lock:
+                    th = self._th
+                if th is None or not th.is_alive():
+                    break
+                th.join()
+
+    def _start(self, job: Tuple) -> None:
+        # Called with the lock held
+        self._building = job
+        self._queued = None
+        self._th = threading.Thread(target=self._build, args=job, daemon=True)
+        self._th.start()
+
+    def _build(self, intr: Intrinsics, ptz: PTZ, extr: Extrinsics, dem: DemSampler) -> None:
+        viewshed = self._viewshed
+        try:
+            lut = GroundLUT(intr, ptz, extr, dem, spacing_px=self.spacing_px,
+                            max_range_m=self.max_range_m, ray_map=self._ray_map)
+            if self.footprint_samples:
+                lut.footprint = compute_footprint(intr, ptz, extr, dem, self.footprint_samples,
+                                                  self.max_range_m, viewshed=viewshed,
+                                                  ray_map=lut.ray_map)
+        except Exception:
+            lut = None
+        with self._lock:
+            if (lut is not None and lut.ray_map is self._ray_map
+                    and viewshed is self._viewshed
+                    and self._same(self._wanted, (intr, ptz, extr, dem))):
+                self._lut = lut
+            self._building = None
+            if self._queued is not None:
+                self._start(self._queued)
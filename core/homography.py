@@ -0,0 +1,207 @@
+"""Robust planar homography estimation and batch application.
+
+:func:`estimate_homography` fits the image→map homography from point pairs
+with the normalized DLT (points are shifted to their centroid and scaled to
+an average distance of √2 before the SVD, which keeps the system well
+conditioned for pixel and map coordinates alike).  With more than four
+pairs, outliers – mis-clicked points – are rejected by MSAC: minimal
+four-point hypotheses are generated and scored in vectorized batches, the
+best consensus set is refit with the normalized DLT and its transfer
+residuals are reported.
+
+:func:`apply_homography` maps any number of points in one call.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import math
+import numpy as np
+
+# Hypotheses generated and scored per batch
+_BATCH = 256
+
+
+@dataclass
+class HomographyFit:
+    """Result of :func:`estimate_homography`.
+
+    ``residuals`` holds the forward transfer error ``|H·src − dst|`` of
+    every pair in destination units, ``inliers`` the consensus set used for
+    the final fit and ``rms`` the RMS residual over the inliers.
+    """
+
+    H: np.ndarray
+    inliers: np.ndarray
+    residuals: np.ndarray
+    rms: float
+    threshold: float
+
+    @property
+    def n_inliers(self) -> int:
+        return int(self.inliers.sum())
+
+
+def normalize_points(pts) -> Tuple[np.ndarray, np.ndarray]:
+    """Similarity-normalize ``(N, 2)`` points; returns the points and ``T`` (3×3)."""
+
+    p = np.asarray(pts, dtype=float).reshape(-1, 2)
+    c = p.mean(axis=0)
+    d = np.mean(np.linalg.norm(p - c, axis=1))
+    s = math.sqrt(2.0) / d if d > 1e-12 else 1.0
+    T = np.array([[s, 0.0, -s * c[0]], [0.0, s, -s * c[1]], [0.0, 0.0, 1.0]])
+    return (p - c) * s, T
+
+
+def _dlt_rows(src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """DLT design matrices ``(..., 2n, 9)`` for point arrays ``(..., n, 2)``."""
+
+    u, v = src[..., 0], src[..., 1]
+    x, y = dst[..., 0], dst[..., 1]
+    one, zero = np.ones_like(u), np.zeros_like(u)
+    r1 = np.stack([u, v, one, zero, zero, zero, -x * u, -x * v, -x], axis=-1)
+    r2 = np.stack([zero, zero, zero, u, v, one, -y * u, -y * v, -y], axis=-1)
+    return np.concatenate([r1, r2], axis=-2)
+
+
+def _scale(H: np.ndarray) -> np.ndarray:
+    h22 = H[..., 2:3, 2:3]
+    return np.where(np.abs(h22) > 1e-12, H / np.where(np.abs(h22) > 1e-12, h22, 1.0), H)
+
+
+def dlt_homography(src, dst) -> np.ndarray:
+    """Normalized DLT homography mapping ``src`` to ``dst`` (``N >= 4`` pairs)."""
+
+    s = np.asarray(src, dtype=float).reshape(-1, 2)
+    d = np.asarray(dst, dtype=float).reshape(-1, 2)
+    n = min(len(s), len(d))
+    if n < 4:
+        raise ValueError("Need at least 4 matching points")
+    sn, Ts = normalize_points(s[:n])
+    dn, Td = normalize_points(d[:n])
+    _, _, VT = np.linalg.svd(_dlt_rows(sn, dn))
+    Hn = VT[-1].reshape(3, 3)
+    return _scale(np.linalg.inv(Td) @ Hn @ Ts)
+
+
+def apply_homography(H: np.ndarray, uv) -> np.ndarray:
+    """Map points ``(..., 2)`` through ``H``; ``NaN`` where the point maps to infinity."""
+
+    p = np.asarray(uv, dtype=float)
+    x = H[0, 0] * p[..., 0] + H[0, 1] * p[..., 1] + H[0, 2]
+    y = H[1, 0] * p[..., 0] + H[1, 1] * p[..., 1] + H[1, 2]
+    w = H[2, 0] * p[..., 0] + H[2, 1] * p[..., 1] + H[2, 2]
+    bad = np.abs(w) < 1e-12
+    w = np.where(bad, 1.0, w)
+    out = np.stack([x / w, y / w], axis=-1)
+    out[bad] = np.nan
+    return out
+
+
+def transfer_errors(H: np.ndarray, src, dst) -> np.ndarray:
+    """Forward transfer error ``|H·src − dst|`` per pair (``inf`` if unmappable)."""
+
+    e = np.linalg.norm(apply_homography(H, src) - np.asarray(dst, dtype=float), axis=-1)
+    return np.where(np.isfinite(e), e, np.inf)
+
+
+def _degenerate(sample: np.ndarray) -> np.ndarray:
+    """Samples ``(B, 4, 2)`` with three (nearly) collinear points."""
+
+    bad = np.zeros(sample.shape[0], dtype=bool)
+    for i, j, k in ((0, 1, 2), (0, 1, 3), (0, 2, 3), (1, 2, 3)):
+        a = sample[:, j] - sample[:, i]
+        b = sample[:, k] - sample[:, i]
+        cross = np.abs(a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0])
+        scale = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+        bad |= cross <= 1e-6 * np.maximum(scale, 1e-300)
+    return bad
+
+
+def estimate_homography(src, dst, threshold: float = 3.0, confidence: float = 0.999,
+                        max_iters: int = 2000, seed: Optional[int] = None) -> HomographyFit:
+    """Robust homography from point pairs.
+
+    Parameters
+    ----------
+    src, dst:
+        ``(N, 2)`` matching points (image pixels and map/scene coordinates).
+    threshold:
+        Inlier threshold on the transfer error, in ``dst`` units.
+    confidence:
+        Desired probability of drawing at least one outlier-free sample;
+        sampling stops early once it is reached.
+    max_iters:
+        Upper bound on the number of minimal hypotheses.
+    seed:
+        Seed for the sample generator (for reproducible fits).
+    """
+
+    s = np.asarray(src, dtype=float).reshape(-1, 2)
+    d = np.asarray(dst, dtype=float).reshape(-1, 2)
+    n = min(len(s), len(d))
+    if n < 4:
+        raise ValueError("Need at least 4 matching points")
+    s, d = s[:n], d[:n]
+    t2 = float(threshold) ** 2
+
+    if n == 4:
+        H = dlt_homography(s, d)
+        res = transfer_errors(H, s, d)
+        inl = np.ones(n, dtype=bool)
+        return HomographyFit(H, inl, res, float(np.sqrt(np.mean(res ** 2))), float(threshold))
+
+    # Work in normalized coordinates so hypotheses are well conditioned
+    sn, Ts = normalize_points(s)
+    dn, Td = normalize_points(d)
+    Td_inv = np.linalg.inv(Td)
+    rng = np.random.default_rng(seed)
+
+    best_cost = math.inf
+    best_inl = None
+    needed = max_iters
+    done = 0
+    while done < min(needed, max_iters):
+        b = min(_BATCH, max_iters - done)
+        idx = np.argsort(rng.random((b, n)), axis=1)[:, :4]
+        done += b
+        ok = ~_degenerate(s[idx])
+        if not ok.any():
+            continue
+        idx = idx[ok]
+        _, _, VT = np.linalg.svd(_dlt_rows(sn[idx], dn[idx]))
+        Hs = Td_inv @ VT[:, -1].reshape(-1, 3, 3) @ Ts
+        # Score all hypotheses against all points at once (MSAC cost)
+        ph = np.einsum("bij,nj->bni", Hs, np.column_stack([s, np.ones(n)]))
+        w = ph[..., 2]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            e2 = np.sum((ph[..., :2] / w[..., None] - d) ** 2, axis=-1)
+        e2 = np.where(np.isfinite(e2), e2, np.inf)
+        cost = np.minimum(e2, t2).sum(axis=1)
+        k = int(np.argmin(cost))
+        if cost[k] < best_cost:
+            best_cost = float(cost[k])
+            best_inl = e2[k] <= t2
+            ratio = best_inl.mean()
+            if ratio >= 1.0:
+                needed = done
+            elif ratio > 0.0:
+                needed = int(math.ceil(math.log(1.0 - confidence) / math.log(1.0 - ratio ** 4)))
+
+    if best_inl is None or best_inl.sum() < 4:
+        raise ValueError("Could not find a consistent homography")
+
+    # Refit on the consensus set, then once more on the refined inliers
+    inl = best_inl
+    for _ in range(2):
+        H = dlt_homography(s[inl], d[inl])
+        res = transfer_errors(H, s, d)
+        new = res <= threshold
+        if new.sum() < 4 or np.array_equal(new, inl):
+            break
+        inl = new
+    H = dlt_homography(s[inl], d[inl])
+    res = transfer_errors(H, s, d)
+    rms = float(np.sqrt(np.mean(res[inl] ** 2)))
+    return HomographyFit(H, inl, res, rms, float(threshold))
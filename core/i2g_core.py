@@ -8,9 +8,11 @@ without requiring Qt or other heavy dependencies.
 
 from __future__ import annotations
 
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import Optional, Protocol, Tuple
 import math
+import threading
 import numpy as np
 
 
@@ -76,7 +78,13 @@ class PTZ:
 
 
 class DemSampler(Protocol):
-    """Minimal interface for sampling a DEM/DTM surface."""
+    """Minimal interface for sampling a DEM/DTM surface.
+
+    Samplers may additionally provide ``elevations(xs, ys)`` returning a
+    float array with ``NaN`` where no data is available.  Batch helpers such
+    as :func:`intersect_rays_with_dem` use it when present and otherwise fall
+    back to calling :meth:`elevation` point by point.
+    """
 
     def elevation(self, x: float, y: float) -> Optional[float]:
         """Return ground elevation (meters) at the projected coordinate.
@@ -115,7 +123,189 @@ def _rotation_matrix(yaw_deg: float, pitch_deg: float, roll_deg: float) -> np.nd
     return Rz @ Ry @ Rx @ R0
 
 
-def image_ray(u: int, v: int, intr: Intrinsics, ptz: PTZ, extr: Extrinsics) -> Tuple[np.ndarray, np.ndarray]:
+def _pose_rotation(ptz: PTZ, extr: Extrinsics) -> np.ndarray:
+    """Return the world←camera rotation for a base pose plus PTZ offsets."""
+
+    yaw = extr.yaw + (ptz.pan or 0.0)
+    # Many PTZ cameras define positive tilt as looking downwards.
+    # Subtract to keep the convention that positive pitch raises the view.
+    # If PTZ telemetry omits tilt, treat it as zero.
+    pitch = extr.pitch - (ptz.tilt or 0.0)
+    return _rotation_matrix(yaw, pitch, extr.roll)
+
+
+class CompiledCamera:
+    """Immutable camera model with the pose rotation computed once.
+
+    Holds the pinhole intrinsics, the camera position, the world←camera
+    rotation ``R`` (already composed with any PTZ offsets) and its inverse,
+    plus an optional lens ray map.  Build one per pose change – typically via
+    :func:`compile_camera` – and reuse it for every ray cast or projection
+    at that pose so hot loops skip the trigonometry.
+    """
+
+    __slots__ = ("width", "height", "fx", "fy", "cx", "cy", "origin", "R", "R_inv", "ray_map")
+
+    def __init__(self, width: int, height: int, fx: float, fy: float, cx: float, cy: float,
+                 origin, R, ray_map: Optional[np.ndarray] = None) -> None:
+        origin = np.array(origin, dtype=float).reshape(3)
+        R = np.array(R, dtype=float).reshape(3, 3)
+        R_inv = R.T.copy()
+        for a in (origin, R, R_inv):
+            a.setflags(write=False)
+        for name, val in (
+            ("width", int(width)), ("height", int(height)),
+            ("fx", float(fx)), ("fy", float(fy)), ("cx", float(cx)), ("cy", float(cy)),
+            ("origin", origin), ("R", R), ("R_inv", R_inv), ("ray_map", ray_map),
+        ):
+            object.__setattr__(self, name, val)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledCamera is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("CompiledCamera is immutable")
+
+    @classmethod
+    def from_core(cls, intr: Intrinsics, ptz: PTZ, extr: Extrinsics,
+                  ray_map: Optional[np.ndarray] = None) -> "CompiledCamera":
+        """Compile the :mod:`core.i2g_core` camera model (base pose + PTZ)."""
+
+        return cls(intr.width, intr.height, intr.fx, intr.fy, intr.cx, intr.cy,
+                   (extr.x, extr.y, extr.z), _pose_rotation(ptz, extr), ray_map)
+
+    @classmethod
+    def from_pose(cls, intr, pose, ray_map: Optional[np.ndarray] = None) -> "CompiledCamera":
+        """Compile a :class:`geom3d.CameraIntrinsics`/:class:`geom3d.CameraPose` pair."""
+
+        return cls(intr.width, intr.height, intr.fx, intr.fy, intr.cx, intr.cy,
+                   pose.t_w(), pose.R_wc(), ray_map)
+
+    def normalized(self, us, vs) -> Tuple[np.ndarray, np.ndarray]:
+        """Normalized camera coordinates ``(x, y)`` of pixel arrays."""
+
+        if self.ray_map is not None:
+            from core.undistort import lookup_rays
+
+            return lookup_rays(self.ray_map, us, vs)
+        u = np.asarray(us, dtype=float)
+        v = np.asarray(vs, dtype=float)
+        return (u - self.cx) / self.fx, (v - self.cy) / self.fy
+
+    def ray(self, u: float, v: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Origin and unit direction of the ray through one pixel."""
+
+        x, y = self.normalized(u, v)
+        d = self.R @ np.array([float(x), float(y), 1.0])
+        return self.origin.copy(), d / np.linalg.norm(d)
+
+    def rays(self, us, vs) -> Tuple[np.ndarray, np.ndarray]:
+        """``(N, 3)`` origins and unit directions for flattened pixel arrays."""
+
+        u = np.asarray(us, dtype=float).ravel()
+        v = np.asarray(vs, dtype=float).ravel()
+        if u.shape != v.shape:
+            raise ValueError("us and vs must have the same number of elements")
+        d_cam = np.empty((u.size, 3), dtype=float)
+        d_cam[:, 0], d_cam[:, 1] = self.normalized(u, v)
+        d_cam[:, 2] = 1.0
+        # Row-vector form of ``R @ d``; R is orthonormal so one
+        # normalization suffices.
+        d_world = d_cam @ self.R_inv
+        d_world /= np.linalg.norm(d_world, axis=1)[:, None]
+        origins = np.broadcast_to(self.origin, d_world.shape).copy()
+        return origins, d_world
+
+    def project(self, points) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Pinhole projection of world points.
+
+        Returns ``(uv, in_view, rel)``: pixel coordinates (``NaN`` behind the
+        camera), a mask of points in front of the camera and inside the
+        image, and the points relative to the camera position.
+        """
+
+        pts = np.array(points, dtype=float, ndmin=2)
+        if pts.shape[-1] != 3:
+            raise ValueError("points must have shape (N, 3)")
+        rel = pts - self.origin
+        pc = rel @ self.R  # world -> camera (R_inv @ p) in row-vector form
+        uv = np.full((len(pts), 2), np.nan)
+        front = pc[:, 2] > 1e-9
+        z = pc[front, 2]
+        uv[front, 0] = self.fx * pc[front, 0] / z + self.cx
+        uv[front, 1] = self.fy * pc[front, 1] / z + self.cy
+        in_view = np.zeros(len(pts), dtype=bool)
+        in_view[front] = (
+            (uv[front, 0] >= 0.0) & (uv[front, 0] < self.width)
+            & (uv[front, 1] >= 0.0) & (uv[front, 1] < self.height)
+        )
+        return uv, in_view, rel
+
+
+# Recently compiled cameras, keyed by the parameter values
+_COMPILED_MAX = 32
+_compiled: "OrderedDict[tuple, CompiledCamera]" = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def _ray_map_key(ray_map) -> Optional[tuple]:
+    """Cache key of a ray map: the calibration of a :class:`core.undistort.RayMap`.
+
+    Plain arrays carry no calibration; ``None`` is returned for them and
+    cameras using them are not cached.
+    """
+
+    return getattr(ray_map, "cache_key", None)
+
+
+def _cached_camera(key: tuple, ray_map, build) -> CompiledCamera:
+    """Return the cached camera for ``key`` or store the one ``build()`` makes."""
+
+    if ray_map is not None and key[-1] is None:
+        return build()
+    with _compiled_lock:
+        cam = _compiled.get(key)
+        if cam is not None:
+            _compiled.move_to_end(key)
+            return cam
+    cam = build()
+    with _compiled_lock:
+        _compiled[key] = cam
+        while len(_compiled) > _COMPILED_MAX:
+            _compiled.popitem(last=False)
+    return cam
+
+
+def compile_camera(intr: Intrinsics, ptz: PTZ, extr: Extrinsics,
+                   ray_map: Optional[np.ndarray] = None) -> CompiledCamera:
+    """Return a :class:`CompiledCamera` for the pose, reusing recent ones.
+
+    Repeated calls with an unchanged pose return the same object, so callers
+    can compile per ray/projection call without recomputing the rotation.
+    """
+
+    key = (
+        "ptz", intr.width, intr.height, intr.fx, intr.fy, intr.cx, intr.cy,
+        ptz.pan, ptz.tilt,
+        extr.x, extr.y, extr.z, extr.yaw, extr.pitch, extr.roll,
+        _ray_map_key(ray_map),
+    )
+    return _cached_camera(key, ray_map, lambda: CompiledCamera.from_core(intr, ptz, extr, ray_map))
+
+
+def compile_pose_camera(intr, pose, ray_map: Optional[np.ndarray] = None) -> CompiledCamera:
+    """:func:`compile_camera` for a :class:`geom3d.CameraIntrinsics`/:class:`geom3d.CameraPose` pair."""
+
+    key = (
+        "pose", intr.width, intr.height, intr.fx, intr.fy, intr.cx, intr.cy,
+        pose.x, pose.y, pose.z, pose.yaw, pose.pitch, pose.roll,
+        _ray_map_key(ray_map),
+    )
+    return _cached_camera(key, ray_map, lambda: CompiledCamera.from_pose(intr, pose, ray_map))
+
+
+def image_ray(u: int, v: int, intr: Intrinsics, ptz: PTZ, extr: Extrinsics,
+              ray_map: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
     """Compute a ray origin and direction in world coordinates.
 
     Parameters
@@ -128,6 +318,12 @@ def image_ray(u: int, v: int, intr: Intrinsics, ptz: PTZ, extr: Extrinsics) -> T
         Optional pan/tilt offsets applied to the extrinsic pose.
     extr:
         Base camera position and orientation.
+    ray_map:
+        Optional ``(H, W, 2)`` undistortion map from
+        :func:`core.undistort.load_ray_map`, or a
+        :class:`core.undistort.RayMap`.  When given, the normalized ray
+        is looked up there (accounting for lens distortion) instead of being
+        derived from ``intr``; ``u, v`` must then be in the map's resolution.
 
     Returns
     -------
@@ -135,24 +331,35 @@ def image_ray(u: int, v: int, intr: Intrinsics, ptz: PTZ, extr: Extrinsics) -> T
         The 3D origin of the ray and a unit-length direction vector.
     """
 
-    # Project pixel coordinates into the camera frame using intrinsics
-    x_cam = (u - intr.cx) / intr.fx
-    y_cam = (v - intr.cy) / intr.fy
-    d_cam = np.array([x_cam, y_cam, 1.0], dtype=float)
-    d_cam /= np.linalg.norm(d_cam)
+    return compile_camera(intr, ptz, extr, ray_map).ray(u, v)
 
-    yaw = extr.yaw + (ptz.pan or 0.0)
-    # Many PTZ cameras define positive tilt as looking downwards.
-    # Subtract to keep the convention that positive pitch raises the view.
-    # If PTZ telemetry omits tilt, treat it as zero.
-    pitch = extr.pitch - (ptz.tilt or 0.0)
-    roll = extr.roll
-    R = _rotation_matrix(yaw, pitch, roll)
-    d_world = R @ d_cam
-    d_world /= np.linalg.norm(d_world)
 
-    origin = np.array([extr.x, extr.y, extr.z], dtype=float)
-    return origin, d_world
+def image_rays(
+    us: np.ndarray, vs: np.ndarray, intr: Intrinsics, ptz: PTZ, extr: Extrinsics,
+    ray_map: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized counterpart of :func:`image_ray` for many pixels.
+
+    The rotation matrix is built once for the pose and applied to all
+    pixels in a single matrix product.
+
+    Parameters
+    ----------
+    us, vs:
+        Array-likes of pixel coordinates with matching shapes.  They are
+        flattened, so the ``i``-th ray corresponds to ``(us.flat[i],
+        vs.flat[i])``.
+    intr, ptz, extr, ray_map:
+        Same meaning as in :func:`image_ray`.
+
+    Returns
+    -------
+    origins, directions : tuple of ``numpy.ndarray``
+        Arrays of shape ``(N, 3)``.  All origins equal the camera position
+        and every direction has unit length.
+    """
+
+    return compile_camera(intr, ptz, extr, ray_map).rays(us, vs)
 
 
 def intersect_ray_with_dem(
@@ -162,6 +369,8 @@ def intersect_ray_with_dem(
     max_range_m: float = 5000.0,
     step_m: float = 20.0,
     refine_steps: int = 20,
+    method: str = "march",
+    viewshed=None,
 ) -> Optional[Tuple[float, float, float]]:
     """Intersect a ray with a DEM using adaptive stepping.
 
@@ -171,22 +380,59 @@ def intersect_ray_with_dem(
     converge on a stable intersection point.  This approach mirrors the
     implementation used in :func:`geom3d.intersect_ray_with_dtm` and provides
     higher accuracy without a large performance cost.
+
+    ``method="pyramid"`` instead traverses the DEM's max-elevation pyramid
+    (see :func:`core.dem_pyramid.intersect_ray_with_pyramid`).  It requires a
+    gridded sampler from :mod:`core.dem_grid` and ignores ``step_m`` and
+    ``refine_steps``.  ``method="dda"`` walks the ray cell by cell and
+    intersects every bilinear patch it crosses
+    (see :func:`core.dem_dda.intersect_ray_with_dda`); it is exact at any
+    range and likewise needs a :mod:`core.dem_grid` sampler.
+
+    ``viewshed`` is an optional :class:`core.viewshed.Viewshed` computed from
+    ``ray_origin``.  Rays that cannot meet the terrain within ``max_range_m``
+    are rejected without marching, and the march is limited to the stretch
+    of the ray where the viewshed's horizon profile allows a hit.  It is
+    ignored when computed from a different origin.
     """
 
+    t_start, t_end = 0.0, math.inf
+    if viewshed is not None and viewshed.matches(ray_origin):
+        t_start, t_end = viewshed.ray_bounds(ray_dir)
+        if t_start * getattr(dem, "meters_per_unit", 1.0) > max_range_m:
+            return None
+
+    if method == "dda":
+        from core.dem_dda import intersect_ray_with_dda
+
+        return intersect_ray_with_dda(ray_origin, ray_dir, dem, max_range_m=max_range_m)
+    if method == "pyramid":
+        from core.dem_pyramid import intersect_ray_with_pyramid
+
+        return intersect_ray_with_pyramid(ray_origin, ray_dir, dem, max_range_m=max_range_m)
+    if method != "march":
+        raise ValueError(f"unknown DEM intersection method: {method!r}")
+
     o = np.asarray(ray_origin, dtype=float)
     d = np.asarray(ray_dir, dtype=float)
     d /= np.linalg.norm(d)
     meters_per_unit = getattr(dem, "meters_per_unit", 1.0)
     step = step_m / meters_per_unit
-    max_range = max_range_m / meters_per_unit
+    # One extra step so the last partial step before t_end is covered
+    max_range = min(max_range_m / meters_per_unit, t_end + step)
 
-    t_prev = 0.0
+    t_prev = t_start
     p_prev = o + d * t_prev
     elev_prev = dem.elevation(float(p_prev[0]), float(p_prev[1]))
+    if t_start > 0.0 and (elev_prev is None or p_prev[2] <= elev_prev):
+        # Viewshed bound too tight here; march from the camera instead
+        t_prev = 0.0
+        p_prev = o
+        elev_prev = dem.elevation(float(o[0]), float(o[1]))
     if elev_prev is None or not math.isfinite(elev_prev):
         elev_prev = -1e9
 
-    t = step
+    t = t_prev + step
     while t <= max_range:
         p = o + d * t
         elev = dem.elevation(float(p[0]), float(p[1]))
@@ -221,3 +467,174 @@ def intersect_ray_with_dem(
         t += step
 
     return None
+
+
+def _sample_elevations(dem: DemSampler, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+    """Sample ``dem`` at many points, returning ``NaN`` for missing data."""
+
+    batch = getattr(dem, "elevations", None)
+    if batch is not None:
+        out = np.asarray(batch(xs, ys), dtype=float).reshape(np.shape(xs))
+    else:
+        out = np.empty(len(xs), dtype=float)
+        for i, (x, y) in enumerate(zip(xs, ys)):
+            val = dem.elevation(float(x), float(y))
+            out[i] = np.nan if val is None else val
+    out[~np.isfinite(out)] = np.nan
+    return out
+
+
+def intersect_rays_with_dem(
+    ray_origins: np.ndarray,
+    ray_dirs: np.ndarray,
+    dem: DemSampler,
+    max_range_m: float = 5000.0,
+    step_m: float = 20.0,
+    refine_steps: int = 20,
+) -> np.ndarray:
+    """Intersect many rays with a DEM in lockstep.
+
+    This is the batched form of :func:`intersect_ray_with_dem` and follows
+    the same march-then-bisect scheme.  All still-active rays advance one
+    ``step_m`` together and the DEM is sampled once per step for all of
+    them.  Rays are retired as soon as their segment brackets the surface;
+    the bracketed rays are then refined together with ``refine_steps``
+    bisection iterations.
+
+    Parameters
+    ----------
+    ray_origins, ray_dirs:
+        Arrays of shape ``(N, 3)``.  A single origin of shape ``(3,)`` is
+        broadcast to all directions.
+    dem:
+        Elevation sampler.  ``dem.elevations`` is used when available.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape ``(N, 3)`` holding ``(x, y, z)`` hits.  Rows of rays
+        that do not intersect the DEM within ``max_range_m`` are ``NaN``.
+    """
+
+    d = np.array(ray_dirs, dtype=float, ndmin=2)
+    o = np.broadcast_to(np.asarray(ray_origins, dtype=float), d.shape)
+    d /= np.linalg.norm(d, axis=1)[:, None]
+    n = d.shape[0]
+    out = np.full((n, 3), np.nan)
+    if n == 0:
+        return out
+
+    meters_per_unit = getattr(dem, "meters_per_unit", 1.0)
+    step = step_m / meters_per_unit
+    max_range = max_range_m / meters_per_unit
+    n_steps = int(math.floor(max_range / step + 1e-9))
+
+    elev0 = _sample_elevations(dem, o[:, 0], o[:, 1])
+    elev0[np.isnan(elev0)] = -1e9
+    t_prev = np.zeros(n)
+    val_prev = o[:, 2] - elev0
+
+    active = np.ones(n, dtype=bool)
+    lo = np.zeros(n)
+    hi = np.zeros(n)
+    val_lo = np.zeros(n)
+    bracketed = np.zeros(n, dtype=bool)
+
+    for k in range(1, n_steps + 1):
+        idx = np.flatnonzero(active)
+        if idx.size == 0:
+            break
+        t = k * step
+        p = o[idx] + d[idx] * t
+        elev = _sample_elevations(dem, p[:, 0], p[:, 1])
+        valid = ~np.isnan(elev)
+        val = p[:, 2] - elev
+        cross = valid & (val_prev[idx] * val <= 0)
+
+        hit = idx[cross]
+        lo[hit] = t_prev[hit]
+        hi[hit] = t
+        val_lo[hit] = val_prev[hit]
+        bracketed[hit] = True
+        active[hit] = False
+
+        keep = valid & ~cross
+        t_prev[idx[keep]] = t
+        val_prev[idx[keep]] = val[keep]
+
+    idx = np.flatnonzero(bracketed)
+    if idx.size == 0:
+        return out
+
+    o_b, d_b = o[idx], d[idx]
+    lo_b, hi_b, vlo_b = lo[idx], hi[idx], val_lo[idx]
+    for _ in range(refine_steps):
+        mid = 0.5 * (lo_b + hi_b)
+        p_mid = o_b + d_b * mid[:, None]
+        elev_mid = _sample_elevations(dem, p_mid[:, 0], p_mid[:, 1])
+        valid = ~np.isnan(elev_mid)
+        val_mid = p_mid[:, 2] - elev_mid
+        to_hi = valid & (vlo_b * val_mid <= 0)
+        hi_b = np.where(to_hi, mid, hi_b)
+        lo_b = np.where(to_hi, lo_b, mid)
+        vlo_b = np.where(valid & ~to_hi, val_mid, vlo_b)
+
+    p_hit = o_b + d_b * hi_b[:, None]
+    elev_hit = _sample_elevations(dem, p_hit[:, 0], p_hit[:, 1])
+    p_hit[:, 2] = np.where(np.isnan(elev_hit), p_hit[:, 2], elev_hit)
+    out[idx] = p_hit
+    return out
+
+
+def project_world_to_image(
+    points: np.ndarray,
+    intr: Intrinsics,
+    ptz: PTZ,
+    extr: Extrinsics,
+    dem: Optional[DemSampler] = None,
+    occlusion_tol_m: float = 2.0,
+    step_m: float = 20.0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Project world points into the image (the inverse of :func:`image_ray`).
+
+    Parameters
+    ----------
+    points:
+        Array of shape ``(N, 3)`` (or a single ``(3,)`` point) in the same
+        CRS as ``extr``.
+    intr, ptz, extr:
+        Camera model, with the rotation convention of :func:`_rotation_matrix`.
+    dem:
+        Optional elevation sampler.  When given, points whose line of sight
+        meets the terrain more than ``occlusion_tol_m`` before the point are
+        reported as not visible.  The test runs for all candidate points at
+        once through :func:`intersect_rays_with_dem` with ``step_m`` steps.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        ``uv`` of shape ``(N, 2)`` with pixel coordinates (``NaN`` for points
+        behind the camera) and a boolean ``visible`` array of shape ``(N,)``
+        that is true for points in front of the camera, inside the image and
+        not occluded.
+    """
+
+    cam_model = compile_camera(intr, ptz, extr)
+    uv, visible, rel = cam_model.project(points)
+    cam = cam_model.origin
+
+    if dem is not None and visible.any():
+        idx = np.flatnonzero(visible)
+        dist = np.linalg.norm(rel[idx], axis=1)
+        meters_per_unit = getattr(dem, "meters_per_unit", 1.0)
+        tol = occlusion_tol_m / meters_per_unit
+        hits = intersect_rays_with_dem(
+            cam, rel[idx], dem,
+            max_range_m=float(dist.max()) * meters_per_unit,
+            step_m=step_m,
+        )
+        hit_dist = np.linalg.norm(hits - cam, axis=1)
+        occluded = np.isfinite(hit_dist) & (hit_dist < dist - tol)
+        visible[idx[occluded]] = False
+
+    return uv, visible
@@ -0,0 +1,296 @@
+"""Joint camera pose calibration from pixel↔ground tie points.
+
+:func:`solve_pose` estimates the base orientation (yaw offset, pitch, roll),
+horizontal field of view and camera height of the :mod:`core.i2g_core`
+camera model from ``N`` correspondences between image pixels and world
+points, each observed at its own PTZ pan/tilt.  The reprojection error is
+minimized with Levenberg–Marquardt; residuals and Jacobians are evaluated
+for all points at once with analytic derivatives of the rotation chain
+``Rz(90 - yaw - pan) Ry(pitch - tilt) Rx(roll) R0``, so a solve over a few
+hundred points takes milliseconds.
+
+:class:`PoseSolver` accumulates tie points and warm-starts each solve from
+the previous estimate, for running continuously while points are added.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Sequence, Tuple
+import math
+import numpy as np
+
+from core.i2g_core import Extrinsics, Intrinsics
+
+PARAM_NAMES = ("yaw", "pitch", "roll", "hfov_deg", "z")
+
+_R0 = np.array([[0, 0, 1], [1, 0, 0], [0, -1, 0]], dtype=float)
+_KX = np.array([[0, 0, 0], [0, 0, -1], [0, 1, 0]], dtype=float)
+_KY = np.array([[0, 0, 1], [0, 0, 0], [-1, 0, 0]], dtype=float)
+_KZ = np.array([[0, -1, 0], [1, 0, 0], [0, 0, 0]], dtype=float)
+_DEG = math.pi / 180.0
+
+
+@dataclass
+class PoseParams:
+    """Parameters estimated by :func:`solve_pose` (angles in degrees, ``z`` in meters)."""
+
+    yaw: float
+    pitch: float
+    roll: float
+    hfov_deg: float
+    z: float
+
+    def to_array(self) -> np.ndarray:
+        return np.array([self.yaw, self.pitch, self.roll, self.hfov_deg, self.z], dtype=float)
+
+    @staticmethod
+    def from_array(a: Sequence[float]) -> "PoseParams":
+        return PoseParams(*(float(v) for v in a[:5]))
+
+
+@dataclass
+class PoseFit:
+    """Result of :func:`solve_pose`.
+
+    ``residuals`` are ``(N, 2)`` reprojection errors in pixels (``NaN`` for
+    points behind the camera) and ``cov`` the ``5×5`` parameter covariance
+    scaled by the residual variance; rows/columns of fixed parameters are
+    zero.
+    """
+
+    params: PoseParams
+    residuals: np.ndarray
+    rms_px: float
+    cov: np.ndarray
+    iterations: int
+    converged: bool
+
+    def sigma(self) -> PoseParams:
+        return PoseParams.from_array(np.sqrt(np.maximum(np.diag(self.cov), 0.0)))
+
+    def extrinsics(self, x: float, y: float, epsg: int) -> Extrinsics:
+        p = self.params
+        return Extrinsics(x, y, p.z, p.yaw, p.pitch, p.roll, epsg)
+
+    def intrinsics(self, width: int, height: int) -> Intrinsics:
+        return Intrinsics.from_hfov(width, height, self.params.hfov_deg)
+
+
+def _rz(a: np.ndarray) -> np.ndarray:
+    c, s = np.cos(a), np.sin(a)
+    R = np.zeros(a.shape + (3, 3))
+    R[..., 0, 0] = c; R[..., 0, 1] = -s
+    R[..., 1, 0] = s; R[..., 1, 1] = c
+    R[..., 2, 2] = 1.0
+    return R
+
+
+def _ry(a: np.ndarray) -> np.ndarray:
+    c, s = np.cos(a), np.sin(a)
+    R = np.zeros(a.shape + (3, 3))
+    R[..., 0, 0] = c; R[..., 0, 2] = s
+    R[..., 1, 1] = 1.0
+    R[..., 2, 0] = -s; R[..., 2, 2] = c
+    return R
+
+
+def _model(theta: np.ndarray, ground: np.ndarray, cam_xy: Tuple[float, float],
+           pan: np.ndarray, tilt: np.ndarray, width: int, height: int,
+           jacobian: bool = True):
+    """Projected pixels ``(N, 2)``, camera depth ``(N,)`` and Jacobian ``(N, 2, 5)``."""
+
+    yaw, pitch, roll, hfov, z = theta
+    a = (90.0 - yaw - pan) * _DEG
+    b = (pitch - tilt) * _DEG
+    c = roll * _DEG
+    RzT = np.swapaxes(_rz(a), -1, -2)
+    RyT = np.swapaxes(_ry(b), -1, -2)
+    cr, sr = math.cos(c), math.sin(c)
+    RxT = np.array([[1, 0, 0], [0, cr, sr], [0, -sr, cr]], dtype=float)
+    A = _R0.T @ RxT  # constant part, (3, 3)
+
+    pw = ground - np.array([cam_xy[0], cam_xy[1], z])
+    q1 = np.einsum("nij,nj->ni", RzT, pw)       # Rz^T pw
+    q2 = np.einsum("nij,nj->ni", RyT, q1)       # Ry^T Rz^T pw
+    pc = q2 @ A.T                               # camera frame
+    X, Y, Z = pc[:, 0], pc[:, 1], pc[:, 2]
+    half = 0.5 * math.radians(hfov)
+    f = (0.5 * width) / math.tan(half)
+    Zs = np.where(np.abs(Z) > 1e-9, Z, 1e-9)
+    uv = np.column_stack([f * X / Zs + 0.5 * width, f * Y / Zs + 0.5 * height])
+    if not jacobian:
+        return uv, Z, None
+
+    # d pc / d angle, for the rotation angles a (yaw), b (pitch), c (roll)
+    d_a = np.einsum("ij,nj->ni", A, np.einsum("nij,nj->ni", RyT, -q1 @ _KZ.T))
+    d_b = -(q2 @ _KY.T) @ A.T
+    d_c = -(q2 @ RxT.T) @ _KX.T @ _R0
+    d_z = -RyT[:, :, 2] @ A.T  # Rz^T leaves the vertical axis unchanged
+    dpc = np.stack([-d_a * _DEG, d_b * _DEG, d_c * _DEG, np.zeros_like(pc), d_z], axis=-1)  # (N, 3, 5)
+
+    # Projection derivative (N, 2, 3)
+    P = np.zeros((len(pc), 2, 3))
+    P[:, 0, 0] = f / Zs
+    P[:, 0, 2] = -f * X / Zs ** 2
+    P[:, 1, 1] = f / Zs
+    P[:, 1, 2] = -f * Y / Zs ** 2
+    J = np.einsum("nij,njk->nik", P, dpc)
+    df = -(0.5 * width) / (2.0 * math.sin(half) ** 2) * _DEG
+    J[:, 0, 3] = df * X / Zs
+    J[:, 1, 3] = df * Y / Zs
+    return uv, Z, J
+
+
+def solve_pose(uv, ground, width: int, height: int, cam_xy: Tuple[float, float],
+               init: PoseParams, pan=0.0, tilt=0.0, fixed: Iterable[str] = (),
+               max_iter: int = 50, tol: float = 1e-10,
+               huber_px: Optional[float] = None) -> PoseFit:
+    """Estimate :class:`PoseParams` from tie points by Levenberg–Marquardt.
+
+    Parameters
+    ----------
+    uv:
+        ``(N, 2)`` observed pixels.
+    ground:
+        ``(N, 3)`` world points in the camera's CRS.
+    width, height:
+        Image size; the principal point is the image center and pixels are
+        square, as in :meth:`core.i2g_core.Intrinsics.from_hfov`.
+    cam_xy:
+        Known camera position in the world CRS.
+    init:
+        Starting estimate.
+    pan, tilt:
+        PTZ reading of each observation (scalars or ``(N,)``).
+    fixed:
+        Names from :data:`PARAM_NAMES` held at their initial value.
+    huber_px:
+        If given, observations are reweighted with a Huber loss of this
+        width so a few bad tie points do not dominate.
+    """
+
+    obs = np.asarray(uv, dtype=float).reshape(-1, 2)
+    pts = np.asarray(ground, dtype=float).reshape(-1, 3)
+    if len(obs) != len(pts):
+        raise ValueError("uv and ground must have the same number of points")
+    n = len(obs)
+    pan = np.broadcast_to(np.asarray(pan, dtype=float), (n,))
+    tilt = np.broadcast_to(np.asarray(tilt, dtype=float), (n,))
+    fixed = set(fixed)
+    unknown = [k for k in fixed if k not in PARAM_NAMES]
+    if unknown:
+        raise ValueError(f"unknown parameter(s): {unknown}")
+    free = np.array([name not in fixed for name in PARAM_NAMES])
+    if 2 * n < free.sum():
+        raise ValueError("not enough tie points for the free parameters")
+
+    def evaluate(theta, jacobian=True):
+        pred, depth, J = _model(theta, pts, cam_xy, pan, tilt, width, height, jacobian)
+        r = pred - obs
+        front = depth > 1e-6
+        e2 = np.sum(r * r, axis=1)
+        w = front.astype(float)
+        if huber_px is None:
+            c = float(np.sum(e2[front]))
+        else:
+            # IRLS weights of the Huber loss, and the loss itself
+            e = np.sqrt(e2)
+            big = e > huber_px
+            w = w * np.where(big, huber_px / np.maximum(e, 1e-12), 1.0)
+            c = float(np.sum(np.where(big, 2.0 * huber_px * e - huber_px ** 2, e2)[front]))
+        return r, w, front, J, c
+
+    theta = init.to_array()
+    r, w, front, J, c0 = evaluate(theta)
+    lam = 1e-3
+    converged = False
+    it = 0
+    for it in range(1, max_iter + 1):
+        Jf = J[:, :, free].reshape(-1, free.sum())
+        wf = np.repeat(w, 2)
+        rf = r.reshape(-1)
+        H = Jf.T @ (wf[:, None] * Jf)
+        g = Jf.T @ (wf * rf)
+        improved = False
+        while lam < 1e12:
+            step = np.linalg.solve(H + lam * np.diag(np.maximum(np.diag(H), 1e-12)), -g)
+            cand = theta.copy()
+            cand[free] += step
+            if not (0.1 < cand[3] < 179.0):
+                lam *= 10.0
+                continue
+            r2, w2, front2, J2, c1 = evaluate(cand)
+            if c1 <= c0:
+                improved = True
+                break
+            lam *= 10.0
+        if not improved:
+            converged = True
+            break
+        rel = (c0 - c1) / max(c0, 1e-300)
+        small = np.max(np.abs(step)) < 1e-9
+        theta, r, w, front, J, c0 = cand, r2, w2, front2, J2, c1
+        lam = max(lam / 10.0, 1e-12)
+        if rel < tol or small:
+            converged = True
+            break
+
+    # Covariance of the free parameters, scaled by the residual variance
+    Jf = J[:, :, free].reshape(-1, free.sum())
+    wf = np.repeat(w, 2)
+    H = Jf.T @ (wf[:, None] * Jf)
+    dof = max(2 * int(front.sum()) - int(free.sum()), 1)
+    s2 = float(np.sum(w[:, None] * r * r)) / dof
+    cov = np.zeros((5, 5))
+    try:
+        cov[np.ix_(free, free)] = np.linalg.inv(H) * s2
+    except np.linalg.LinAlgError:
+        cov[np.ix_(free, free)] = np.nan
+
+    res = r.copy()
+    res[~front] = np.nan
+    rms = float(np.sqrt(np.mean(np.sum(r[front] ** 2, axis=1)))) if front.any() else math.nan
+    return PoseFit(PoseParams.from_array(theta), res, rms, cov, it, converged)
+
+
+@dataclass
+class PoseSolver:
+    """Accumulates tie points and re-solves, warm-started from the last fit."""
+
+    width: int
+    height: int
+    cam_xy: Tuple[float, float]
+    estimate: PoseParams
+    fixed: Tuple[str, ...] = ()
+    huber_px: Optional[float] = None
+    _uv: List[Tuple[float, float]] = field(default_factory=list, repr=False)
+    _ground: List[Tuple[float, float, float]] = field(default_factory=list, repr=False)
+    _ptz: List[Tuple[float, float]] = field(default_factory=list, repr=False)
+    last_fit: Optional[PoseFit] = None
+
+    def __len__(self) -> int:
+        return len(self._uv)
+
+    def add(self, u: float, v: float, ground: Sequence[float], pan: float = 0.0, tilt: float = 0.0) -> None:
+        self._uv.append((float(u), float(v)))
+        self._ground.append(tuple(float(g) for g in ground[:3]))
+        self._ptz.append((float(pan), float(tilt)))
+
+    def clear(self) -> None:
+        self._uv.clear(); self._ground.clear(); self._ptz.clear()
+        self.last_fit = None
+
+    def solve(self, **kwargs) -> Optional[PoseFit]:
+        """Solve with all points so far; ``None`` while there are too few."""
+
+        free = len(PARAM_NAMES) - len(set(self.fixed))
+        if 2 * len(self._uv) < free:
+            return None
+        ptz = np.asarray(self._ptz, dtype=float)
+        fit = solve_pose(self._uv, self._ground, self.width, self.height, self.cam_xy,
+                         self.estimate, pan=ptz[:, 0], tilt=ptz[:, 1], fixed=self.fixed,
+                         huber_px=self.huber_px, **kwargs)
+        self.estimate = fit.params
+        self.last_fit = fit
+        return fit
@@ -0,0 +1,384 @@
+"""Polar range image of the terrain around a fixed PTZ mount.
+
+For a camera that never moves, the distance to the terrain along a world
+direction is fixed.  A :class:`RangeImage` stores that distance on a regular
+``(elevation, azimuth)`` grid covering the mount's pan/tilt envelope, so a
+pixel ray is answered by a table lookup: the ranges of the four grid
+directions around the ray bracket the hit, and a short bisection on the DEM
+inside that bracket gives the exact point.  Directions whose neighbours all
+see sky are rejected without touching the DEM; brackets that straddle a
+ridge or the horizon fall back to a march over the bracketed stretch.
+
+:func:`build_range_image` casts all grid directions once, in parallel across
+elevation bands, and the result is kept as an ``.npz`` file next to the
+calibration bundle.  :func:`range_image_from_viewshed` instead reads the
+ranges off a :class:`core.viewshed.Viewshed` horizon profile, so a camera
+position needs only one terrain sweep.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+import math
+import multiprocessing
+import os
+import numpy as np
+
+from core.dem_grid import (
+    BilinearDemSampler,
+    GridDemSampler,
+    attach_shared_grid,
+    read_window,
+    shared_grid,
+)
+from core.i2g_core import DemSampler, intersect_ray_with_dem, intersect_rays_with_dem
+
+# Elevation rows cast per worker task
+_BAND_ROWS = 32
+
+
+def direction_from_angles(az_deg, el_deg) -> np.ndarray:
+    """Unit direction(s) for compass azimuth and elevation angles (degrees)."""
+
+    az = np.radians(np.asarray(az_deg, dtype=float))
+    el = np.radians(np.asarray(el_deg, dtype=float))
+    ce = np.cos(el)
+    return np.stack([ce * np.sin(az), ce * np.cos(az), np.sin(el)], axis=-1)
+
+
+def angles_from_direction(d) -> Tuple[float, float]:
+    """Compass azimuth in ``[0, 360)`` and elevation of a direction (degrees)."""
+
+    d = np.asarray(d, dtype=float)
+    az = math.degrees(math.atan2(d[0], d[1])) % 360.0
+    el = math.degrees(math.atan2(d[2], math.hypot(d[0], d[1])))
+    return az, el
+
+
+class RangeImage:
+    """Terrain range for a grid of directions from one mount position.
+
+    ``ranges[i, j]`` is the ray parameter (CRS units along the unit
+    direction, as in :func:`core.i2g_core.intersect_ray_with_dem`) of the
+    first terrain hit in direction ``(az0 + j*res_deg, el0 + i*res_deg)``;
+    ``NaN`` means no hit within range.  When the azimuth span is a full turn
+    the grid wraps around.  A non-zero ``cell`` marks ranges that are lower
+    bounds, accurate to ``cell`` CRS units of horizontal distance.
+    """
+
+    def __init__(self, origin: Sequence[float], az0: float, el0: float, res_deg: float,
+                 ranges: np.ndarray, max_range: float, meters_per_unit: float = 1.0,
+                 cell: float = 0.0) -> None:
+        self.origin = np.asarray(origin, dtype=float)[:3].copy()
+        self.az0 = float(az0) % 360.0
+        self.el0 = float(el0)
+        self.res_deg = float(res_deg)
+        self.ranges = ranges
+        self.max_range = float(max_range)
+        self.meters_per_unit = float(meters_per_unit)
+        self.cell = float(cell)
+
+    @property
+    def wraps(self) -> bool:
+        return self.ranges.shape[1] * self.res_deg >= 360.0 - 1e-9
+
+    def matches(self, origin, tol_m: float = 0.5) -> bool:
+        """Whether the image was built from ``origin``."""
+
+        o = np.asarray(origin, dtype=float)[:3]
+        dxy = math.hypot(o[0] - self.origin[0], o[1] - self.origin[1]) * self.meters_per_unit
+        return dxy <= tol_m and abs(o[2] - self.origin[2]) <= tol_m
+
+    def _cell(self, direction) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Grid rows/columns of the four directions around ``direction``."""
+
+        az, el = angles_from_direction(direction)
+        n_el, n_az = self.ranges.shape
+        fi = (el - self.el0) / self.res_deg
+        fj = ((az - self.az0) % 360.0) / self.res_deg
+        if not (0.0 <= fi <= n_el - 1):
+            return None
+        if not self.wraps and fj > n_az - 1:
+            return None
+        i0 = min(int(math.floor(fi)), max(n_el - 2, 0))
+        j0 = int(math.floor(fj))
+        rows = np.array([i0, min(i0 + 1, n_el - 1)])
+        cols = np.array([j0, j0 + 1]) % n_az if self.wraps else np.minimum([j0, j0 + 1], n_az - 1)
+        return rows, cols
+
+    def covers(self, direction) -> bool:
+        """Whether ``direction`` lies inside the image's pan/tilt envelope."""
+
+        return self._cell(direction) is not None
+
+    def bracket(self, direction) -> Optional[Tuple[float, float]]:
+        """Ray parameter interval that contains the hit, from the grid.
+
+        Returns ``None`` when all four neighbouring directions miss the
+        terrain and ``(t0, inf)`` when only some of them do.
+        """
+
+        cell = self._cell(direction)
+        if cell is None:
+            raise ValueError("direction outside the range image envelope")
+        rows, cols = cell
+        r = self.ranges[np.ix_(rows, cols)].astype(float)
+        hit = np.isfinite(r)
+        if not hit.any():
+            return None
+        t0 = float(r[hit].min())
+        t1 = float(r[hit].max()) if hit.all() else math.inf
+        return t0, t1
+
+    def intersect(self, ray_dir, dem: DemSampler, margin_m: float = 5.0,
+                  refine_steps: int = 30) -> Optional[Tuple[float, float, float]]:
+        """Ground point along a ray from the image origin.
+
+        The bracket from :meth:`bracket`, widened by ``margin_m``, is
+        bisected on the DEM.  When the bracket does not enclose a single
+        crossing the stretch is marched instead.
+        """
+
+        d = np.asarray(ray_dir, dtype=float)
+        d = d / np.linalg.norm(d)
+        br = self.bracket(d)
+        if br is None:
+            return None
+        margin = margin_m / self.meters_per_unit
+        if self.cell:
+            # Lower-bound ranges: the hit may lie one cell further out
+            h = math.hypot(d[0], d[1])
+            margin += self.cell / h if h > 1e-12 else math.inf
+        lo = max(br[0] - margin_m / self.meters_per_unit, 0.0)
+        hi = min(br[1] + margin, self.max_range)
+        o = self.origin
+
+        def height_above(t: float) -> float:
+            p = o + d * t
+            z = dem.elevation(float(p[0]), float(p[1]))
+            return math.nan if z is None else float(p[2] - z)
+
+        f_lo, f_hi = height_above(lo), height_above(hi)
+        if not (f_lo > 0.0 and f_hi <= 0.0):
+            # Ridge or horizon inside the cell: march the bracketed stretch,
+            # from the mount if the bracket already starts below ground
+            if not f_lo > 0.0:
+                lo = 0.0
+            hit = intersect_ray_with_dem(o + d * lo, d, dem,
+                                         max_range_m=(self.max_range - lo) * self.meters_per_unit,
+                                         step_m=margin_m)
+            return hit
+        for _ in range(refine_steps):
+            mid = 0.5 * (lo + hi)
+            f = height_above(mid)
+            if math.isnan(f) or f > 0.0:
+                lo = mid
+            else:
+                hi = mid
+        p = o + d * hi
+        z = dem.elevation(float(p[0]), float(p[1]))
+        return float(p[0]), float(p[1]), float(p[2] if z is None else z)
+
+    # ----- persistence -----
+    def save(self, path, stamp: str = "") -> None:
+        with open(path, "wb") as f:
+            np.savez(f, origin=self.origin, grid=np.array([self.az0, self.el0, self.res_deg]),
+                     ranges=self.ranges, max_range=np.array(self.max_range),
+                     meters_per_unit=np.array(self.meters_per_unit), cell=np.array(self.cell),
+                     stamp=np.array(stamp))
+
+    @classmethod
+    def load(cls, path, stamp: Optional[str] = None) -> Optional["RangeImage"]:
+        """Load a saved image, or ``None`` if missing, stale or unreadable."""
+
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                if stamp is not None and str(z["stamp"]) != stamp:
+                    return None
+                az0, el0, res = (float(v) for v in z["grid"])
+                cell = float(z["cell"]) if "cell" in z.files else 0.0
+                return cls(z["origin"], az0, el0, res, z["ranges"], float(z["max_range"]),
+                           float(z["meters_per_unit"]), cell)
+        except Exception:
+            return None
+
+
+# Band workers map the DEM window from shared memory (see shared_grid)
+_worker_dem: Optional[GridDemSampler] = None
+
+
+def _init_worker(handle: Tuple) -> None:
+    global _worker_dem
+    _worker_dem = attach_shared_grid(handle)
+
+
+def _cast_band(dem: DemSampler, origin: np.ndarray, az: np.ndarray, el: np.ndarray,
+               max_range_m: float, step_m: float) -> np.ndarray:
+    """Ranges ``(len(el), len(az))`` for one elevation band."""
+
+    ee, aa = np.meshgrid(el, az, indexing="ij")
+    dirs = direction_from_angles(aa, ee).reshape(-1, 3)
+    hits = intersect_rays_with_dem(origin, dirs, dem, max_range_m=max_range_m, step_m=step_m)
+    t = np.einsum("ij,ij->i", hits - origin, dirs)
+    return t.reshape(ee.shape).astype(np.float32)
+
+
+def _cast_band_worker(origin, az, el, max_range_m, step_m) -> np.ndarray:
+    return _cast_band(_worker_dem, origin, az, el, max_range_m, step_m)
+
+
+def build_range_image(dem: BilinearDemSampler, origin: Sequence[float],
+                      az_range: Tuple[float, float] = (0.0, 360.0),
+                      el_range: Tuple[float, float] = (-90.0, 10.0),
+                      res_deg: float = 0.05, max_range_m: float = 5000.0,
+                      step_m: Optional[float] = None,
+                      workers: Optional[int] = None) -> RangeImage:
+    """Cast the direction grid from ``origin`` against ``dem``.
+
+    Parameters
+    ----------
+    az_range, el_range:
+        Pan/tilt envelope in degrees (compass azimuth, elevation above the
+        horizontal).  A 360° azimuth span wraps.
+    res_deg:
+        Angular grid spacing.
+    step_m:
+        March step of the batched intersection; defaults to the DEM cell
+        size.
+    workers:
+        Processes casting elevation bands; ``1`` casts in this process.
+        Defaults to the CPU count, capped at 4.
+    """
+
+    o = np.asarray(origin, dtype=float)[:3]
+    mpu = dem.meters_per_unit
+    a, b, _, d, e, _ = dem.transform
+    cell_m = min(math.hypot(a, d), math.hypot(b, e)) * mpu
+    if step_m is None:
+        step_m = cell_m
+    win, _ = read_window(dem, o[0], o[1], max_range_m / mpu)
+
+    span = min(float(az_range[1]) - float(az_range[0]), 360.0)
+    n_az = max(int(round(span / res_deg)) + (0 if span >= 360.0 else 1), 1)
+    n_el = max(int(round((el_range[1] - el_range[0]) / res_deg)) + 1, 1)
+    az = az_range[0] + res_deg * np.arange(n_az)
+    el = el_range[0] + res_deg * np.arange(n_el)
+    ranges = np.full((n_el, n_az), np.nan, dtype=np.float32)
+
+    # Directions steeper than the highest terrain slope around the mount
+    # can never hit; leave them as sky without marching
+    cc, rr = np.meshgrid(np.arange(win.shape[1], dtype=float), np.arange(win.shape[0], dtype=float))
+    xs, ys = win.world_coords(cc, rr)
+    dist = np.hypot(xs - o[0], ys - o[1]) * mpu
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = np.where(dist >= 0.5 * cell_m, (win.array - o[2]) / np.maximum(dist, 1e-9), -np.inf)
+    s_max = float(np.nanmax(slope)) if np.isfinite(slope).any() else -np.inf
+    n_cast = int(np.searchsorted(el, math.degrees(math.atan(s_max)), side="right")) + 1 \
+        if math.isfinite(s_max) else 0
+    n_cast = min(n_cast, n_el)
+
+    bands = [(i0, min(i0 + _BAND_ROWS, n_cast)) for i0 in range(0, n_cast, _BAND_ROWS)]
+    if workers is None:
+        workers = min(os.cpu_count() or 1, 4)
+    if workers > 1 and len(bands) > 1:
+        # Spawned workers: forking a process that runs GUI threads is unsafe
+        ctx = multiprocessing.get_context("spawn")
+        with shared_grid(win) as handle, \
+                ProcessPoolExecutor(max_workers=int(workers), mp_context=ctx,
+                                    initializer=_init_worker, initargs=(handle,)) as pool:
+            n = len(bands)
+            parts = pool.map(_cast_band_worker, [o] * n, [az] * n, [el[i0:i1] for i0, i1 in bands],
+                             [max_range_m] * n, [step_m] * n)
+            for (i0, i1), part in zip(bands, parts):
+                ranges[i0:i1] = part
+    else:
+        for i0, i1 in bands:
+            ranges[i0:i1] = _cast_band(win, o, az, el[i0:i1], max_range_m, step_m)
+
+    return RangeImage(o, az[0], el[0], res_deg, ranges, max_range_m / mpu, mpu)
+
+
+def range_image_from_viewshed(vs, az_range: Tuple[float, float] = (0.0, 360.0),
+                              el_range: Tuple[float, float] = (-90.0, 10.0),
+                              res_deg: float = 0.05) -> RangeImage:
+    """Read a range image off a viewshed's horizon profile.
+
+    A direction with slope ``s`` first meets terrain at the first sweep
+    radius whose horizon reaches ``s`` (see :class:`core.viewshed.Viewshed`),
+    so no rays are cast.  The ranges are lower bounds of the hit, one sweep
+    step short at most; :meth:`RangeImage.intersect` widens its bracket by
+    that step.
+
+    Parameters
+    ----------
+    vs:
+        :class:`core.viewshed.Viewshed` of the mount position.
+    az_range, el_range, res_deg:
+        Direction grid, as in :func:`build_range_image`.
+    """
+
+    span = min(float(az_range[1]) - float(az_range[0]), 360.0)
+    n_az = max(int(round(span / res_deg)) + (0 if span >= 360.0 else 1), 1)
+    n_el = max(int(round((el_range[1] - el_range[0]) / res_deg)) + 1, 1)
+    az = az_range[0] + res_deg * np.arange(n_az)
+    el = el_range[0] + res_deg * np.arange(n_el)
+
+    a = np.radians(az)
+    bins, cols = np.unique(vs._bins(np.sin(a), np.cos(a)), return_inverse=True)
+    e = np.radians(el)
+    h = np.cos(e)
+    with np.errstate(divide="ignore"):
+        s = np.sin(e) / (np.maximum(h, 0.0) * vs.meters_per_unit)
+    first = np.empty((n_el, len(bins)), dtype=np.intp)
+    for c, k in enumerate(bins):
+        first[:, c] = np.searchsorted(vs.horizon[k], s, side="left")
+    first = first[:, cols.ravel()]
+
+    n_r = vs.horizon.shape[1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ranges = np.where(first > 0, first * vs.step / h[:, None], 0.0).astype(np.float32)
+    ranges[first >= n_r] = np.nan
+    return RangeImage(vs.origin, az[0], el[0], res_deg, ranges, vs.max_range,
+                      vs.meters_per_unit, cell=vs.step)
+
+
+def load_or_build_range_image(dem: BilinearDemSampler, origin: Sequence[float], path,
+                              stamp: str = "", **kwargs) -> RangeImage:
+    """Reuse the file at ``path`` when valid for ``origin``, otherwise rebuild it."""
+
+    img = RangeImage.load(path, stamp) if Path(path).exists() else None
+    if img is None or not img.matches(origin):
+        img = build_range_image(dem, origin, **kwargs)
+        try:
+            img.save(path, stamp)
+        except OSError:
+            pass
+    return img
+
+
+_background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="range-image")
+
+
+def start_range_image(dem: BilinearDemSampler, origin: Sequence[float], path=None,
+                      stamp: str = "", **kwargs) -> "Future[RangeImage]":
+    """Build (or load) a range image in a background thread."""
+
+    if path is None:
+        return _background.submit(build_range_image, dem, origin, **kwargs)
+    return _background.submit(load_or_build_range_image, dem, origin, path, stamp, **kwargs)
+
+
+def _derive(viewshed: "Future", kwargs) -> RangeImage:
+    return range_image_from_viewshed(viewshed.result(), **kwargs)
+
+
+def start_range_image_from_viewshed(viewshed: "Future", **kwargs) -> "Future[RangeImage]":
+    """Derive a range image once a background viewshed job has finished.
+
+    ``viewshed`` is the future returned by :func:`core.viewshed.start_viewshed`;
+    keyword arguments go to :func:`range_image_from_viewshed`.
+    """
+
+    return _background.submit(_derive, viewshed, kwargs)
@@ -0,0 +1,267 @@
+"""Lens-distortion-aware ray lookup via precomputed undistortion maps.
+
+The Brown–Conrady model used by the calibration files (``k1, k2, p1, p2,
+k3``) maps undistorted normalized coordinates to distorted pixels; going the
+other way needs an iterative solve per pixel.  A *ray map* stores the result
+of that solve for every pixel of one resolution as an ``(H, W, 2)`` float32
+array of normalized camera coordinates ``(x, y)`` – the ray through pixel
+``(u, v)`` is ``(x, y, 1)``.  Maps are computed once per calibration and
+stored as ``.npy`` files that later sessions memory-map, keyed by a hash of
+the calibration.  A :class:`RayMap` reuses one map for other focal lengths
+(e.g. while zooming) by rescaling its rays, so the map is built once per
+calibration and resolution; :func:`start_ray_map` builds it off the caller's
+thread.  The cache directory is trimmed to :data:`MAX_CACHE_BYTES`, least
+recently used maps first.
+
+Pass a map (array or :class:`RayMap`) as ``ray_map`` to :func:`core.i2g_core.image_ray`,
+:func:`core.i2g_core.image_rays` or :func:`geom3d.camera_ray_in_world`.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Sequence, Tuple, Union
+import hashlib
+import json
+import numpy as np
+
+from core import filecache
+
+# Size budget of the default cache
+MAX_CACHE_BYTES = 512 * 1024 ** 2
+
+DistLike = Union[Sequence[float], object, None]
+
+
+def distortion_coeffs(dist: DistLike) -> Tuple[float, float, float, float, float]:
+    """Return ``(k1, k2, p1, p2, k3)`` from a ``Distortion``-like object or sequence.
+
+    ``None`` and missing terms are treated as zero.
+    """
+
+    if dist is None:
+        return (0.0, 0.0, 0.0, 0.0, 0.0)
+    if hasattr(dist, "k1"):
+        vals = [getattr(dist, k, None) for k in ("k1", "k2", "p1", "p2", "k3")]
+    else:
+        vals = list(dist)[:5]
+        vals += [0.0] * (5 - len(vals))
+    k1, k2, p1, p2, k3 = (float(v) if v is not None else 0.0 for v in vals)
+    return k1, k2, p1, p2, k3
+
+
+def distort_normalized(x, y, dist: DistLike) -> Tuple[np.ndarray, np.ndarray]:
+    """Apply the distortion model to normalized coordinates."""
+
+    k1, k2, p1, p2, k3 = distortion_coeffs(dist)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    r2 = x * x + y * y
+    radial = 1.0 + r2 * (k1 + r2 * (k2 + r2 * k3))
+    xd = x * radial + 2.0 * p1 * x * y + p2 * (r2 + 2.0 * x * x)
+    yd = y * radial + p1 * (r2 + 2.0 * y * y) + 2.0 * p2 * x * y
+    return xd, yd
+
+
+def undistort_points(us, vs, fx: float, fy: float, cx: float, cy: float,
+                     dist: DistLike, iterations: int = 20,
+                     init: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Normalized undistorted coordinates for pixel arrays.
+
+    Uses the usual fixed-point iteration, vectorized over all points.
+    ``init`` is an optional starting guess ``(x, y)``; with a close guess
+    a few iterations suffice.
+    """
+
+    xd = (np.asarray(us, dtype=float) - cx) / fx
+    yd = (np.asarray(vs, dtype=float) - cy) / fy
+    k1, k2, p1, p2, k3 = distortion_coeffs(dist)
+    if not any((k1, k2, p1, p2, k3)):
+        return xd, yd
+    if init is None:
+        x, y = xd.copy(), yd.copy()
+    else:
+        x, y = (np.broadcast_to(np.asarray(a, dtype=float), xd.shape) for a in init)
+    for _ in range(iterations):
+        r2 = x * x + y * y
+        radial = 1.0 + r2 * (k1 + r2 * (k2 + r2 * k3))
+        dx = 2.0 * p1 * x * y + p2 * (r2 + 2.0 * x * x)
+        dy = p1 * (r2 + 2.0 * y * y) + 2.0 * p2 * x * y
+        x = (xd - dx) / radial
+        y = (yd - dy) / radial
+    return x, y
+
+
+def compute_ray_map(width: int, height: int, fx: float, fy: float, cx: float, cy: float,
+                    dist: DistLike, iterations: int = 20) -> np.ndarray:
+    """Build the ``(height, width, 2)`` float32 normalized-ray map."""
+
+    out = np.empty((int(height), int(width), 2), dtype=np.float32)
+    us = np.arange(int(width), dtype=float)
+    # Row blocks keep the float64 temporaries small for large frames
+    block = max(1, 262144 // max(int(width), 1))
+    for r0 in range(0, int(height), block):
+        r1 = min(r0 + block, int(height))
+        uu, vv = np.meshgrid(us, np.arange(r0, r1, dtype=float))
+        x, y = undistort_points(uu, vv, fx, fy, cx, cy, dist, iterations)
+        out[r0:r1, :, 0] = x
+        out[r0:r1, :, 1] = y
+    return out
+
+
+def calibration_key(width: int, height: int, fx: float, fy: float, cx: float, cy: float,
+                    dist: DistLike) -> str:
+    """Stable hash identifying a ray map's calibration."""
+
+    payload = {
+        "size": [int(width), int(height)],
+        "K": [round(float(v), 9) for v in (fx, fy, cx, cy)],
+        "dist": [round(v, 12) for v in distortion_coeffs(dist)],
+    }
+    text = json.dumps(payload, sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def default_cache_dir() -> Path:
+    """``raymaps`` under :func:`core.filecache.cache_root`."""
+
+    return filecache.cache_root() / "raymaps"
+
+
+def load_ray_map(width: int, height: int, fx: float, fy: float, cx: float, cy: float,
+                 dist: DistLike, cache_dir: Optional[Union[str, Path]] = None) -> np.ndarray:
+    """Return the ray map for a calibration, memory-mapped from the cache.
+
+    The map is computed and written on first use.  When the cache directory
+    is not writable the freshly computed in-memory map is returned.
+    """
+
+    cache = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+    key = calibration_key(width, height, fx, fy, cx, cy, dist)
+    path = cache / f"raymap_{int(width)}x{int(height)}_{key}.npy"
+    if path.exists():
+        try:
+            arr = np.load(path, mmap_mode="r")
+            if arr.shape == (int(height), int(width), 2) and arr.dtype == np.float32:
+                filecache.touch(path)
+                return arr
+        except Exception:
+            pass
+    ray_map = compute_ray_map(width, height, fx, fy, cx, cy, dist)
+    try:
+        filecache.atomic_write(path, lambda f: np.save(f, ray_map))
+        prune_cache(cache, keep=path)
+        return np.load(path, mmap_mode="r")
+    except OSError:
+        return ray_map
+
+
+def prune_cache(cache_dir: Optional[Union[str, Path]] = None, max_bytes: Optional[int] = None,
+                keep: Optional[Path] = None) -> int:
+    """Delete least recently used ray maps until the cache fits ``max_bytes``.
+
+    ``keep`` is never deleted.  Returns the number of files removed.
+    """
+
+    cache = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+    budget = MAX_CACHE_BYTES if max_bytes is None else int(max_bytes)
+    return filecache.prune(cache, budget, "raymap_*.npy", keep=keep)[0]
+
+
+_background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="raymap")
+
+
+def start_ray_map(width: int, height: int, fx: float, fy: float, cx: float, cy: float,
+                  dist: DistLike, cache_dir: Optional[Union[str, Path]] = None) -> "Future[np.ndarray]":
+    """Load or compute a ray map (see :func:`load_ray_map`) in a background thread."""
+
+    return _background.submit(load_ray_map, width, height, fx, fy, cx, cy, dist, cache_dir)
+
+
+class RayMap:
+    """A ray map looked up for a (possibly different) camera calibration.
+
+    ``array`` holds the normalized rays of the base calibration ``K0 = (fx,
+    fy, cx, cy)`` with distortion ``dist0``, and ``key`` its
+    :func:`calibration_key`.  Lookups answer for the target calibration
+    ``K``/``dist``:
+
+    * another focal length or principal point rescales the base rays –
+      the distortion is taken as fixed in pixel space, so each pixel keeps
+      its undistorted pixel offset;
+    * another distortion (``dist`` measured at ``K``, e.g. from a zoom
+      table) is solved exactly, starting from the rescaled rays.
+
+    Without an ``array`` every lookup is solved from scratch.  Instances
+    are immutable; :attr:`cache_key` identifies the rays they produce.
+    """
+
+    __slots__ = ("array", "key", "K0", "dist0", "K", "dist")
+
+    def __init__(self, array: Optional[np.ndarray], key: Optional[str],
+                 K0: Sequence[float], dist0: DistLike,
+                 K: Optional[Sequence[float]] = None, dist: DistLike = None) -> None:
+        K0 = tuple(float(v) for v in K0)
+        dist0 = distortion_coeffs(dist0)
+        for name, val in (
+            ("array", array), ("key", key if array is not None else None),
+            ("K0", K0), ("dist0", dist0),
+            ("K", K0 if K is None else tuple(float(v) for v in K)),
+            ("dist", dist0 if dist is None else distortion_coeffs(dist)),
+        ):
+            object.__setattr__(self, name, val)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RayMap is immutable")
+
+    @property
+    def cache_key(self) -> tuple:
+        return (self.key, self.K, self.dist)
+
+    def rescaled(self, fx: float, fy: float, cx: float, cy: float, dist: DistLike = None) -> "RayMap":
+        """The same base map looked up for intrinsics ``fx, fy, cx, cy`` (and ``dist``)."""
+
+        return RayMap(self.array, self.key, self.K0, self.dist0, (fx, fy, cx, cy),
+                      self.dist0 if dist is None else dist)
+
+    def lookup(self, us, vs) -> Tuple[np.ndarray, np.ndarray]:
+        fx, fy, cx, cy = self.K
+        if self.array is None:
+            return undistort_points(us, vs, fx, fy, cx, cy, self.dist)
+        x, y = _lookup_array(self.array, us, vs)
+        if self.K != self.K0:
+            fx0, fy0, cx0, cy0 = self.K0
+            x = (x * fx0 + cx0 - cx) / fx
+            y = (y * fy0 + cy0 - cy) / fy
+        if self.dist != self.dist0:
+            x, y = undistort_points(us, vs, fx, fy, cx, cy, self.dist, iterations=6, init=(x, y))
+        return x, y
+
+
+def lookup_rays(ray_map: Union[np.ndarray, RayMap], us, vs) -> Tuple[np.ndarray, np.ndarray]:
+    """Normalized ``(x, y)`` for pixel coordinates from a ray map.
+
+    Integer pixels are a plain index; fractional ones are bilinearly
+    interpolated.  Coordinates are clamped to the map's extent.
+    """
+
+    if isinstance(ray_map, RayMap):
+        return ray_map.lookup(us, vs)
+    return _lookup_array(ray_map, us, vs)
+
+
+def _lookup_array(ray_map: np.ndarray, us, vs) -> Tuple[np.ndarray, np.ndarray]:
+    h, w = ray_map.shape[:2]
+    u = np.clip(np.asarray(us, dtype=float), 0.0, w - 1.0)
+    v = np.clip(np.asarray(vs, dtype=float), 0.0, h - 1.0)
+    j0 = np.minimum(np.floor(u).astype(np.intp), max(w - 2, 0))
+    i0 = np.minimum(np.floor(v).astype(np.intp), max(h - 2, 0))
+    fx = (u - j0)[..., None]
+    fy = (v - i0)[..., None]
+    j1 = np.minimum(j0 + 1, w - 1)
+    i1 = np.minimum(i0 + 1, h - 1)
+    m = (ray_map[i0, j0] * (1 - fx) * (1 - fy) + ray_map[i0, j1] * fx * (1 - fy)
+         + ray_map[i1, j0] * (1 - fx) * fy + ray_map[i1, j1] * fx * fy)
+    m = np.asarray(m, dtype=float)
+    return m[..., 0], m[..., 1]
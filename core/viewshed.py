@@ -0,0 +1,417 @@
+"""Viewshed of a fixed camera position over a DEM.
+
+:func:`compute_viewshed` performs a radial sweep around the camera: terrain
+is sampled along ``n_azimuth`` rays at one-cell radial spacing and, for each
+azimuth, the running maximum of the terrain's elevation angle (stored as a
+slope ``dz / horizontal distance``) is accumulated outward.  This *horizon
+profile* answers the two questions picks need without marching a ray:
+
+* a target is visible when its slope is not below the horizon in front of it;
+* a line of sight with slope ``s`` first meets terrain at the first radius
+  whose horizon reaches ``s`` – a binary search, since the profile is
+  non-decreasing.
+
+Azimuth sectors are swept in a process pool.  The result also carries
+rasters on the DEM grid – a visibility mask and the horizontal distance to
+the first terrain hit along each cell's line of sight – and can be stored as
+an ``.npz`` file.  :func:`load_cached_viewshed` keeps them in an application
+cache directory keyed by the DEM and the camera position, trimmed to
+:data:`MAX_CACHE_BYTES`, least recently used first.
+
+Pass a :class:`Viewshed` as ``viewshed`` to
+:func:`core.i2g_core.intersect_ray_with_dem` to clamp its search to the
+range where the ray can hit and to reject rays that cannot hit at all.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Sequence, Tuple, Union
+import hashlib
+import math
+import multiprocessing
+import os
+import numpy as np
+
+from core import filecache
+from core.dem_grid import (
+    BilinearDemSampler,
+    GridDemSampler,
+    attach_shared_grid,
+    read_window,
+    shared_grid,
+)
+
+# Upper bound on the default number of sweep azimuths
+MAX_AZIMUTHS = 3600
+
+# Size budget of the cache used by load_cached_viewshed
+MAX_CACHE_BYTES = 1024 ** 3
+
+# Rows of the raster window classified per block
+_RASTER_BLOCK = 256
+
+
+def _sweep(dem: BilinearDemSampler, origin: np.ndarray, azimuths: np.ndarray,
+           step: float, n_r: int) -> np.ndarray:
+    """Horizon profile ``(len(azimuths), n_r)`` for a block of azimuths."""
+
+    radii = step * np.arange(1, n_r + 1, dtype=float)
+    xs = origin[0] + np.sin(azimuths)[:, None] * radii
+    ys = origin[1] + np.cos(azimuths)[:, None] * radii
+    z = dem.elevations(xs, ys)
+    slope = (z - origin[2]) / (radii * dem.meters_per_unit)
+    slope[np.isnan(slope)] = -np.inf
+    return np.maximum.accumulate(slope, axis=1).astype(np.float32)
+
+
+# Sector workers map the DEM window from shared memory (see shared_grid)
+_worker_dem: Optional[GridDemSampler] = None
+
+
+def _init_worker(handle: Tuple) -> None:
+    global _worker_dem
+    _worker_dem = attach_shared_grid(handle)
+
+
+def _sweep_sector(origin: np.ndarray, azimuths: np.ndarray, step: float, n_r: int) -> np.ndarray:
+    return _sweep(_worker_dem, origin, azimuths, step, n_r)
+
+
+def _first_at_least(horizon: np.ndarray, k: np.ndarray, s: np.ndarray) -> np.ndarray:
+    """Index of the first radius in rows ``k`` whose horizon is ``>= s``.
+
+    Rows are non-decreasing, so this is a vectorized binary search.  Rows
+    that never reach ``s`` yield ``n_r``.
+    """
+
+    n_r = horizon.shape[1]
+    lo = np.zeros(k.shape, dtype=np.intp)
+    hi = np.full(k.shape, n_r, dtype=np.intp)
+    for _ in range(max(int(n_r).bit_length(), 1)):
+        mid = (lo + hi) // 2
+        ok = horizon[k, np.minimum(mid, n_r - 1)] >= s
+        go_left = ok & (lo < hi)
+        hi = np.where(go_left, mid, hi)
+        lo = np.where(~ok & (lo < hi), mid + 1, lo)
+    return lo
+
+
+class Viewshed:
+    """Horizon profile and visibility rasters for one camera position.
+
+    ``horizon[k, i]`` is the largest terrain slope seen along azimuth
+    ``k`` (clockwise from grid north, ``2π k / n_azimuth``) up to radius
+    ``(i + 1) * step``.  ``visible`` and ``distance`` cover the DEM window
+    ``window = (row0, col0)`` of shape ``visible.shape`` with
+    ``transform``; ``distance`` is in meters and ``NaN`` where the DEM has
+    no data or the cell lies outside the swept range.
+    """
+
+    def __init__(self, origin: Sequence[float], step: float, meters_per_unit: float,
+                 horizon: np.ndarray, visible: np.ndarray, distance: np.ndarray,
+                 window: Tuple[int, int], transform: Sequence[float]) -> None:
+        self.origin = np.asarray(origin, dtype=float)[:3].copy()
+        self.step = float(step)
+        self.meters_per_unit = float(meters_per_unit)
+        self.horizon = horizon
+        self.visible = visible
+        self.distance = distance
+        self.window = (int(window[0]), int(window[1]))
+        self.transform = tuple(float(v) for v in transform)
+
+    @property
+    def n_azimuth(self) -> int:
+        return self.horizon.shape[0]
+
+    @property
+    def max_range(self) -> float:
+        """Swept range in CRS units."""
+
+        return self.step * self.horizon.shape[1]
+
+    def matches(self, origin, tol_m: float = 0.5) -> bool:
+        """Whether the viewshed was computed from ``origin``."""
+
+        o = np.asarray(origin, dtype=float)[:3]
+        dxy = math.hypot(o[0] - self.origin[0], o[1] - self.origin[1]) * self.meters_per_unit
+        return dxy <= tol_m and abs(o[2] - self.origin[2]) <= tol_m
+
+    # ----- queries -----
+    def _bins(self, dx, dy) -> np.ndarray:
+        az = np.mod(np.arctan2(dx, dy), 2.0 * math.pi)
+        return np.rint(az * (self.n_azimuth / (2.0 * math.pi))).astype(np.intp) % self.n_azimuth
+
+    def _horizon_low(self, k: np.ndarray, i: np.ndarray) -> np.ndarray:
+        """Lowest horizon of bin ``k`` and its two neighbours at radius ``i``."""
+
+        n = self.n_azimuth
+        h = self.horizon
+        return np.minimum(np.minimum(h[(k - 1) % n, i], h[k, i]), h[(k + 1) % n, i])
+
+    def is_visible(self, points, tol_m: float = 2.0) -> np.ndarray:
+        """Visibility of world points ``(N, 3)`` from the viewshed origin.
+
+        A point is hidden when the horizon in front of it rises more than
+        ``tol_m`` above its line of sight in all three nearest azimuth bins.
+        Points beyond the swept range are reported visible (unknown).
+        """
+
+        p = np.array(points, dtype=float, ndmin=2)
+        dx = p[:, 0] - self.origin[0]
+        dy = p[:, 1] - self.origin[1]
+        r = np.hypot(dx, dy)
+        # Skip the samples right next to the point itself
+        i = np.floor(r / self.step).astype(np.intp) - 2
+        out = np.ones(len(p), dtype=bool)
+        check = (i >= 0) & (r <= self.max_range)
+        if check.any():
+            rm = r[check] * self.meters_per_unit
+            s = (p[check, 2] - self.origin[2] + tol_m) / rm
+            k = self._bins(dx[check], dy[check])
+            out[check] = self._horizon_low(k, i[check]) <= s
+        return out
+
+    def ray_bounds(self, direction) -> Tuple[float, float]:
+        """Ray parameters ``(t0, t1)`` between which a ray from the origin can hit.
+
+        ``t`` is measured along the unit ``direction`` in CRS units, as in
+        :func:`core.i2g_core.intersect_ray_with_dem`.  ``t1`` is ``inf`` when
+        the ray may pass the swept range without meeting terrain.
+        """
+
+        d = np.asarray(direction, dtype=float)
+        d = d / np.linalg.norm(d)
+        h = math.hypot(d[0], d[1])
+        if h < 1e-9:
+            return 0.0, math.inf
+        s = d[2] / (h * self.meters_per_unit)
+        k = self._bins(d[0], d[1])
+        n = self.n_azimuth
+        ks = np.array([(k - 1) % n, k, (k + 1) % n], dtype=np.intp)
+        first = _first_at_least(self.horizon, ks, np.full(3, s))
+        n_r = self.horizon.shape[1]
+        # The crossing lies between samples; allow one extra cell either side
+        r0 = max(int(first.min()) - 1, 0) * self.step
+        t1 = math.inf if int(first.max()) >= n_r else (int(first.max()) + 2) * self.step / h
+        return r0 / h, t1
+
+    def skyline_distance(self, dx, dy) -> np.ndarray:
+        """Horizontal distance to the terrain forming the skyline along ``(dx, dy)``.
+
+        That is the radius at which each azimuth's horizon reaches its final
+        height, in CRS units.  ``NaN`` where the sweep saw no terrain.
+        """
+
+        k = np.atleast_1d(self._bins(np.asarray(dx, dtype=float), np.asarray(dy, dtype=float)))
+        top = self.horizon[k, -1].astype(float)
+        out = np.full(k.shape, np.nan)
+        seen = np.isfinite(top)
+        if seen.any():
+            first = _first_at_least(self.horizon, k[seen], top[seen])
+            out[seen] = (first + 1) * self.step
+        return out
+
+    # ----- persistence -----
+    def save(self, path, stamp: str = "") -> None:
+        """Write the viewshed to ``path`` (a file name or a binary file)."""
+
+        if not hasattr(path, "write"):
+            with open(path, "wb") as f:
+                return self.save(f, stamp)
+        np.savez(path, origin=self.origin, step=np.array(self.step),
+                 meters_per_unit=np.array(self.meters_per_unit),
+                 horizon=self.horizon, visible=self.visible, distance=self.distance,
+                 window=np.array(self.window), transform=np.array(self.transform),
+                 stamp=np.array(stamp))
+
+    @classmethod
+    def load(cls, path, stamp: Optional[str] = None) -> Optional["Viewshed"]:
+        """Load a saved viewshed, or ``None`` if missing, stale or unreadable."""
+
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                if stamp is not None and str(z["stamp"]) != stamp:
+                    return None
+                return cls(z["origin"], float(z["step"]), float(z["meters_per_unit"]),
+                           z["horizon"], z["visible"], z["distance"],
+                           tuple(z["window"]), tuple(z["transform"]))
+        except Exception:
+            return None
+
+
+def compute_viewshed(dem: BilinearDemSampler, origin: Sequence[float],
+                     max_range_m: float = 5000.0, n_azimuth: Optional[int] = None,
+                     workers: Optional[int] = None, tol_m: float = 2.0) -> Viewshed:
+    """Sweep the DEM around ``origin`` and build a :class:`Viewshed`.
+
+    Parameters
+    ----------
+    dem:
+        Gridded sampler from :mod:`core.dem_grid` (or a tiled subclass).
+        Only the window covering ``max_range_m`` is read.
+    origin:
+        Camera position ``(x, y, z)`` in the DEM's CRS.
+    n_azimuth:
+        Number of sweep azimuths.  Defaults to one per cell along the
+        range circle, capped at :data:`MAX_AZIMUTHS`.
+    workers:
+        Processes for the sector sweep; ``1`` sweeps in this process.
+        Defaults to the CPU count, capped at 4.
+    tol_m:
+        Vertical tolerance used for the visibility raster.
+    """
+
+    o = np.asarray(origin, dtype=float)[:3]
+    a, b, _, d, e, _ = dem.transform
+    mpu = dem.meters_per_unit
+    step = min(math.hypot(a, d), math.hypot(b, e))
+    max_range = max_range_m / mpu
+    n_r = max(int(math.ceil(max_range / step)), 1)
+    if n_azimuth is None:
+        n_azimuth = min(max(int(math.ceil(2.0 * math.pi * n_r)), 360), MAX_AZIMUTHS)
+
+    # Read only the window the sweep can reach
+    try:
+        win, window = read_window(dem, o[0], o[1], max_range)
+    except ValueError:
+        raise ValueError("camera is outside the DEM") from None
+    transform = win.transform
+
+    # Radial sweep, one block of azimuths per sector
+    azimuths = 2.0 * math.pi * np.arange(n_azimuth) / n_azimuth
+    if workers is None:
+        workers = min(os.cpu_count() or 1, 4)
+    sectors = np.array_split(azimuths, max(int(workers), 1) * 4)
+    sectors = [s for s in sectors if s.size]
+    if workers > 1 and len(sectors) > 1:
+        # Spawned workers: forking a process that runs GUI threads is unsafe
+        ctx = multiprocessing.get_context("spawn")
+        with shared_grid(win) as handle, \
+                ProcessPoolExecutor(max_workers=int(workers), mp_context=ctx,
+                                    initializer=_init_worker, initargs=(handle,)) as pool:
+            n = len(sectors)
+            parts = list(pool.map(_sweep_sector, [o] * n, sectors, [step] * n, [n_r] * n))
+    else:
+        parts = [_sweep(win, o, s, step, n_r) for s in sectors]
+    horizon = np.vstack(parts)
+
+    vs = Viewshed(o, step, mpu, horizon, np.zeros(win.shape, dtype=bool),
+                  np.full(win.shape, np.nan, dtype=np.float32), window, transform)
+    _classify(vs, win, tol_m)
+    return vs
+
+
+def _classify(vs: Viewshed, win: GridDemSampler, tol_m: float) -> None:
+    """Fill the visibility and first-hit distance rasters of ``vs``."""
+
+    hh, ww = win.shape
+    cols = np.arange(ww, dtype=float)
+    n_r = vs.horizon.shape[1]
+    for r0 in range(0, hh, _RASTER_BLOCK):
+        r1 = min(r0 + _RASTER_BLOCK, hh)
+        cc, rr = np.meshgrid(cols, np.arange(r0, r1, dtype=float))
+        xs, ys = win.world_coords(cc, rr)
+        z = win.array[r0:r1].astype(float)
+        dx = xs - vs.origin[0]
+        dy = ys - vs.origin[1]
+        r = np.hypot(dx, dy)
+        ok = np.isfinite(z) & (r <= vs.max_range)
+        pts = np.column_stack([xs[ok], ys[ok], z[ok]])
+        vis = np.zeros(z.shape, dtype=bool)
+        vis[ok] = vs.is_visible(pts, tol_m=tol_m)
+        vs.visible[r0:r1] = vis
+
+        # Distance along each line of sight to the first terrain hit
+        dist = np.full(z.shape, np.nan, dtype=np.float32)
+        rm = np.maximum(r[ok], 1e-9) * vs.meters_per_unit
+        s = (z[ok] - vs.origin[2] + tol_m) / rm
+        k = vs._bins(dx[ok], dy[ok])
+        first = _first_at_least(vs.horizon, k, s)
+        hit = np.minimum((first + 1) * vs.step * vs.meters_per_unit, rm)
+        dist[ok] = np.where(vis[ok] | (first >= n_r), rm, hit)
+        vs.distance[r0:r1] = dist
+
+
+def load_or_compute_viewshed(dem: BilinearDemSampler, origin: Sequence[float], path,
+                             stamp: str = "", **kwargs) -> Viewshed:
+    """Reuse the sidecar at ``path`` when valid for ``origin``, otherwise recompute it."""
+
+    vs = Viewshed.load(path, stamp) if Path(path).exists() else None
+    if vs is None or not vs.matches(origin):
+        vs = compute_viewshed(dem, origin, **kwargs)
+        try:
+            vs.save(path, stamp)
+        except OSError:
+            pass
+    return vs
+
+
+def default_cache_dir() -> Path:
+    """``viewsheds`` under :func:`core.filecache.cache_root`."""
+
+    return filecache.cache_root() / "viewsheds"
+
+
+def cache_path(key: str, cache_dir: Optional[Union[str, Path]] = None) -> Path:
+    """File in the viewshed cache for ``key`` (see :func:`load_cached_viewshed`)."""
+
+    cache = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+    return cache / f"viewshed_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]}.npz"
+
+
+def load_cached_viewshed(dem: BilinearDemSampler, origin: Sequence[float], key: str,
+                         cache_dir: Optional[Union[str, Path]] = None, **kwargs) -> Viewshed:
+    """Return the viewshed stored under ``key`` in the cache, computing it on a miss.
+
+    ``key`` should identify the DEM version and the camera position; it is
+    also stored in the file as its stamp.  When the cache directory is not
+    writable the computed viewshed is returned without being stored.
+    """
+
+    cache = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+    path = cache_path(key, cache)
+    vs = Viewshed.load(path, key) if path.exists() else None
+    if vs is not None and vs.matches(origin):
+        filecache.touch(path)
+        return vs
+    vs = compute_viewshed(dem, origin, **kwargs)
+    try:
+        filecache.atomic_write(path, lambda f: vs.save(f, key))
+        prune_cache(cache, keep=path)
+    except OSError:
+        pass
+    return vs
+
+
+def prune_cache(cache_dir: Optional[Union[str, Path]] = None, max_bytes: Optional[int] = None,
+                keep: Optional[Path] = None) -> int:
+    """Delete least recently used viewsheds until the cache fits ``max_bytes``.
+
+    ``keep`` is never deleted.  Returns the number of files removed.
+    """
+
+    cache = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+    budget = MAX_CACHE_BYTES if max_bytes is None else int(max_bytes)
+    return filecache.prune(cache, budget, "viewshed_*.npz", keep=keep)[0]
+
+
+_background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="viewshed")
+
+
+def start_viewshed(dem: BilinearDemSampler, origin: Sequence[float], path=None,
+                   stamp: str = "", cache_key: Optional[str] = None, **kwargs) -> "Future[Viewshed]":
+    """Compute (or load) a viewshed in a background thread.
+
+    With ``path`` the viewshed is kept in that file
+    (:func:`load_or_compute_viewshed`); with ``cache_key`` in the cache
+    directory (:func:`load_cached_viewshed`).  Jobs run one at a time; the
+    returned future resolves to the :class:`Viewshed`.
+    """
+
+    if cache_key is not None:
+        return _background.submit(load_cached_viewshed, dem, origin, cache_key, **kwargs)
+    if path is None:
+        return _background.submit(compute_viewshed, dem, origin, **kwargs)
+    return _background.submit(load_or_compute_viewshed, dem, origin, path, stamp, **kwargs)
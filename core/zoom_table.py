@@ -0,0 +1,180 @@
+"""Zoom-dependent intrinsics calibration table.
+
+A :class:`ZoomTable` stores intrinsics (``fx, fy, cx, cy``) and distortion
+coefficients measured at a handful of zoom positions and interpolates them
+for any zoom reported by PTZ telemetry.  Interpolation is monotone
+piecewise-cubic (PCHIP, Fritsch–Carlson): it passes through every sample,
+does not overshoot between them – focal length stays monotone in zoom when
+the samples are – and is vectorized, so evaluating a telemetry sample costs
+one ``searchsorted`` and a few array operations.  Slopes are computed once
+when the table is built.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Sequence
+import math
+import numpy as np
+
+_DIST_KEYS = ("k1", "k2", "p1", "p2", "k3")
+
+
+def _pchip_slopes(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Fritsch–Carlson derivatives for the columns of ``y`` (shape ``(n, m)``)."""
+
+    n = x.size
+    h = np.diff(x)[:, None]
+    delta = np.diff(y, axis=0) / h
+    d = np.zeros_like(y)
+    if n == 2:
+        d[:] = delta[0]
+        return d
+    # Interior: weighted harmonic mean where the secants agree in sign
+    w1 = 2.0 * h[1:] + h[:-1]
+    w2 = h[1:] + 2.0 * h[:-1]
+    same = (delta[:-1] * delta[1:]) > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hm = (w1 + w2) / (w1 / delta[:-1] + w2 / delta[1:])
+    d[1:-1] = np.where(same, hm, 0.0)
+
+    # One-sided, shape-preserving end slopes
+    def end(h0, h1, d0, d1):
+        s = ((2.0 * h0 + h1) * d0 - h0 * d1) / (h0 + h1)
+        s = np.where(np.sign(s) != np.sign(d0), 0.0, s)
+        s = np.where((np.sign(d0) != np.sign(d1)) & (np.abs(s) > np.abs(3.0 * d0)), 3.0 * d0, s)
+        return s
+
+    d[0] = end(h[0], h[1], delta[0], delta[1])
+    d[-1] = end(h[-1], h[-2], delta[-1], delta[-2])
+    return d
+
+
+class ZoomTable:
+    """Intrinsics sampled at several zoom positions.
+
+    Parameters
+    ----------
+    zoom:
+        Zoom values of the samples (strictly increasing after sorting).
+    fx, fy, cx, cy:
+        Intrinsics in pixels at each zoom sample.
+    dist:
+        Optional ``(n, 5)`` distortion coefficients ``(k1, k2, p1, p2, k3)``.
+    width, height:
+        Image size the intrinsics refer to.
+    source:
+        Telemetry field the zoom values come from: ``"zoom_norm"`` or
+        ``"zoom_mm"``.
+    """
+
+    def __init__(self, zoom: Sequence[float], fx: Sequence[float], fy: Sequence[float],
+                 cx: Sequence[float], cy: Sequence[float],
+                 dist: Optional[Sequence[Sequence[float]]] = None,
+                 width: Optional[int] = None, height: Optional[int] = None,
+                 source: str = "zoom_norm") -> None:
+        z = np.asarray(zoom, dtype=float)
+        if z.ndim != 1 or z.size < 1:
+            raise ValueError("zoom table needs at least one sample")
+        cols = [np.asarray(c, dtype=float) for c in (fx, fy, cx, cy)]
+        if dist is None:
+            cols += [np.zeros(z.size)] * 5
+        else:
+            dd = np.asarray(dist, dtype=float).reshape(z.size, -1)
+            dd = np.pad(dd, ((0, 0), (0, 5 - dd.shape[1]))) if dd.shape[1] < 5 else dd[:, :5]
+            cols += [dd[:, k] for k in range(5)]
+        if any(c.shape != z.shape for c in cols):
+            raise ValueError("all zoom table columns must have one value per zoom sample")
+        if source not in ("zoom_norm", "zoom_mm"):
+            raise ValueError(f"unknown zoom source: {source!r}")
+        order = np.argsort(z)
+        z = z[order]
+        if np.any(np.diff(z) <= 0):
+            raise ValueError("zoom samples must be distinct")
+        self.zoom = z
+        self.values = np.column_stack(cols)[order]  # (n, 9)
+        self.width = width
+        self.height = height
+        self.source = source
+        self._slopes = _pchip_slopes(z, self.values) if z.size > 1 else np.zeros_like(self.values)
+
+    def __len__(self) -> int:
+        return self.zoom.size
+
+    # ----- evaluation -----
+    def interpolate(self, zoom) -> np.ndarray:
+        """Interpolated ``(..., 9)`` rows ``fx, fy, cx, cy, k1, k2, p1, p2, k3``.
+
+        Zoom values outside the sampled range are clamped to the ends.
+        """
+
+        zq = np.asarray(zoom, dtype=float)
+        shape = zq.shape
+        zq = zq.ravel()
+        x = self.zoom
+        if x.size == 1:
+            return np.broadcast_to(self.values[0], shape + (9,)).copy()
+        zc = np.clip(zq, x[0], x[-1])
+        k = np.clip(np.searchsorted(x, zc, side="right") - 1, 0, x.size - 2)
+        h = (x[k + 1] - x[k])[:, None]
+        t = ((zc - x[k]) / h[:, 0])[:, None]
+        t2, t3 = t * t, t * t * t
+        h00 = 2 * t3 - 3 * t2 + 1
+        h10 = t3 - 2 * t2 + t
+        h01 = -2 * t3 + 3 * t2
+        h11 = t3 - t2
+        y0, y1 = self.values[k], self.values[k + 1]
+        d0, d1 = self._slopes[k], self._slopes[k + 1]
+        out = h00 * y0 + h10 * h * d0 + h01 * y1 + h11 * h * d1
+        return out.reshape(shape + (9,))
+
+    def lookup(self, zoom: float) -> Dict[str, Any]:
+        """Intrinsics for one zoom value as a dict (``fx``..``cy``, ``dist``, ``hfov_deg``)."""
+
+        row = self.interpolate(float(zoom))
+        out = {"fx": float(row[0]), "fy": float(row[1]), "cx": float(row[2]), "cy": float(row[3]),
+               "dist": {k: float(v) for k, v in zip(_DIST_KEYS, row[4:])}}
+        out["hfov_deg"] = self.hfov_deg(out["fx"]) if self.width else None
+        return out
+
+    def nearest(self, zoom: float) -> Dict[str, Any]:
+        """The measured sample closest to ``zoom``, in the form of :meth:`lookup`."""
+
+        k = int(np.argmin(np.abs(self.zoom - float(zoom))))
+        row = self.values[k]
+        out = {"fx": float(row[0]), "fy": float(row[1]), "cx": float(row[2]), "cy": float(row[3]),
+               "dist": {k: float(v) for k, v in zip(_DIST_KEYS, row[4:])}, "zoom": float(self.zoom[k])}
+        out["hfov_deg"] = self.hfov_deg(out["fx"]) if self.width else None
+        return out
+
+    def hfov_deg(self, fx: float) -> Optional[float]:
+        if not self.width or fx <= 0:
+            return None
+        return math.degrees(2.0 * math.atan(self.width / (2.0 * fx)))
+
+    # ----- IO -----
+    def to_dict(self) -> Dict[str, Any]:
+        v = self.values
+        return {
+            "source": self.source,
+            "width": self.width,
+            "height": self.height,
+            "samples": [
+                {"zoom": float(z), "fx": float(r[0]), "fy": float(r[1]), "cx": float(r[2]), "cy": float(r[3]),
+                 **{k: float(x) for k, x in zip(_DIST_KEYS, r[4:])}}
+                for z, r in zip(self.zoom, v)
+            ],
+        }
+
+    @staticmethod
+    def from_dict(d: Dict[str, Any]) -> "ZoomTable":
+        samples = d.get("samples") or []
+        if not samples:
+            raise ValueError("zoom table has no samples")
+        col = {k: [float(s[k]) for s in samples] for k in ("zoom", "fx", "cx", "cy")}
+        fy = [float(s.get("fy", s["fx"])) for s in samples]
+        dist = [[float(s.get(k) or 0.0) for k in _DIST_KEYS] for s in samples]
+        return ZoomTable(
+            col["zoom"], col["fx"], fy, col["cx"], col["cy"], dist=dist,
+            width=d.get("width"), height=d.get("height"),
+            source=d.get("source", "zoom_norm"),
+        )
@@ -0,0 +1,101 @@
+# crs_cache.py
+# -*- coding: utf-8 -*-
+# Process-wide cache of pyproj Transformers
+#
+# Building a Transformer costs milliseconds of PROJ database lookups, so the
+# UI, the API server and the geometry helpers share one LRU-bounded registry
+# instead of calling Transformer.from_crs on every click.  pyproj (>= 3.1)
+# transformers may be shared across threads; the registry itself is guarded
+# by a lock.
+
+from collections import OrderedDict
+from typing import Iterable, Tuple, Union
+import threading
+
+from pyproj import Transformer
+
+CrsLike = Union[int, str]
+
+# Max. number of distinct (src, dst, always_xy) transformers kept alive
+MAX_TRANSFORMERS = 64
+
+_lock = threading.Lock()
+_cache: "OrderedDict[Tuple[str, str, bool], Transformer]" = OrderedDict()
+_hits = 0
+_misses = 0
+
+
+def _norm(crs: CrsLike) -> str:
+    """Normalize 4326 / "4326" / "epsg:4326" to "EPSG:4326"; pass others through."""
+    if isinstance(crs, int):
+        return f"EPSG:{crs}"
+    s = str(crs).strip()
+    if s.isdigit():
+        return f"EPSG:{s}"
+    if s.upper().startswith("EPSG:"):
+        return "EPSG:" + s[5:].strip()
+    return s
+
+
+def get_transformer(src: CrsLike, dst: CrsLike, always_xy: bool = True) -> Transformer:
+    """Return a shared Transformer from ``src`` to ``dst``, building it once."""
+    global _hits, _misses
+    key = (_norm(src), _norm(dst), bool(always_xy))
+    with _lock:
+        tr = _cache.get(key)
+        if tr is not None:
+            _cache.move_to_end(key)
+            _hits += 1
+            return tr
+    # Build outside the lock – PROJ lookups can be slow
+    tr = Transformer.from_crs(key[0], key[1], always_xy=key[2])
+    with _lock:
+        _misses += 1
+        existing = _cache.get(key)
+        if existing is not None:
+            _cache.move_to_end(key)
+            return existing
+        _cache[key] = tr
+        while len(_cache) > MAX_TRANSFORMERS:
+            _cache.popitem(last=False)
+    return tr
+
+
+def warm(pairs: Iterable[Tuple[CrsLike, CrsLike]], always_xy: bool = True) -> None:
+    """Pre-build transformers for ``(src, dst)`` pairs; invalid pairs are skipped."""
+    for src, dst in pairs:
+        if src is None or dst is None:
+            continue
+        try:
+            get_transformer(src, dst, always_xy)
+        except Exception:
+            pass
+
+
+def warm_site(*epsgs) -> None:
+    """Pre-build WGS84<->EPSG and EPSG<->EPSG transformers for a site's CRSs."""
+    codes = []
+    for e in epsgs:
+        if e and e not in codes:
+            codes.append(e)
+    pairs = []
+    for e in codes:
+        pairs += [(4326, e), (e, 4326)]
+    for a in codes:
+        for b in codes:
+            if a != b:
+                pairs.append((a, b))
+    warm(pairs)
+
+
+def cache_info() -> dict:
+    with _lock:
+        return {"hits": _hits, "misses": _misses, "size": len(_cache),
+                "max_size": MAX_TRANSFORMERS}
+
+
+def clear() -> None:
+    global _hits, _misses
+    with _lock:
+        _cache.clear()
+        _hits = _misses = 0
@@ -0,0 +1,186 @@
+# dataset_pool.py
+# -*- coding: utf-8 -*-
+# Process-wide pool of opened DTMs and raster layers
+#
+# Opening a GeoTIFF costs a file open, header parsing and – for RasterLayer –
+# decoding a whole overview, and the same DTM/orthophoto is used by the
+# Preparation, Img2Ground and User tabs and by every API request.  The pool
+# hands out one shared DTM / RasterLayer per (path, mtime, options) and
+# counts borrowers; released objects stay open in a small idle LRU so the
+# next borrower (e.g. the next auto-Z click) gets the already decoded
+# sampler and overview back.  A file rewritten on disk gets a new mtime and
+# therefore a fresh object; the stale one is closed once its last borrower
+# releases it.  The registry is guarded by a lock.
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Tuple
+import os
+import threading
+
+# Max. number of released (unborrowed) datasets kept open
+MAX_IDLE = 8
+
+Key = Tuple[Hashable, ...]
+
+
+class _Entry:
+    __slots__ = ("key", "obj", "refs")
+
+    def __init__(self, key: Key, obj: Any):
+        self.key = key
+        self.obj = obj
+        self.refs = 0
+
+
+_lock = threading.Lock()
+_entries: Dict[Key, _Entry] = {}
+_by_id: Dict[int, _Entry] = {}
+_idle: "OrderedDict[Key, _Entry]" = OrderedDict()
+_hits = 0
+_misses = 0
+
+
+def _file_key(kind: str, path: str, *options) -> Tuple[Key, str]:
+    p = os.path.abspath(os.fspath(path))
+    st = os.stat(p)  # raises for missing files, like rasterio.open would
+    return (kind, p, st.st_mtime_ns, st.st_size) + tuple(options), p
+
+
+def _close(obj: Any) -> None:
+    close = getattr(obj, "close", None)
+    if close is not None:
+        try:
+            close()
+        except Exception:
+            pass
+
+
+def _acquire(key: Key, path: str, factory: Callable[[], Any]) -> Any:
+    global _hits, _misses
+    stale: List[Any] = []
+    with _lock:
+        e = _entries.get(key)
+        if e is not None:
+            _idle.pop(key, None)
+            e.refs += 1
+            _hits += 1
+            return e.obj
+        # Idle objects for an older version of this file are of no further use
+        for k in [k for k in _idle if k[0] == key[0] and k[1] == path]:
+            stale.append(_forget(k).obj)
+    for obj in stale:
+        _close(obj)
+    # Open outside the lock – reading an overview can take a while
+    obj = factory()
+    with _lock:
+        _misses += 1
+        e = _entries.get(key)
+        if e is None:
+            e = _entries[key] = _Entry(key, obj)
+            _by_id[id(obj)] = e
+            obj = None
+        else:
+            _idle.pop(key, None)
+        e.refs += 1
+        shared = e.obj
+    if obj is not None:  # another thread opened it first
+        _close(obj)
+    return shared
+
+
+def _forget(key: Key) -> _Entry:
+    # Called with ``_lock`` held.
+    e = _entries.pop(key)
+    _idle.pop(key, None)
+    _by_id.pop(id(e.obj), None)
+    return e
+
+
+def _current(key: Key) -> bool:
+    try:
+        st = os.stat(key[1])
+    except OSError:
+        return False
+    return (st.st_mtime_ns, st.st_size) == key[2:4]
+
+
+def acquire_dtm(path: str):
+    """Borrow the shared :class:`dtm.DTM` for ``path``; pair with :func:`release`."""
+    from dtm import DTM
+    key, p = _file_key("dtm", path)
+    return _acquire(key, p, lambda: DTM(path))
+
+
+def acquire_raster_layer(path: str, max_size: int = 2048):
+    """Borrow the shared :class:`raster_layer.RasterLayer` for ``path``.
+
+    Layers are shared per ``max_size``.  The returned object is shared with
+    other tabs, so callers must not close it – use :func:`release`.
+    """
+    from raster_layer import RasterLayer
+    key, p = _file_key("raster", path, int(max_size))
+    return _acquire(key, p, lambda: RasterLayer(path, max_size=max_size))
+
+
+def release(obj: Any) -> None:
+    """Return a borrowed object; ``None`` and objects not from the pool are ignored.
+
+    The last release parks the object in the idle LRU, or closes it if the
+    file changed on disk meanwhile.
+    """
+    if obj is None:
+        return
+    to_close: List[Any] = []
+    with _lock:
+        e = _by_id.get(id(obj))
+        if e is None or e.obj is not obj or e.refs <= 0:
+            return
+        e.refs -= 1
+        if e.refs > 0:
+            return
+        if not _current(e.key):
+            to_close.append(_forget(e.key).obj)
+        else:
+            _idle[e.key] = e
+            while len(_idle) > MAX_IDLE:
+                k, _ = _idle.popitem(last=False)
+                to_close.append(_forget(k).obj)
+    for o in to_close:
+        _close(o)
+
+
+@contextmanager
+def borrow_dtm(path: str) -> Iterator[Any]:
+    """``with borrow_dtm(path) as dtm:`` – acquire and release around a block."""
+    dtm = acquire_dtm(path)
+    try:
+        yield dtm
+    finally:
+        release(dtm)
+
+
+@contextmanager
+def borrow_raster_layer(path: str, max_size: int = 2048) -> Iterator[Any]:
+    layer = acquire_raster_layer(path, max_size)
+    try:
+        yield layer
+    finally:
+        release(layer)
+
+
+def pool_info() -> dict:
+    with _lock:
+        return {"hits": _hits, "misses": _misses, "open": len(_entries),
+                "idle": len(_idle), "borrowed": sum(1 for e in _entries.values() if e.refs > 0),
+                "max_idle": MAX_IDLE}
+
+
+def clear() -> None:
+    """Close idle objects and reset the counters; borrowed objects stay open."""
+    global _hits, _misses
+    with _lock:
+        idle = [_forget(k).obj for k in list(_idle)]
+        _hits = _misses = 0
+    for obj in idle:
+        _close(obj)
@@ -3,18 +3,20 @@
 # -*- coding: utf-8 -*-
 # GeoTIFF DTM reader/sampler
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Tuple, Optional
+import os
+import threading
 import numpy as np
 
 # Try to import rasterio and keep the real import error for better diagnostics
 try:
     import rasterio
-    from rasterio.transform import rowcol, xy
+    from rasterio.transform import xy
     _RASTERIO_IMPORT_ERROR = None
 except Exception as e:
     rasterio = None
-    rowcol = None
     xy = None
     _RASTERIO_IMPORT_ERROR = repr(e)
 
@@ -23,6 +25,17 @@ try:  # optional dependency
 except Exception:  # pragma: no cover
     Geod = None  # type: ignore
 
+from core.dem_grid import BilinearDemSampler, GridDemSampler
+from core.dem_pyramid import cache_path as pyramid_cache_path
+from adapters.dem_rasterio import InMemoryDemSampler, TiledDemSampler, padded_window
+
+# DEMs whose band fits in this many bytes are loaded fully into memory by
+# DTM.sampler(); larger ones are streamed through a tiled block cache.
+IN_MEMORY_MAX_BYTES = 128 * 1024 * 1024
+
+# Builds samplers for DTM.start_sampler() off the caller's (UI) thread.
+_background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dtm-sampler")
+
 @dataclass
 class DTMInfo:
     crs_epsg: Optional[int]
@@ -50,6 +63,14 @@ class DTM:
             height = self.ds.height,
             bounds = self.ds.bounds  # left, bottom, right, top
         )
+        self._sampler: Optional[BilinearDemSampler] = None
+        self._sampler_job: Optional[Future] = None
+        # Serializes sampler builds; they read through their own dataset
+        # handle, so point queries on ``ds`` are not held up meanwhile
+        self._build_lock = threading.Lock()
+        # DTMs are shared between tabs and API requests (see dataset_pool);
+        # the lock guards the rasterio handle and the lazy sampler.
+        self._lock = threading.RLock()
         self.meters_per_unit = 1.0
         try:
             if self.crs and self.crs.is_geographic:
@@ -67,32 +88,117 @@ class DTM:
             self.meters_per_unit = 1.0
 
     def close(self):
+        with self._lock:
+            if self._sampler is not None:
+                close = getattr(self._sampler, "close", None)
+                if close is not None:
+                    close()
+                self._sampler = None
+            try:
+                self.ds.close()
+            except Exception:
+                pass
+
+    def sampler(self, cache_bytes: int = 256 * 1024 * 1024) -> BilinearDemSampler:
+        """Return a shared vectorized sampler for this DTM.
+
+        Small rasters are loaded fully into memory (through a dataset handle
+        of their own, so :meth:`sample` is not blocked meanwhile); larger ones
+        get a :class:`adapters.dem_rasterio.TiledDemSampler` that reads blocks
+        on demand and keeps at most ``cache_bytes`` of them in memory.  The
+        sampler is created once and reused by later calls; its max-elevation
+        pyramid is kept in the application cache (:mod:`core.dem_pyramid`).
+        """
+        with self._build_lock:
+            if self._sampler is None:
+                sampler = self._make_sampler(cache_bytes)
+                with self._lock:
+                    if self.ds.closed:
+                        close = getattr(sampler, "close", None)
+                        if close is not None:
+                            close()
+                        raise RuntimeError("DTM is closed")
+                    self._sampler = sampler
+            return self._sampler
+
+    def start_sampler(self, cache_bytes: int = 256 * 1024 * 1024) -> Future:
+        """Build :meth:`sampler` in a background thread.
+
+        Loading a large band can take seconds; GUI code calls this when the
+        DTM is opened and uses :meth:`ready_sampler` until the job is done.
+        Repeated calls return the same future.
+        """
+        with self._lock:
+            if self._sampler_job is None:
+                self._sampler_job = _background.submit(self.sampler, cache_bytes)
+            return self._sampler_job
+
+    def ready_sampler(self) -> Optional[BilinearDemSampler]:
+        """Return the shared sampler if it is built already, without blocking."""
+        return self._sampler
+
+    def _make_sampler(self, cache_bytes: int) -> BilinearDemSampler:
+        band_bytes = self.info.width * self.info.height * 4
+        if band_bytes <= IN_MEMORY_MAX_BYTES:
+            sampler = InMemoryDemSampler(self.path, band=self.band)
+        else:
+            sampler = TiledDemSampler(self.path, cache_bytes=cache_bytes, band=self.band)
         try:
-            self.ds.close()
-        except Exception:
+            st = os.stat(self.path)
+            sampler.pyramid_path = pyramid_cache_path(f"{os.path.abspath(self.path)}|{self.band}")
+            sampler.pyramid_stamp = f"{st.st_size}:{st.st_mtime_ns}"
+        except OSError:
             pass
+        return sampler
+
+    def grid_sampler(self, bounds=None) -> GridDemSampler:
+        """Load the band (or the window covering ``bounds``) into memory.
+
+        The returned :class:`core.dem_grid.GridDemSampler` answers scalar and
+        array queries with bilinear interpolation and no per-point GDAL calls.
+        """
+        window = padded_window(self.ds, bounds) if bounds is not None else None
+        with self._lock:
+            data = self.ds.read(self.band, window=window)
+        transform = self.ds.window_transform(window) if window is not None else self.transform
+        return GridDemSampler(data, transform, nodata=self.nodata,
+                              meters_per_unit=self.meters_per_unit)
 
     def contains(self, x: float, y: float) -> bool:
         l, b, r, t = self.info.bounds
         return (x >= l and x <= r and y >= b and y <= t)
 
     def sample(self, x: float, y: float) -> Optional[float]:
-        """Return elevation (meters) at projected coord (x,y), or None if out of bounds / NoData."""
+        """Return elevation (meters) at projected coord (x,y), or None if out of bounds / NoData.
+
+        Values are bilinearly interpolated by the shared :meth:`sampler`.  Until
+        it is built (see :meth:`start_sampler`, started here if needed) the
+        point is answered from a small windowed read.
+        """
         if not self.contains(x, y):
             return None
-        try:
-            # Fast path: rasterio.sample works in dataset CRS coordinates
-            val = next(self.ds.sample([(x, y)]))[0]
-            if val is None or (self.nodata is not None and np.isclose(val, self.nodata)):
-                return None
-            return float(val)
-        except Exception:
-            # Fallback: index-based read
+        sampler = self._sampler
+        if sampler is None:
+            self.start_sampler()
+            sampler = self.grid_sampler((x, y, x, y))
+        return sampler.elevation(x, y)
+
+    def elevations(self, xs, ys) -> np.ndarray:
+        """Vectorized :meth:`sample`; missing data is reported as ``NaN``.
+
+        Before the shared sampler is ready only the window around the points
+        is read.
+        """
+        sampler = self._sampler
+        if sampler is None:
+            self.start_sampler()
+            x = np.asarray(xs, dtype=float)
+            y = np.asarray(ys, dtype=float)
+            ok = np.isfinite(x) & np.isfinite(y)
+            if not ok.any():
+                return np.full(np.shape(x), np.nan)
             try:
-                row, col = rowcol(self.transform, x, y, op=round)
-                val = self.ds.read(self.band)[row, col]
-                if self.nodata is not None and np.isclose(val, self.nodata):
-                    return None
-                return float(val)
-            except Exception:
-                return None
+                sampler = self.grid_sampler((x[ok].min(), y[ok].min(), x[ok].max(), y[ok].max()))
+            except ValueError:  # no overlap with the raster
+                return np.full(np.shape(x), np.nan)
+        return sampler.elevations(xs, ys)
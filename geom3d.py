@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import math
 from typing import Optional, Dict, Tuple, Any  # הוספתי Any עבור to_dict/from_dict
 
 import numpy as np
 from pyproj import Transformer
 
+from crs_cache import get_transformer
+
+from core.i2g_core import CompiledCamera, compile_pose_camera, intersect_ray_with_dem
+
 
 # ---------------- Camera models ----------------
 @dataclass
@@ -115,19 +119,30 @@ def _Rz(a):  # noqa
     return np.array([[c, -s, 0], [s, c, 0], [0, 0, 1]], dtype=float)
 
 
-def camera_ray_in_world(px: int, py: int, intr: CameraIntrinsics, pose: CameraPose) -> Tuple[np.ndarray, np.ndarray]:
+def compiled_camera(intr: CameraIntrinsics, pose: CameraPose,
+                    ray_map: Optional[np.ndarray] = None) -> CompiledCamera:
+    """
+    מצלמה "מקומפלת" (core.i2g_core.CompiledCamera) עבור intr/pose – הסיבוב
+    מחושב פעם אחת לכל שינוי תנוחה ונשמר במטמון של core.i2g_core.compile_pose_camera.
+    """
+    return compile_pose_camera(intr, pose, ray_map)
+
+
+def camera_ray_in_world(px: int, py: int, intr: CameraIntrinsics, pose: CameraPose,
+                        ray_map: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
     """
     קרן מהפיקסל (px,py) לעולם.
     origin = מיקום המצלמה, direction = היחידה בכיוון היעד.
+    ray_map: מפת תיקון עיוות עדשה (core.undistort.load_ray_map) – אם ניתנה,
+    הקרן נלקחת ממנה במקום מ-fx/fy/cx/cy.
     """
-    x_cam = (px - intr.cx) / intr.fx
-    y_cam = (py - intr.cy) / intr.fy
-    d_cam = np.array([x_cam, y_cam, 1.0], dtype=float)
-    d_cam = d_cam / np.linalg.norm(d_cam)
-    R = pose.R_wc()
-    d_w = R @ d_cam
-    o_w = pose.t_w()
-    return o_w, d_w / np.linalg.norm(d_w)
+    return compiled_camera(intr, pose, ray_map).ray(px, py)
+
+
+def camera_rays_in_world(pxs, pys, intr: CameraIntrinsics, pose: CameraPose,
+                         ray_map: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """גרסה וקטורית של camera_ray_in_world: מערכי (N,3) של מוצאים וכיוונים."""
+    return compiled_camera(intr, pose, ray_map).rays(pxs, pys)
 
 
 # ---------------- Geo reference ----------------
@@ -158,62 +173,102 @@ class GeoRef:
             d.get("projected_epsg"),
         )
 
+    # Cached projected origin: ((lat, lon, epsg), (X0, Y0))
+    _origin_cache: Optional[Tuple[Tuple, Tuple[float, float]]] = field(
+        default=None, init=False, repr=False, compare=False)
+
     # --- המרות ---
     def _proj(self) -> Optional[Transformer]:
         if self.projected_epsg:
-            return Transformer.from_crs("EPSG:4326", f"EPSG:{self.projected_epsg}", always_xy=True)
+            return get_transformer(4326, self.projected_epsg)
         return None
 
     def _proj_inv(self) -> Optional[Transformer]:
         if self.projected_epsg:
-            return Transformer.from_crs(f"EPSG:{self.projected_epsg}", "EPSG:4326", always_xy=True)
+            return get_transformer(self.projected_epsg, 4326)
         return None
 
+    def origin_projected(self) -> Tuple[float, float]:
+        """מיקום הראשית בקואורדינטות הפרויקטד (נשמר במטמון עד לשינוי ראשית/EPSG)."""
+        key = (self.origin_lat, self.origin_lon, self.projected_epsg)
+        if self._origin_cache is None or self._origin_cache[0] != key:
+            X0, Y0 = self._proj().transform(self.origin_lon, self.origin_lat)
+            self._origin_cache = (key, (float(X0), float(Y0)))
+        return self._origin_cache[1]
+
+    def _site_rot(self) -> Tuple[float, float]:
+        a = math.radians(self.yaw_site_deg)
+        return math.cos(a), math.sin(a)
+
     def geographic_to_local(self, lat: float, lon: float, alt: float) -> np.ndarray:
         """
         LLA → קואורדינטות מקומיות (x,y,z) באתר.
         אם מוגדר EPSG פרויקטד – נשתמש בו; אחרת נחושב ENU בקירוב קטן.
         """
+        return self.geographic_to_local_array(lat, lon, alt)[0]
+
+    def geographic_to_local_array(self, lat, lon, alt) -> np.ndarray:
+        """
+        גרסה וקטורית: מערכי lat/lon/alt באורך N (או סקלרים) → מערך (N,3) מקומי.
+        קריאת PROJ אחת לכל המערך.
+        """
+        lat, lon, alt = np.broadcast_arrays(np.atleast_1d(np.asarray(lat, dtype=float)),
+                                            np.atleast_1d(np.asarray(lon, dtype=float)),
+                                            np.atleast_1d(np.asarray(alt, dtype=float)))
         if self.projected_epsg:
-            tr = self._proj()
-            X0, Y0 = tr.transform(self.origin_lon, self.origin_lat)
-            X, Y = tr.transform(lon, lat)
-            dx, dy = X - X0, Y - Y0
+            X0, Y0 = self.origin_projected()
+            X, Y = self._proj().transform(lon.ravel(), lat.ravel())
+            dx, dy = np.asarray(X) - X0, np.asarray(Y) - Y0
         else:
             # ENU בקירוב קטן (לא לשטחים עצומים)
-            dx, dy = _geodetic_dxdy(self.origin_lat, self.origin_lon, lat, lon)
+            dx, dy = _geodetic_dxdy(self.origin_lat, self.origin_lon, lat.ravel(), lon.ravel())
         # סיבוב אתר
-        a = math.radians(self.yaw_site_deg)
-        c, s = math.cos(a), math.sin(a)
-        x = c * dx + s * dy
-        y = -s * dx + c * dy
-        z = alt - self.origin_alt
-        return np.array([x, y, z], dtype=float)
+        c, s = self._site_rot()
+        out = np.empty((dx.size, 3), dtype=float)
+        out[:, 0] = c * dx + s * dy
+        out[:, 1] = -s * dx + c * dy
+        out[:, 2] = alt.ravel() - self.origin_alt
+        return out
 
     def local_to_geographic(self, p: np.ndarray) -> Dict:
         """
         (x,y,z) מקומי → LLA וגם החזרה לקואורדינטות פרויקטד (אם קיימות).
         """
-        x, y, z = float(p[0]), float(p[1]), float(p[2])
+        r = self.local_to_geographic_array(np.asarray(p, dtype=float)[:3])[0]
+        lat, lon, alt = float(r["lat"]), float(r["lon"]), float(r["alt"])
+        if self.projected_epsg:
+            prj = {"x": float(r["x"]), "y": float(r["y"]), "epsg": self.projected_epsg}
+        else:
+            prj = None
+        return {"lla": {"lat": lat, "lon": lon, "alt": alt}, "projected": prj}
+
+    def local_to_geographic_array(self, points: np.ndarray) -> np.ndarray:
+        """
+        גרסה וקטורית: נקודות מקומיות (N,3) → מערך מובנה עם שדות
+        lat, lon, alt, x, y (x/y פרויקטד; NaN אם אין EPSG). קריאת PROJ אחת.
+        """
+        pts = np.asarray(points, dtype=float).reshape(-1, 3)
         # להחזיר מסיבוב האתר
-        a = math.radians(self.yaw_site_deg)
-        c, s = math.cos(a), math.sin(a)
-        dx = c * x - s * y
-        dy = s * x + c * y
+        c, s = self._site_rot()
+        dx = c * pts[:, 0] - s * pts[:, 1]
+        dy = s * pts[:, 0] + c * pts[:, 1]
 
+        out = np.empty(len(pts), dtype=LLA_DTYPE)
         if self.projected_epsg:
-            tr_inv = self._proj_inv()
-            X0, Y0 = Transformer.from_crs("EPSG:4326", f"EPSG:{self.projected_epsg}", always_xy=True)\
-                                .transform(self.origin_lon, self.origin_lat)
+            X0, Y0 = self.origin_projected()
             X = X0 + dx; Y = Y0 + dy
-            lon, lat = tr_inv.transform(X, Y)
-            prj = {"x": X, "y": Y, "epsg": self.projected_epsg}
+            lon, lat = self._proj_inv().transform(X, Y)
+            out["x"], out["y"] = X, Y
         else:
             lat, lon = _geodetic_dxdy_inv(self.origin_lat, self.origin_lon, dx, dy)
-            prj = None
+            out["x"] = out["y"] = np.nan
+        out["lat"], out["lon"] = lat, lon
+        out["alt"] = self.origin_alt + pts[:, 2]
+        return out
 
-        alt = self.origin_alt + z
-        return {"lla": {"lat": lat, "lon": lon, "alt": alt}, "projected": prj}
+
+# שדות הפלט של GeoRef.local_to_geographic_array
+LLA_DTYPE = np.dtype([("lat", float), ("lon", float), ("alt", float), ("x", float), ("y", float)])
 
 
 # פונקציות עזר פומביות לשימוש חיצוני
@@ -230,11 +285,15 @@ def llh_to_enu(lat0, lon0, h0, lat, lon, h):
 
 # ---------------- Ray ∩ DTM ----------------
 def intersect_ray_with_dtm(o: np.ndarray, d: np.ndarray, dtm, georef: GeoRef,
-                           t_min: float = 0.0, t_max: float = 5000.0, step: float = 2.0) -> Optional[np.ndarray]:
+                           t_min: float = 0.0, t_max: float = 5000.0, step: float = 2.0,
+                           method: str = "march") -> Optional[np.ndarray]:
     """
     אינטרסקציה גסה (צעד/חיפוש) של קרן עם פני ה-DTM.
     - o,d במערכת המקומית (אתר) [מטר].
     - דוגמים גובה DTM לפי הקרנה למערכת הפרויקטד של ה-DTM (EPSG).
+    - method="pyramid": traverse the DTM's max-elevation pyramid via
+      ``core.i2g_core.intersect_ray_with_dem`` instead of fixed stepping.
+    - method="dda": exact cell-by-cell walk of the DTM grid (same path).
     """
     assert hasattr(dtm, "info") and hasattr(dtm, "sample")
 
@@ -247,8 +306,7 @@ def intersect_ray_with_dtm(o: np.ndarray, d: np.ndarray, dtm, georef: GeoRef,
         else:
             return None
 
-    tr_inv = Transformer.from_crs("EPSG:4326", f"EPSG:{georef.projected_epsg}", always_xy=True)
-    X0, Y0 = tr_inv.transform(georef.origin_lon, georef.origin_lat)
+    X0, Y0 = georef.origin_projected()
 
     def local_to_proj(x, y):
         # לבטל סיבוב אתר
@@ -257,6 +315,26 @@ def intersect_ray_with_dtm(o: np.ndarray, d: np.ndarray, dtm, georef: GeoRef,
         dy = s * x + c * y
         return X0 + dx, Y0 + dy
 
+    if method != "march":
+        # Move the ray into the DTM's projected CRS, intersect there, and
+        # map the hit back to the same parameter along the local ray.
+        d = np.asarray(d, dtype=float)
+        d = d / np.linalg.norm(d)
+        o_start = np.asarray(o, dtype=float) + d * t_min
+        a = math.radians(georef.yaw_site_deg); c, s = math.cos(a), math.sin(a)
+        Xs, Ys = local_to_proj(o_start[0], o_start[1])
+        d_proj = np.array([c * d[0] - s * d[1], s * d[0] + c * d[1], d[2]], dtype=float)
+        hit = intersect_ray_with_dem(np.array([Xs, Ys, o_start[2]]), d_proj, dtm.sampler(),
+                                     max_range_m=t_max - t_min, method=method)
+        if hit is None:
+            return None
+        n2 = float(np.dot(d_proj[:2], d_proj[:2]))
+        if n2 > 1e-18:
+            t_hit = float(np.dot(np.array(hit[:2]) - np.array([Xs, Ys]), d_proj[:2])) / n2
+        else:
+            t_hit = (hit[2] - o_start[2]) / d_proj[2]
+        return o_start + d * t_hit
+
     # דגימת צעד קדימה עד חציית פני השטח, ואז עידון בינארי
     prev_t = t_min
     prev_p = o + d * prev_t
@@ -300,8 +378,8 @@ def intersect_ray_with_dtm(o: np.ndarray, d: np.ndarray, dtm, georef: GeoRef,
 def _geodetic_dxdy(lat0, lon0, lat, lon):
     # קירוב מטרי קטן: Δx≈R*Δlon*cos(lat0), Δy≈R*Δlat
     R = 6378137.0
-    dlon = math.radians(lon - lon0)
-    dlat = math.radians(lat - lat0)
+    dlon = np.radians(np.asarray(lon) - lon0)
+    dlat = np.radians(np.asarray(lat) - lat0)
     x = R * dlon * math.cos(math.radians(lat0))
     y = R * dlat
     return x, y
@@ -310,7 +388,7 @@ def _geodetic_dxdy(lat0, lon0, lat, lon):
 def _geodetic_dxdy_inv(lat0, lon0, dx, dy):
     R = 6378137.0
     dlat = dy / R
-    lat = lat0 + math.degrees(dlat)
-    dlon = dx / (R * math.cos(math.radians(lat0)))
-    lon = lon0 + math.degrees(dlon)
+    lat = lat0 + np.degrees(dlat)
+    dlon = np.asarray(dx) / (R * math.cos(math.radians(lat0)))
+    lon = lon0 + np.degrees(dlon)
     return lat, lon
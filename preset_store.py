@@ -0,0 +1,177 @@
+# preset_store.py
+# -*- coding: utf-8 -*-
+# Persisted per-preset calibrations keyed by PTZ pose
+#
+# A homography captured in the img2ground window is only valid for the pan,
+# tilt and zoom it was measured at.  PresetStore keeps one calibration per
+# quantized (pan, tilt, zoom) cell in a JSON file next to the bundle, so when
+# the camera returns to a known preset the mapping can switch back to that
+# homography (or pose calibration) immediately.  Entries are indexed in a
+# bucket grid with one-step cells; a nearest-neighbour query only inspects
+# the 3x3x3 cells around the pose, and pan wraps around at 360 degrees.
+
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+Key = Tuple[int, int, Optional[int]]
+
+
+@dataclass
+class PresetEntry:
+    """One stored calibration.
+
+    ``H`` maps image pixels (of an ``image_wh`` frame) to projected map
+    coordinates in ``epsg``.  ``pose`` optionally holds a full pose
+    calibration (yaw/pitch/roll/hfov_deg/z) for the same preset.
+    """
+    pan: float
+    tilt: float
+    zoom: Optional[float]
+    H: Optional[List[List[float]]] = None
+    image_wh: Optional[Tuple[int, int]] = None
+    epsg: Optional[int] = None
+    rms: Optional[float] = None
+    n_points: Optional[int] = None
+    pose: Optional[Dict[str, float]] = None
+    created: float = field(default_factory=time.time)
+
+    def homography(self) -> Optional[np.ndarray]:
+        return None if self.H is None else np.asarray(self.H, dtype=float).reshape(3, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = asdict(self)
+        d["image_wh"] = list(self.image_wh) if self.image_wh else None
+        return d
+
+    @staticmethod
+    def from_dict(d: Dict[str, Any]) -> "PresetEntry":
+        wh = d.get("image_wh")
+        return PresetEntry(
+            pan=float(d["pan"]),
+            tilt=float(d["tilt"]),
+            zoom=None if d.get("zoom") is None else float(d["zoom"]),
+            H=d.get("H"),
+            image_wh=(int(wh[0]), int(wh[1])) if wh else None,
+            epsg=d.get("epsg"),
+            rms=d.get("rms"),
+            n_points=d.get("n_points"),
+            pose=d.get("pose"),
+            created=float(d.get("created", 0.0)),
+        )
+
+
+class PresetStore:
+    """Calibrations keyed by quantized PTZ pose, with nearest-preset lookup.
+
+    ``pan_step``/``tilt_step`` (degrees) and ``zoom_step`` (zoom units) set
+    the quantization: one entry is kept per cell, and :meth:`nearest` by
+    default accepts presets within one step on every axis.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None, pan_step: float = 0.5,
+                 tilt_step: float = 0.5, zoom_step: float = 0.01):
+        self.path = Path(path) if path is not None else None
+        self.pan_step = float(pan_step)
+        self.tilt_step = float(tilt_step)
+        self.zoom_step = float(zoom_step)
+        self._n_pan = max(int(round(360.0 / self.pan_step)), 1)
+        self._entries: Dict[Key, PresetEntry] = {}
+
+    # ----- keys -----
+    def key(self, pan: float, tilt: float, zoom: Optional[float]) -> Key:
+        i = int(math.floor((float(pan) % 360.0) / self.pan_step + 0.5)) % self._n_pan
+        j = int(math.floor(float(tilt) / self.tilt_step + 0.5))
+        k = None if zoom is None else int(math.floor(float(zoom) / self.zoom_step + 0.5))
+        return (i, j, k)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[PresetEntry]:
+        return iter(list(self._entries.values()))
+
+    # ----- edit -----
+    def put(self, entry: PresetEntry) -> Key:
+        """Store ``entry``, replacing any calibration in the same cell."""
+        k = self.key(entry.pan, entry.tilt, entry.zoom)
+        self._entries[k] = entry
+        return k
+
+    def remove(self, pan: float, tilt: float, zoom: Optional[float]) -> bool:
+        return self._entries.pop(self.key(pan, tilt, zoom), None) is not None
+
+    def get(self, pan: float, tilt: float, zoom: Optional[float]) -> Optional[PresetEntry]:
+        """Entry in the exact quantization cell of the pose."""
+        return self._entries.get(self.key(pan, tilt, zoom))
+
+    # ----- lookup -----
+    def nearest(self, pan: float, tilt: float, zoom: Optional[float],
+                pan_tol: Optional[float] = None, tilt_tol: Optional[float] = None,
+                zoom_tol: Optional[float] = None) -> Optional[Tuple[PresetEntry, float]]:
+        """Closest stored preset within the tolerances, with its normalized distance.
+
+        Tolerances default to one quantization step and may not exceed it
+        (the search only visits neighbouring cells).  Presets stored without
+        zoom only match queries without zoom, and vice versa.
+        """
+        pt = min(self.pan_step if pan_tol is None else float(pan_tol), self.pan_step)
+        tt = min(self.tilt_step if tilt_tol is None else float(tilt_tol), self.tilt_step)
+        zt = min(self.zoom_step if zoom_tol is None else float(zoom_tol), self.zoom_step)
+        i, j, k = self.key(pan, tilt, zoom)
+        best: Optional[Tuple[PresetEntry, float]] = None
+        for di in (-1, 0, 1):
+            for dj in (-1, 0, 1):
+                for dk in ((-1, 0, 1) if k is not None else (0,)):
+                    e = self._entries.get(((i + di) % self._n_pan, j + dj, None if k is None else k + dk))
+                    if e is None:
+                        continue
+                    dp = abs((e.pan - pan + 180.0) % 360.0 - 180.0)
+                    dt = abs(e.tilt - tilt)
+                    dz = 0.0 if zoom is None else abs(e.zoom - zoom)
+                    if dp > pt or dt > tt or dz > zt:
+                        continue
+                    dist = math.sqrt((dp / pt) ** 2 + (dt / tt) ** 2 + ((dz / zt) ** 2 if zt > 0 else 0.0))
+                    if best is None or dist < best[1]:
+                        best = (e, dist)
+        return best
+
+    # ----- persistence -----
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "pan_step": self.pan_step,
+            "tilt_step": self.tilt_step,
+            "zoom_step": self.zoom_step,
+            "presets": [e.to_dict() for e in self._entries.values()],
+        }
+
+    def save(self, path: Optional[Union[str, Path]] = None) -> None:
+        p = Path(path) if path is not None else self.path
+        if p is None:
+            raise ValueError("PresetStore has no path")
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(p.suffix + f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self.to_dict(), ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, p)
+
+    @staticmethod
+    def load(path: Union[str, Path]) -> "PresetStore":
+        """Load a store from ``path``; a missing or unreadable file gives an empty store."""
+        p = Path(path)
+        try:
+            d = json.loads(p.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return PresetStore(p)
+        store = PresetStore(p, d.get("pan_step", 0.5), d.get("tilt_step", 0.5), d.get("zoom_step", 0.01))
+        for item in d.get("presets", []):
+            try:
+                store.put(PresetEntry.from_dict(item))
+            except (KeyError, TypeError, ValueError):
+                continue
+        return store
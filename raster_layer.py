@@ -1,7 +1,7 @@
 # raster_layer.py
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from typing import Tuple
+from typing import Optional, Tuple
 import numpy as np
 
 try:
@@ -16,42 +16,113 @@ except Exception as e:
     xy = None
     _RASTERIO_IMPORT_ERROR = repr(e)
 
+def to_display_image(data: np.ndarray, stretch: Optional[Tuple[float, float]] = None):
+    """Convert bands ``(count, h, w)`` to a uint8 RGB ``(h, w, 3)`` or gray ``(h, w)`` image.
+
+    Single bands are stretched linearly over ``stretch`` (default: their 2–98
+    percentiles); returns the image and the stretch used.
+    """
+    if data.shape[0] >= 3:
+        arr = np.stack([data[0], data[1], data[2]], axis=2).astype(np.float32)
+        return np.clip(arr, 0, 255).astype(np.uint8), stretch
+    band = data[0].astype(np.float32)
+    if stretch is None:
+        m0, m1 = np.nanpercentile(band, [2, 98])
+        stretch = (float(m0), float(m1))
+    m0, m1 = stretch
+    band = np.clip((band - m0)/(m1-m0+1e-6)*255.0, 0, 255).astype(np.uint8)
+    return band, stretch
+
+def overview_size(width: int, height: int, max_size: int) -> Tuple[int, int]:
+    """Size ``(w, h)`` of the overview RasterLayer decodes for a ``width`` x ``height`` raster."""
+    scale = max(width, height) / float(max_size) if max(width, height) > max_size else 1.0
+    return int(round(width/scale)), int(round(height/scale))
+
+_USE_DEFAULT_CACHE = object()
+
 class RasterLayer:
-    """Loads a GeoTIFF as a downsampled image and keeps mapping to CRS coordinates."""
-    def __init__(self, path: str, max_size: int = 2048):
+    """Loads a GeoTIFF as a downsampled image and keeps mapping to CRS coordinates.
+
+    The overview, its stretch and the map tiles are kept in ``cache`` (a
+    :class:`tile_cache.TileCache`; by default the process-wide one, ``None``
+    to disable), so reopening an unchanged file memory-maps them instead of
+    decoding again.
+    """
+    def __init__(self, path: str, max_size: int = 2048, cache=_USE_DEFAULT_CACHE):
         if rasterio is None:
             raise RuntimeError(f"rasterio required: {_RASTERIO_IMPORT_ERROR}. Install: pip install rasterio")
         self.path = path
+        self.max_size = int(max_size)
+        if cache is _USE_DEFAULT_CACHE:
+            from tile_cache import default_cache
+            cache = default_cache()
+        self.cache = cache
+        self.cache_key = None
+        cached = None
+        if cache is not None:
+            from tile_cache import file_key
+            try:
+                self.cache_key = file_key(path)
+                cached = cache.load_overview(self.cache_key, max_size)
+            except OSError:
+                self.cache_key = None
+        if cached is None:
+            # Overviews let both the overview below and map tiles skip full-res decoding
+            from raster_tiles import ensure_overviews
+            try:
+                ensure_overviews(path)
+            except Exception:
+                pass
         self.ds = rasterio.open(path, "r")
         self.crs = self.ds.crs
         self.transform = self.ds.transform  # full-res affine
         self.bounds = self.ds.bounds
         self.size = (self.ds.width, self.ds.height)
         self.rgb = None
+        self.stretch = None  # display range of single-band rasters
         self.over_transform = None  # transform for the downsampled image
-        self._read_overview(max_size)
+        self.over_scale = (1.0, 1.0)  # full-res pixels per overview pixel
+        self._tiles = None
+        if cached is not None:
+            self._use_cached_overview(*cached)
+        else:
+            self._read_overview(max_size)
+            if self.cache_key is not None:
+                cache.save_overview(self.cache_key, max_size, self.rgb, {
+                    "stretch": list(self.stretch) if self.stretch is not None else None,
+                    "over_scale": list(self.over_scale),
+                    "transform": list(self.transform)[:6],
+                    "size": list(self.size),
+                })
+
+    def _use_cached_overview(self, img: np.ndarray, meta: dict):
+        self.rgb = img
+        self.stretch = tuple(meta["stretch"]) if meta.get("stretch") is not None else None
+        sx, sy = meta["over_scale"]
+        self.over_scale = (float(sx), float(sy))
+        self.over_transform = Affine(*meta["transform"]) * Affine.scale(sx, sy)
 
     def _read_overview(self, max_size: int):
         W, H = self.ds.width, self.ds.height
-        scale = max(W, H) / float(max_size) if max(W, H) > max_size else 1.0
-        out_w, out_h = int(round(W/scale)), int(round(H/scale))
+        out_w, out_h = overview_size(W, H, max_size)
         data = self.ds.read(out_shape=(self.ds.count, out_h, out_w), resampling=Resampling.bilinear)
-        if self.ds.count >= 3:
-            arr = np.stack([data[0], data[1], data[2]], axis=2).astype(np.float32)
-            arr = np.clip(arr, 0, 255).astype(np.uint8)
-        else:
-            band = data[0].astype(np.float32)
-            m0, m1 = np.nanpercentile(band, [2, 98])
-            band = np.clip((band - m0)/(m1-m0+1e-6)*255.0, 0, 255).astype(np.uint8)
-            arr = band
-        self.rgb = arr
+        self.rgb, self.stretch = to_display_image(data)
         # overview transform = original transform scaled by factor
         sx = W / float(out_w); sy = H / float(out_h)
+        self.over_scale = (sx, sy)
         self.over_transform = self.transform * Affine.scale(sx, sy)
 
     def downsampled_image(self) -> np.ndarray:
         return self.rgb
 
+    def tile_source(self):
+        """Full-resolution :class:`raster_tiles.TileSource`, opened on first use."""
+        if self._tiles is None:
+            from raster_tiles import TileSource
+            self._tiles = TileSource(self.path, stretch=self.stretch, build_overviews=False,
+                                     cache=self.cache, cache_key=self.cache_key)
+        return self._tiles
+
     # scene (pix in downsampled image) -> CRS (X,Y)
     def scene_to_geo(self, x_scene: float, y_scene: float) -> Tuple[float, float]:
         """Map scene pixel coords -> CRS coordinates (X,Y) using over_transform."""
@@ -68,6 +139,9 @@ class RasterLayer:
         return float(x_scene), float(y_scene)
 
     def close(self):
+        if self._tiles is not None:
+            self._tiles.close()
+            self._tiles = None
         try:
             self.ds.close()
         except Exception:
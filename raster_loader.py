@@ -0,0 +1,132 @@
+# raster_loader.py
+# -*- coding: utf-8 -*-
+# Background raster loading with a quick preview
+#
+# Constructing a RasterLayer decodes an overview of the whole raster, which
+# takes seconds for large orthophotos and used to freeze the Qt thread.
+# start_raster_load() moves it to a small worker pool: a coarse preview, read
+# from one of the file's existing overview levels, is ready almost at once,
+# and the full layer is then borrowed from dataset_pool.  Files without
+# overviews get no preview – decimating the full resolution would cost as
+# much as the load itself.  A load can be cancelled when the user switches
+# layer or camera; a cancelled load never hands out its layer, and a layer
+# that finishes after cancellation goes straight back to the pool.  Map tiles
+# (see ui_map_tools.TiledRasterItem) are fetched on a separate pool so a
+# running load does not hold them up.
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import threading
+
+import numpy as np
+
+import dataset_pool
+from raster_layer import overview_size, to_display_image
+
+# Workers for layer loads and for tile reads
+_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="raster")
+_tile_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="raster-tile")
+
+
+def submit(fn, *args, **kwargs) -> Future:
+    """Run ``fn`` on the raster load pool."""
+    return _pool.submit(fn, *args, **kwargs)
+
+
+def submit_tile(fn, *args, **kwargs) -> Future:
+    """Run ``fn`` on the tile read pool."""
+    return _tile_pool.submit(fn, *args, **kwargs)
+
+
+@dataclass
+class Preview:
+    """Coarse image of a raster; ``size`` is the ``(w, h)`` of the final overview it stands in for."""
+    image: np.ndarray
+    size: Tuple[int, int]
+
+
+def read_preview(path: str, max_size: int = 2048, preview_size: int = 256) -> Optional[Preview]:
+    """Coarse image from the smallest overview level at least ``preview_size`` wide.
+
+    Returns ``None`` when the file has no overviews.
+    """
+    import rasterio
+    from rasterio.enums import Resampling
+    with rasterio.open(path, "r") as ds:
+        factors = ds.overviews(1)
+        w, h, count = ds.width, ds.height, ds.count
+    if not factors:
+        return None
+    pw, ph = overview_size(w, h, preview_size)
+    # Coarsest level that still has the preview's resolution, else the coarsest
+    level = len(factors) - 1
+    for i, f in enumerate(factors):
+        if -(-w // f) < pw or -(-h // f) < ph:
+            level = max(i - 1, 0)
+            break
+    with rasterio.open(path, "r", overview_level=level) as ov:
+        data = ov.read(out_shape=(count, ph, pw), resampling=Resampling.nearest)
+    img, _ = to_display_image(data)
+    return Preview(img, overview_size(w, h, max_size))
+
+
+class RasterLoad:
+    """A background load of one raster layer.
+
+    ``preview`` and ``layer`` are futures; ``layer`` resolves to ``True``
+    once the layer is ready, which :meth:`take` then hands over (borrowed
+    from :mod:`dataset_pool` – the receiver releases it).
+    """
+
+    def __init__(self, path: str, max_size: int = 2048, preview_size: int = 256):
+        self.path = path
+        self.max_size = int(max_size)
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._layer = None
+        self._taken = False
+        self.preview: Future = submit(self._read_preview, preview_size)
+        self.layer: Future = submit(self._load)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def _read_preview(self, preview_size: int) -> Optional[Preview]:
+        if self._cancelled:
+            return None
+        return read_preview(self.path, self.max_size, preview_size)
+
+    def _load(self) -> bool:
+        if self._cancelled:
+            return False
+        layer = dataset_pool.acquire_raster_layer(self.path, max_size=self.max_size)
+        with self._lock:
+            if not self._cancelled:
+                self._layer = layer
+                return True
+        dataset_pool.release(layer)
+        return False
+
+    def take(self):
+        """The loaded layer, once; ``None`` if not ready, cancelled or already taken."""
+        with self._lock:
+            if self._cancelled or self._taken or self._layer is None:
+                return None
+            self._taken = True
+            return self._layer
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled = True
+            layer = None if self._taken else self._layer
+            self._layer = None
+        self.preview.cancel()
+        self.layer.cancel()
+        dataset_pool.release(layer)
+
+
+def start_raster_load(path: str, max_size: int = 2048, preview_size: int = 256) -> RasterLoad:
+    """Start loading ``path`` in the background; see :class:`RasterLoad`."""
+    return RasterLoad(path, max_size, preview_size)
@@ -0,0 +1,222 @@
+# raster_tiles.py
+# -*- coding: utf-8 -*-
+# Multi-resolution tile access to GeoTIFF orthophotos and DTMs
+#
+# RasterLayer keeps one ~2048 px overview of the whole raster, which is all
+# the map shows when zoomed out but turns into blurry blocks when zoomed in.
+# TileSource cuts the raster into a pyramid of fixed-size tiles: level L
+# covers the raster at 1/2**L of full resolution, so a view only ever needs
+# about (viewport / tile_size)**2 tiles whatever the zoom.  Reads go through
+# the GeoTIFF's overviews (an external .ovr is built once when the file has
+# none) so coarse levels never decode full-resolution blocks, and decoded
+# tiles live in a byte-bounded LRU.  Reads and the cache have separate locks
+# so tiles may be fetched from worker threads while the UI draws cached ones.
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import math
+import threading
+
+import numpy as np
+
+try:
+    import rasterio
+    from rasterio.enums import Resampling
+    from rasterio.windows import Window
+    _RASTERIO_IMPORT_ERROR = None
+except Exception as e:
+    rasterio = None
+    Resampling = None
+    Window = None
+    _RASTERIO_IMPORT_ERROR = repr(e)
+
+from raster_layer import to_display_image
+
+TileKey = Tuple[int, int, int]  # (level, tx, ty)
+
+
+def overview_factors(width: int, height: int, tile_size: int = 256) -> List[int]:
+    """Decimation factors 2, 4, ... until the whole raster fits in one tile."""
+    factors = []
+    f = 2
+    while max(width, height) / (f // 2) > tile_size:
+        factors.append(f)
+        f *= 2
+    return factors
+
+
+def ensure_overviews(path: str, tile_size: int = 256, min_size: int = 4096) -> List[int]:
+    """Return the overview factors of ``path``, building an external ``.ovr`` if it has none.
+
+    Rasters no larger than ``min_size`` pixels decode quickly enough without
+    overviews and are left alone.  The source file itself is not modified;
+    building needs write access to its directory, and on failure the (empty)
+    existing factors are returned so reads decimate full resolution instead.
+    """
+    if rasterio is None:
+        raise RuntimeError(f"rasterio required: {_RASTERIO_IMPORT_ERROR}. Install: pip install rasterio")
+    with rasterio.open(path, "r") as ds:
+        have = ds.overviews(1)
+        size = max(ds.width, ds.height)
+        want = overview_factors(ds.width, ds.height, tile_size)
+    if have or not want or size <= min_size:
+        return have
+    try:
+        with rasterio.Env(TIFF_USE_OVR=True):
+            with rasterio.open(path, "r+") as ds:
+                ds.build_overviews(want, Resampling.average)
+    except Exception:
+        return have
+    with rasterio.open(path, "r") as ds:
+        return ds.overviews(1)
+
+
+class TileSource:
+    """Tile pyramid over one GeoTIFF.
+
+    Pixel coordinates are full-resolution raster pixels (column, row).
+    ``stretch`` is the ``(low, high)`` display range for single-band rasters;
+    pass the one of the layer's overview so tiles match it.  With a
+    :class:`tile_cache.TileCache` in ``cache``, rendered tiles are also
+    kept on disk under ``cache_key`` (default: :func:`tile_cache.file_key`).
+    """
+
+    def __init__(self, path: str, tile_size: int = 256, cache_bytes: int = 64 * 1024 * 1024,
+                 stretch: Optional[Tuple[float, float]] = None, build_overviews: bool = True,
+                 cache=None, cache_key: Optional[str] = None):
+        if rasterio is None:
+            raise RuntimeError(f"rasterio required: {_RASTERIO_IMPORT_ERROR}. Install: pip install rasterio")
+        self.path = path
+        self.tile_size = int(tile_size)
+        self.cache_bytes = int(cache_bytes)
+        if build_overviews:
+            try:
+                ensure_overviews(path, self.tile_size)
+            except Exception:
+                pass
+        self._ds = rasterio.open(path, "r")
+        self.width, self.height = self._ds.width, self._ds.height
+        self.count = self._ds.count
+        self.overviews = self._ds.overviews(1)
+        self.n_levels = len(overview_factors(self.width, self.height, self.tile_size)) + 1
+        self.stretch = stretch
+        self.disk = cache
+        self._disk_key = cache_key
+        if cache is not None and cache_key is None:
+            from tile_cache import file_key
+            self._disk_key = file_key(path)
+        self._tiles: "OrderedDict[TileKey, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()     # tile cache
+        self._io_lock = threading.Lock()  # rasterio handle
+
+    def close(self) -> None:
+        with self._lock:
+            self._tiles.clear()
+            self._bytes = 0
+        with self._io_lock:
+            try:
+                self._ds.close()
+            except Exception:
+                pass
+
+    def cache_info(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "tiles": len(self._tiles),
+                    "bytes": self._bytes, "max_bytes": self.cache_bytes}
+
+    # ----- geometry -----
+    def level_for(self, screen_per_pixel: float) -> int:
+        """Coarsest level that still gives one tile pixel per screen pixel.
+
+        ``screen_per_pixel`` is the number of screen pixels spanned by one
+        full-resolution raster pixel at the current zoom.
+        """
+        if screen_per_pixel <= 0:
+            return self.n_levels - 1
+        level = int(math.floor(math.log2(1.0 / screen_per_pixel))) if screen_per_pixel < 1.0 else 0
+        return min(max(level, 0), self.n_levels - 1)
+
+    def grid(self, level: int) -> Tuple[int, int]:
+        """Number of tiles ``(nx, ny)`` at ``level``."""
+        span = self.tile_size << level
+        return (self.width + span - 1) // span, (self.height + span - 1) // span
+
+    def tile_rect(self, level: int, tx: int, ty: int) -> Tuple[int, int, int, int]:
+        """Full-resolution pixel rectangle ``(x0, y0, x1, y1)`` covered by a tile."""
+        span = self.tile_size << level
+        x0, y0 = tx * span, ty * span
+        return x0, y0, min(x0 + span, self.width), min(y0 + span, self.height)
+
+    def tiles_in(self, level: int, x0: float, y0: float, x1: float, y1: float) -> List[Tuple[int, int]]:
+        """Tiles of ``level`` intersecting the full-resolution pixel rectangle, center first."""
+        span = float(self.tile_size << level)
+        nx, ny = self.grid(level)
+        i0, i1 = max(int(x0 // span), 0), min(int(math.ceil(x1 / span)), nx)
+        j0, j1 = max(int(y0 // span), 0), min(int(math.ceil(y1 / span)), ny)
+        cx, cy = 0.5 * (x0 + x1) / span - 0.5, 0.5 * (y0 + y1) / span - 0.5
+        tiles = [(i, j) for j in range(j0, j1) for i in range(i0, i1)]
+        tiles.sort(key=lambda t: (t[0] - cx) ** 2 + (t[1] - cy) ** 2)
+        return tiles
+
+    # ----- data -----
+    def cached(self, level: int, tx: int, ty: int) -> Optional[np.ndarray]:
+        """Tile if already decoded, without reading (safe to call from paint)."""
+        key = (level, tx, ty)
+        with self._lock:
+            img = self._tiles.get(key)
+            if img is not None:
+                self._tiles.move_to_end(key)
+            return img
+
+    def tile(self, level: int, tx: int, ty: int) -> np.ndarray:
+        """Display image of a tile: ``uint8`` ``(h, w)`` gray or ``(h, w, 3)`` RGB."""
+        key = (level, tx, ty)
+        with self._lock:
+            img = self._tiles.get(key)
+            if img is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return img
+            self.misses += 1
+        # Decode outside the cache lock so cache lookups never wait for I/O
+        variant = self._disk_variant()
+        img = self.disk.load_tile(self._disk_key, variant, level, tx, ty) if variant else None
+        if img is None:
+            with self._io_lock:
+                img = self._read(level, tx, ty)
+            variant = self._disk_variant()
+            if variant:
+                self.disk.save_tile(self._disk_key, variant, level, tx, ty, img)
+        with self._lock:
+            if key not in self._tiles:
+                self._tiles[key] = img
+                self._bytes += img.nbytes
+            while self._bytes > self.cache_bytes and len(self._tiles) > 1:
+                _, old = self._tiles.popitem(last=False)
+                self._bytes -= old.nbytes
+        return img
+
+    def _disk_variant(self) -> Optional[str]:
+        """Disk-cache name of this rendering, once the stretch is known."""
+        if self.disk is None or (self.count < 3 and self.stretch is None):
+            return None
+        from tile_cache import variant_key
+        return variant_key(self.tile_size, self.count >= 3 or tuple(self.stretch))
+
+    def _read(self, level: int, tx: int, ty: int) -> np.ndarray:
+        # Called with ``self._io_lock`` held.
+        x0, y0, x1, y1 = self.tile_rect(level, tx, ty)
+        f = 1 << level
+        out_w = max(int(math.ceil((x1 - x0) / f)), 1)
+        out_h = max(int(math.ceil((y1 - y0) / f)), 1)
+        bands = [1, 2, 3] if self.count >= 3 else [1]
+        data = self._ds.read(bands, window=Window(x0, y0, x1 - x0, y1 - y0),
+                             out_shape=(len(bands), out_h, out_w),
+                             resampling=Resampling.nearest if f == 1 else Resampling.bilinear)
+        img, stretch = to_display_image(data, self.stretch)
+        if self.stretch is None:
+            self.stretch = stretch
+        return img
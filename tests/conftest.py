@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+import tile_cache
+from core import filecache
+
+
+@pytest.fixture(autouse=True)
+def _isolated_tile_cache(tmp_path_factory):
+    """Keep the default disk caches out of the working tree."""
+    filecache.set_cache_root(tmp_path_factory.mktemp("cache"))
+    tile_cache.set_default_cache(tile_cache.TileCache())
+    yield
+    filecache.set_cache_root(None)
+    tile_cache.set_default_cache(tile_cache.TileCache())
+
+
+@pytest.fixture
+def write_geotiff():
+    """Writer for north-up EPSG:32636 GeoTIFFs; skips the test without rasterio.
+
+    ``write_geotiff(path, data, res=1.0, origin=(500000.0, 3500000.0),
+    overviews=(), **options)`` writes a ``(rows, cols)`` or ``(bands, rows,
+    cols)`` array with its top-left corner at ``origin`` and ``res`` sized
+    pixels, builds the given overview factors and passes ``options`` (tiling,
+    nodata, ...) to rasterio.  Returns ``path``.
+    """
+    rasterio = pytest.importorskip("rasterio")
+    from rasterio.enums import Resampling
+    from rasterio.transform import from_origin
+
+    def write(path, data, res=1.0, origin=(500000.0, 3500000.0), overviews=(), **options):
+        data = np.asarray(data)
+        if data.ndim == 2:
+            data = data[np.newaxis]
+        count, h, w = data.shape
+        with rasterio.open(path, "w", driver="GTiff", width=w, height=h, count=count,
+                           dtype=data.dtype, crs="EPSG:32636",
+                           transform=from_origin(origin[0], origin[1], res, res), **options) as ds:
+            ds.write(data)
+            if overviews:
+                ds.build_overviews(list(overviews), Resampling.nearest)
+        return path
+
+    return write
@@ -0,0 +1,25 @@
+import crs_cache
+
+
+def test_transformers_are_shared_across_crs_spellings():
+    crs_cache.clear()
+    a = crs_cache.get_transformer(4326, 32636)
+    b = crs_cache.get_transformer("EPSG:4326", "epsg:32636")
+    c = crs_cache.get_transformer("4326", "EPSG:32636", always_xy=True)
+    assert a is b is c
+    info = crs_cache.cache_info()
+    assert info["misses"] == 1 and info["hits"] == 2
+    x, y = a.transform(33.0, 31.0)
+    assert 400000 < x < 600000 and 3.0e6 < y < 4.0e6
+
+
+def test_lru_bound_and_warm(monkeypatch):
+    crs_cache.clear()
+    monkeypatch.setattr(crs_cache, "MAX_TRANSFORMERS", 2)
+    crs_cache.warm_site(32636, None)
+    assert crs_cache.cache_info()["size"] == 2
+    crs_cache.get_transformer(4326, 3857)
+    assert crs_cache.cache_info()["size"] == 2
+    # Invalid pairs are skipped while warming
+    crs_cache.warm([(4326, "not-a-crs")])
+    crs_cache.clear()
@@ -0,0 +1,115 @@
+import os
+
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+
+import dataset_pool
+
+
+@pytest.fixture
+def write_dem(write_geotiff):
+    def write(path, value=10.0):
+        data = np.full((20, 30), value, dtype=np.float32)
+        return write_geotiff(path, data, origin=(500000.0, 3500020.0))
+    return write
+
+
+@pytest.fixture
+def pool():
+    dataset_pool.clear()
+    yield dataset_pool
+    dataset_pool.clear()
+
+
+def test_dtm_is_shared_and_kept_idle(tmp_path, pool, write_dem):
+    p = str(tmp_path / "dem.tif")
+    write_dem(p)
+    a = pool.acquire_dtm(p)
+    b = pool.acquire_dtm(os.path.join(str(tmp_path), ".", "dem.tif"))
+    assert a is b
+    assert pool.pool_info()["borrowed"] == 1
+    pool.release(a)
+    pool.release(b)
+    info = pool.pool_info()
+    assert info["borrowed"] == 0 and info["idle"] == 1
+    # The idle DTM, with its decoded sampler, is handed out again
+    s = a.sampler()
+    with pool.borrow_dtm(p) as c:
+        assert c is a and c.sampler() is s
+        assert c.sample(500010.5, 3500010.5) == pytest.approx(10.0)
+    assert pool.pool_info()["hits"] == 2
+
+
+def test_rewritten_file_gets_a_fresh_dataset(tmp_path, pool, write_dem):
+    p = str(tmp_path / "dem.tif")
+    write_dem(p, 10.0)
+    old = pool.acquire_dtm(p)
+    write_dem(p, 20.0)
+    st = os.stat(p)
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    new = pool.acquire_dtm(p)
+    assert new is not old
+    assert new.sample(500010.5, 3500010.5) == pytest.approx(20.0)
+    # The stale dataset closes as soon as its last borrower lets go
+    pool.release(old)
+    assert old.ds.closed
+    pool.release(new)
+    assert not new.ds.closed and pool.pool_info()["idle"] == 1
+
+
+def test_idle_lru_bound_and_foreign_release(tmp_path, pool, monkeypatch, write_dem):
+    monkeypatch.setattr(dataset_pool, "MAX_IDLE", 1)
+    paths = []
+    for i in range(2):
+        paths.append(str(tmp_path / f"dem{i}.tif"))
+        write_dem(paths[-1])
+    a = pool.acquire_raster_layer(paths[0], max_size=16)
+    b = pool.acquire_raster_layer(paths[1], max_size=16)
+    assert a.downsampled_image().shape == (11, 16)
+    c = pool.acquire_raster_layer(paths[0], max_size=32)
+    assert c is not a
+    pool.release(c)
+    pool.release(object())
+    pool.release(None)
+    pool.release(a)
+    pool.release(b)
+    assert a.ds.closed and c.ds.closed and not b.ds.closed
+    assert pool.pool_info()["idle"] == 1
+
+
+def test_sampler_is_built_in_the_background(tmp_path, pool, write_dem):
+    p = str(tmp_path / "dem.tif")
+    write_dem(p, 12.0)
+    dtm = pool.acquire_dtm(p)
+    assert dtm.ready_sampler() is None
+    job = dtm.start_sampler()
+    assert dtm.start_sampler() is job
+    s = job.result(timeout=10)
+    assert dtm.ready_sampler() is s and dtm.sampler() is s
+    pool.release(dtm)
+
+
+def test_point_samples_do_not_wait_for_the_sampler(tmp_path, pool, write_dem):
+    p = str(tmp_path / "dem.tif")
+    write_dem(p, 7.0)
+    dtm = pool.acquire_dtm(p)
+    # Hold the build so any inline sampler construction would block
+    with dtm._build_lock:
+        assert dtm.sample(500010.5, 3500010.5) == pytest.approx(7.0)
+        assert np.allclose(dtm.elevations([500001.0, 500020.0], [3500001.0, 3500015.0]), 7.0)
+        assert dtm.ready_sampler() is None
+    assert dtm.start_sampler().result(timeout=10) is dtm.ready_sampler()
+    pool.release(dtm)
+
+
+def test_max_pyramid_is_cached_outside_the_dtm_directory(tmp_path, pool, write_dem):
+    from core import filecache
+
+    p = str(tmp_path / "dem.tif")
+    write_dem(p)
+    with pool.borrow_dtm(p) as dtm:
+        dtm.sampler().max_pyramid()
+    assert os.listdir(tmp_path) == ["dem.tif"]
+    assert len(list((filecache.cache_root() / "pyramids").glob("maxpyr_*.npz"))) == 1
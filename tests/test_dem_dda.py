@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from core.dem_dda import intersect_ray_with_dda
+from core.dem_grid import GridDemSampler
+from core.i2g_core import intersect_ray_with_dem
+
+
+def _terrain(h=60, w=80, seed=3):
+    rng = np.random.default_rng(seed)
+    rows, cols = np.mgrid[0:h, 0:w]
+    z = 2.5 * np.sin(cols / 6.0) + 2.0 * np.cos(rows / 4.0) + rng.uniform(0, 0.5, (h, w))
+    return GridDemSampler(z, (1.0, 0.0, 0.0, 0.0, -1.0, float(h)))
+
+
+def test_dda_matches_pyramid_in_all_directions():
+    dem = _terrain()
+    origin = np.array([40.0, 30.0, 15.0])
+    rng = np.random.default_rng(4)
+    for _ in range(40):
+        az = rng.uniform(0.0, 2.0 * np.pi)
+        d = np.array([np.cos(az), np.sin(az), rng.uniform(-0.5, -0.05)])
+        hit = intersect_ray_with_dem(origin, d, dem, max_range_m=200.0, method="dda")
+        ref = intersect_ray_with_dem(origin, d, dem, max_range_m=200.0, method="pyramid")
+        if ref is None:
+            assert hit is None
+        else:
+            assert hit is not None
+            assert np.allclose(hit, ref, atol=1e-6)
+
+
+def test_dda_axis_aligned_and_vertical_rays():
+    dem = GridDemSampler(np.full((10, 10), 3.0), (1.0, 0.0, 0.0, 0.0, -1.0, 10.0))
+    down = intersect_ray_with_dda(np.array([4.2, 5.7, 9.0]), np.array([0.0, 0.0, -1.0]), dem)
+    assert down == pytest.approx((4.2, 5.7, 3.0))
+    west = intersect_ray_with_dda(np.array([8.5, 5.5, 4.0]), np.array([-1.0, 0.0, -0.25]), dem)
+    assert west == pytest.approx((4.5, 5.5, 3.0))
+
+
+def test_dda_never_tunnels_through_thin_wall():
+    z = np.zeros((3, 4000))
+    z[:, 3001] = 30.0
+    dem = GridDemSampler(z, (1.0, 0.0, 0.0, 0.0, -1.0, 3.0))
+    hit = intersect_ray_with_dda(np.array([0.5, 1.5, 20.0]), np.array([1.0, 0.0, -0.001]), dem,
+                                 max_range_m=3900.0)
+    assert hit is not None and 3000.5 < hit[0] < 3001.5
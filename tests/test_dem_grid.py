@@ -0,0 +1,146 @@
+import numpy as np
+import pytest
+
+from core.dem_grid import GridDemSampler, attach_shared_grid, read_window, shared_grid
+from core.i2g_core import intersect_ray_with_dem, intersect_rays_with_dem
+
+
+def _plane_dem(nodata=None):
+    # 1 m pixels, north-up, top-left corner at (100, 50)
+    rows, cols = np.mgrid[0:20, 0:30]
+    x = 100.0 + cols + 0.5
+    y = 50.0 - rows - 0.5
+    z = 0.3 * x - 0.2 * y + 5.0
+    if nodata is not None:
+        z[5, 7] = nodata
+    return GridDemSampler(z, (1.0, 0.0, 100.0, 0.0, -1.0, 50.0), nodata=nodata)
+
+
+def test_bilinear_reproduces_plane():
+    dem = _plane_dem()
+    xs = np.array([101.0, 110.25, 125.7, 129.5])
+    ys = np.array([49.0, 40.5, 33.3, 30.5])
+    expected = 0.3 * xs - 0.2 * ys + 5.0
+    assert np.allclose(dem.elevations(xs, ys), expected)
+    assert dem.elevation(110.25, 40.5) == pytest.approx(0.3 * 110.25 - 0.2 * 40.5 + 5.0)
+
+
+def test_outside_extent_is_missing():
+    dem = _plane_dem()
+    vals = dem.elevations([99.0, 131.0, 110.0], [40.0, 40.0, 51.0])
+    assert np.all(np.isnan(vals))
+    assert dem.elevation(99.0, 40.0) is None
+
+
+def test_nodata_masks_neighbourhood():
+    dem = _plane_dem(nodata=-9999.0)
+    # Center of the nodata pixel and a point interpolating from it
+    assert dem.elevation(107.5, 44.5) is None
+    assert dem.elevation(107.9, 44.5) is None
+    # Two pixels away the value is unaffected
+    assert dem.elevation(109.5, 44.5) == pytest.approx(0.3 * 109.5 - 0.2 * 44.5 + 5.0)
+
+
+def test_patch_corners():
+    dem = _plane_dem(nodata=-9999.0)
+    z = dem.array
+    assert dem.patch_corners(2, 3) == (z[2, 3], z[2, 4], z[3, 3], z[3, 4])
+    assert dem.patch_corners(4, 6) is None  # touches the nodata pixel (5, 7)
+
+
+def test_attaching_leaves_the_block_to_its_creator(monkeypatch):
+    from multiprocessing import resource_tracker
+
+    dem = _plane_dem()
+    with shared_grid(dem) as handle:
+        registered = []
+        monkeypatch.setattr(resource_tracker, "register", lambda *args: registered.append(args))
+        grid = attach_shared_grid(handle)
+        assert np.array_equal(grid.array, dem.array)
+        assert registered == []
+        monkeypatch.undo()
+        del grid
+
+
+def test_array_shape_is_preserved():
+    dem = _plane_dem()
+    xs = np.full((3, 4), 110.0)
+    ys = np.full((3, 4), 40.0)
+    assert dem.elevations(xs, ys).shape == (3, 4)
+
+
+def test_grid_sampler_drives_ray_intersection():
+    dem = GridDemSampler(np.full((50, 50), 2.0), (1.0, 0.0, 0.0, 0.0, -1.0, 50.0))
+    origin = np.array([5.0, 25.0, 12.0])
+    dirs = np.array([[1.0, 0.0, -1.0], [1.0, 0.0, -0.5]])
+    hits = intersect_rays_with_dem(origin, dirs, dem, max_range_m=60.0, step_m=2.0)
+    assert np.allclose(hits[0], [15.0, 25.0, 2.0], atol=1e-4)
+    assert np.allclose(hits[1], [25.0, 25.0, 2.0], atol=1e-4)
+    single = intersect_ray_with_dem(origin, dirs[0], dem, max_range_m=60.0, step_m=2.0)
+    assert np.allclose(single, hits[0])
+
+
+def test_in_memory_sampler_reads_geotiff(tmp_path, write_geotiff):
+    from adapters.dem_rasterio import InMemoryDemSampler
+
+    data = np.arange(100, dtype=np.float32).reshape(10, 10)
+    path = write_geotiff(tmp_path / "dem.tif", data, res=2.0, origin=(1000.0, 2000.0), nodata=-1.0)
+
+    full = InMemoryDemSampler(str(path))
+    # Center of pixel (row 3, col 4)
+    assert full.elevation(1009.0, 1993.0) == pytest.approx(34.0)
+    # Halfway between two pixel centers along a row
+    assert full.elevation(1010.0, 1993.0) == pytest.approx(34.5)
+
+    win = InMemoryDemSampler(str(path), bounds=(1006.0, 1986.0, 1012.0, 1992.0))
+    assert win.array.shape[0] < 10 and win.array.shape[1] < 10
+    assert win.elevation(1010.0, 1989.0) == pytest.approx(full.elevation(1010.0, 1989.0))
+
+    from adapters.dem_rasterio import RasterioDemSampler
+    from dtm import DTM
+
+    # The per-point adapters interpolate like the grid sampler
+    rs = RasterioDemSampler(str(path))
+    dtm = DTM(str(path))
+    try:
+        assert rs.elevation(1010.0, 1993.0) == pytest.approx(34.5)
+        assert dtm.sample(1010.0, 1993.0) == pytest.approx(34.5)
+        assert np.allclose(dtm.elevations([1009.0, 1010.0], [1993.0, 1993.0]), [34.0, 34.5])
+    finally:
+        rs.close()
+        dtm.close()
+
+
+def test_tiled_sampler_matches_in_memory(tmp_path, write_geotiff):
+    from adapters.dem_rasterio import InMemoryDemSampler, TiledDemSampler
+
+    rng = np.random.default_rng(0)
+    data = rng.uniform(0.0, 50.0, size=(64, 80)).astype(np.float32)
+    path = write_geotiff(tmp_path / "tiled.tif", data, origin=(0.0, 64.0),
+                         tiled=True, blockxsize=16, blockysize=16)
+
+    ref = InMemoryDemSampler(str(path))
+    # Budget for two 16x16 float32 blocks only
+    tiled = TiledDemSampler(str(path), cache_bytes=2 * 16 * 16 * 4)
+    assert tiled.block_shape == (16, 16)
+    xs = rng.uniform(0.0, 80.0, 500)
+    ys = rng.uniform(0.0, 64.0, 500)
+    assert np.allclose(tiled.elevations(xs, ys), ref.elevations(xs, ys), equal_nan=True)
+    info = tiled.cache_info()
+    assert info["misses"] > 0 and info["bytes"] <= info["max_bytes"]
+
+    tiled.elevation(40.0, 30.0)
+    before = tiled.cache_info()
+    tiled.elevation(40.0, 30.0)
+    after = tiled.cache_info()
+    assert after["hits"] > before["hits"]
+    assert after["misses"] == before["misses"]
+
+    # Rectangles are read directly, not through the block cache
+    misses = tiled.cache_info()["misses"]
+    assert np.array_equal(tiled.read_window(5, 37, 50, 90), data[5:37, 50:80])
+    assert tiled.cache_info()["misses"] == misses
+    win, offset = read_window(tiled, 40.0, 30.0, 6.0)
+    assert offset == (27, 33)
+    assert np.array_equal(win.array, ref.read_window(27, 42, 33, 48))
+    tiled.close()
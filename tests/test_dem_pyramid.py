@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from core.dem_grid import GridDemSampler
+from core.dem_pyramid import MaxPyramid, intersect_ray_with_pyramid
+from core.i2g_core import intersect_ray_with_dem
+
+
+def _terrain(h=70, w=90, seed=1):
+    rng = np.random.default_rng(seed)
+    rows, cols = np.mgrid[0:h, 0:w]
+    z = 3.0 * np.sin(cols / 7.0) + 2.0 * np.cos(rows / 5.0) + rng.uniform(0, 0.5, (h, w))
+    return GridDemSampler(z, (1.0, 0.0, 0.0, 0.0, -1.0, float(h)))
+
+
+def test_pyramid_levels_bound_patches():
+    dem = _terrain()
+    pyr = MaxPyramid.build(dem)
+    assert pyr.levels[-1].shape == (1, 1)
+    assert pyr.levels[-1][0, 0] == pytest.approx(float(np.nanmax(dem.array)))
+    # Level-1 cell (I, J) covers pixels 2I..2I+2 x 2J..2J+2
+    a = dem.array
+    assert pyr.levels[0][3, 4] == pytest.approx(a[6:9, 8:11].max())
+
+
+def test_pyramid_hit_matches_fine_march():
+    dem = _terrain()
+    origin = np.array([5.0, 65.0, 20.0])
+    rng = np.random.default_rng(2)
+    for _ in range(25):
+        d = np.array([rng.uniform(0.2, 1.0), rng.uniform(-1.0, -0.2), rng.uniform(-0.6, -0.1)])
+        hit = intersect_ray_with_pyramid(origin, d, dem, max_range_m=200.0)
+        ref = intersect_ray_with_dem(origin, d, dem, max_range_m=200.0, step_m=0.05, refine_steps=40)
+        if ref is None:
+            assert hit is None
+            continue
+        assert hit is not None
+        assert np.allclose(hit, ref, atol=1e-3)
+
+
+def test_pyramid_catches_thin_ridge_skipped_by_coarse_step():
+    z = np.zeros((5, 200))
+    z[:, 101] = 50.0  # one-pixel wall
+    dem = GridDemSampler(z, (1.0, 0.0, 0.0, 0.0, -1.0, 5.0))
+    origin = np.array([0.5, 2.5, 10.0])
+    d = np.array([1.0, 0.0, -0.05])
+    coarse = intersect_ray_with_dem(origin, d, dem, max_range_m=190.0, step_m=20.0)
+    hit = intersect_ray_with_dem(origin, d, dem, max_range_m=190.0, method="pyramid")
+    assert hit is not None
+    assert 100.5 < hit[0] < 101.5
+    assert coarse is None or coarse[0] > hit[0] + 1.0
+
+
+def test_pyramid_sidecar_round_trip(tmp_path):
+    dem = _terrain(20, 30)
+    path = tmp_path / "dem.maxpyr.npz"
+    pyr = MaxPyramid.load_or_build(dem, path, stamp="v1")
+    assert path.exists()
+    again = MaxPyramid.load(path, stamp="v1")
+    assert again is not None
+    assert all(np.array_equal(a, b) for a, b in zip(pyr.levels, again.levels))
+    assert MaxPyramid.load(path, stamp="v2") is None
+
+
+def test_unknown_method_rejected():
+    dem = _terrain(10, 10)
+    with pytest.raises(ValueError):
+        intersect_ray_with_dem(np.zeros(3), np.array([1.0, 0.0, -1.0]), dem, method="nope")
@@ -0,0 +1,84 @@
+import numpy as np
+
+from core.dem_grid import GridDemSampler
+from core.footprint import border_pixels, compute_footprint, compute_footprints
+from core.i2g_core import Extrinsics, Intrinsics, PTZ, image_ray, intersect_ray_with_dem
+
+
+def _flat():
+    return GridDemSampler(np.zeros((400, 400)), (10.0, 0.0, -2000.0, 0.0, -10.0, 2000.0))
+
+
+def test_border_walks_all_edges():
+    uv = border_pixels(100, 50, samples_per_edge=4)
+    assert uv.shape == (16, 2)
+    assert uv[:, 0].min() == 0 and uv[:, 0].max() == 99
+    assert uv[:, 1].min() == 0 and uv[:, 1].max() == 49
+
+
+def test_footprint_vertices_match_single_rays():
+    dem = _flat()
+    intr = Intrinsics.from_hfov(640, 480, 40.0)
+    extr = Extrinsics(0.0, 0.0, 50.0, 30.0, 30.0, 0.0, 32636)
+    fp = compute_footprint(intr, PTZ(0.0, 0.0), extr, dem, samples_per_edge=8)
+    assert not fp.clipped.any()
+    assert np.allclose(fp.polygon[:, 2], 0.0)
+    for (u, v), p in zip(fp.uv[::5], fp.polygon[::5]):
+        o, d = image_ray(u, v, intr, PTZ(0.0, 0.0), extr)
+        ref = intersect_ray_with_dem(o, d, dem)
+        assert np.allclose(p, ref, atol=1e-3)
+
+
+def test_horizon_is_clipped_to_range():
+    dem = _flat()
+    intr = Intrinsics.from_hfov(640, 480, 60.0)
+    extr = Extrinsics(0.0, 0.0, 50.0, 0.0, 5.0, 0.0, 32636)
+    fp = compute_footprint(intr, PTZ(0.0, 0.0), extr, dem, samples_per_edge=8, max_range_m=1500.0)
+    assert fp.clipped.any() and not fp.clipped.all()
+    far = fp.polygon[fp.clipped]
+    assert np.allclose(np.hypot(far[:, 0], far[:, 1]), 1500.0)
+    # Top edge is above the horizon, bottom edge on the ground
+    assert fp.clipped[:8].all() and not fp.clipped[16:24].any()
+
+
+def test_batched_cameras():
+    dem = _flat()
+    intr = Intrinsics.from_hfov(320, 240, 50.0)
+    cams = [(intr, PTZ(p, 0.0), Extrinsics(0.0, 0.0, 40.0, 0.0, 35.0, 0.0, 32636)) for p in (0.0, 90.0)]
+    a, b = compute_footprints(cams, dem, samples_per_edge=6)
+    assert np.mean(a.polygon[:, 1]) > 0 and np.mean(b.polygon[:, 0]) > 0
+
+
+def test_misses_are_clipped_at_the_skyline():
+    from core.viewshed import compute_viewshed
+
+    # Flat valley closed by a 60 m plateau 1 km north of the camera
+    z = np.zeros((400, 400))
+    z[:100, :] = 60.0
+    dem = GridDemSampler(z, (10.0, 0.0, -2000.0, 0.0, -10.0, 2000.0))
+    intr = Intrinsics.from_hfov(640, 480, 30.0)
+    extr = Extrinsics(0.0, 0.0, 50.0, 0.0, 0.0, 0.0, 32636)
+    vs = compute_viewshed(dem, (extr.x, extr.y, extr.z), max_range_m=1500.0, workers=1)
+    fp = compute_footprint(intr, PTZ(0.0, 10.0), extr, dem, samples_per_edge=8,
+                           max_range_m=1500.0, viewshed=vs)
+    # Top edge sees sky above the wall: placed on its crest, not at 1500 m
+    assert fp.clipped[:8].all()
+    far = fp.polygon[:8]
+    assert np.all((far[:, 1] > 990.0) & (far[:, 1] < 1030.0))
+    assert np.allclose(far[:, 2], 60.0)
+
+
+def test_batched_cameras_keep_their_own_lens():
+    from core.undistort import compute_ray_map
+
+    dem = _flat()
+    intr = Intrinsics.from_hfov(160, 120, 50.0)
+    extr = Extrinsics(0.0, 0.0, 40.0, 0.0, 35.0, 0.0, 32636)
+    barrel = compute_ray_map(160, 120, intr.fx, intr.fy, intr.cx, intr.cy, (-0.3, 0.1, 0.0, 0.0, 0.0))
+    pincushion = compute_ray_map(160, 120, intr.fx, intr.fy, intr.cx, intr.cy, (0.2, 0.0, 0.0, 0.0, 0.0))
+    a, b = compute_footprints([(intr, PTZ(0.0, 0.0), extr, barrel),
+                               (intr, PTZ(0.0, 0.0), extr, pincushion)], dem, samples_per_edge=6)
+    ref_a = compute_footprint(intr, PTZ(0.0, 0.0), extr, dem, samples_per_edge=6, ray_map=barrel)
+    ref_b = compute_footprint(intr, PTZ(0.0, 0.0), extr, dem, samples_per_edge=6, ray_map=pincushion)
+    assert np.allclose(a.polygon, ref_a.polygon) and np.allclose(b.polygon, ref_b.polygon)
+    assert not np.allclose(a.polygon, b.polygon)
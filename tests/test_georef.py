@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from geom3d import GeoRef, LLA_DTYPE
+
+
+@pytest.mark.parametrize("epsg", [32636, None])
+def test_array_conversions_match_scalar(epsg):
+    gr = GeoRef(31.5, 34.8, 100.0, yaw_site_deg=12.0, projected_epsg=epsg)
+    rng = np.random.default_rng(0)
+    pts = np.column_stack([rng.uniform(-3000, 3000, 50), rng.uniform(-3000, 3000, 50),
+                           rng.uniform(-20, 80, 50)])
+    lla = gr.local_to_geographic_array(pts)
+    assert lla.dtype == LLA_DTYPE and lla.shape == (50,)
+    for p, row in zip(pts[:5], lla[:5]):
+        ref = gr.local_to_geographic(p)["lla"]
+        assert row["lat"] == pytest.approx(ref["lat"], abs=1e-12)
+        assert row["lon"] == pytest.approx(ref["lon"], abs=1e-12)
+        assert row["alt"] == pytest.approx(ref["alt"])
+    back = gr.geographic_to_local_array(lla["lat"], lla["lon"], lla["alt"])
+    assert back.shape == (50, 3)
+    assert np.allclose(back, pts, atol=1e-6 if epsg else 1e-3)
+    assert np.allclose(gr.geographic_to_local(lla["lat"][0], lla["lon"][0], lla["alt"][0]), back[0])
+
+
+def test_projected_origin_cache_follows_origin():
+    gr = GeoRef(31.5, 34.8, 0.0, projected_epsg=32636)
+    X0, _ = gr.origin_projected()
+    gr.origin_lon = 34.9
+    X1, _ = gr.origin_projected()
+    assert X1 > X0
+    assert np.allclose(gr.geographic_to_local(31.5, 34.9, 0.0), 0.0, atol=1e-6)
@@ -0,0 +1,56 @@
+import numpy as np
+
+from core.dem_grid import GridDemSampler
+from core.ground_lut import GroundLUT, GroundLUTService
+from core.i2g_core import Extrinsics, Intrinsics, PTZ
+
+
+def _setup():
+    # Gentle slope, 10 m pixels, camera 60 m above the terrain looking north
+    rows, cols = np.mgrid[0:200, 0:200]
+    z = 0.02 * cols * 10.0 + 0.01 * (200 - rows) * 10.0
+    dem = GridDemSampler(z, (10.0, 0.0, -1000.0, 0.0, -10.0, 2000.0))
+    intr = Intrinsics.from_hfov(320, 240, 60.0)
+    extr = Extrinsics(0.0, 0.0, 80.0, 0.0, 20.0, 0.0, 32636)
+    return dem, intr, extr
+
+
+def test_lut_interpolation_close_to_exact():
+    dem, intr, extr = _setup()
+    lut = GroundLUT(intr, PTZ(5.0, 0.0), extr, dem, spacing_px=16)
+    assert lut.points.shape == (len(lut.vs), len(lut.us), 3)
+    assert lut.us[-1] == 319 and lut.vs[-1] == 239
+    for u, v in [(10.5, 200.0), (160.0, 180.0), (300.0, 150.0)]:
+        approx = lut.ground_point(u, v)
+        exact = lut.refine(u, v)
+        assert approx is not None and exact is not None
+        rng = np.linalg.norm(np.subtract(exact, (0.0, 0.0, 80.0)))
+        assert np.linalg.norm(np.subtract(approx, exact)) < 0.01 * rng
+
+
+def test_lut_sky_pixels_are_not_interpolated():
+    dem, intr, extr = _setup()
+    lut = GroundLUT(intr, PTZ(0.0, 25.0), extr, dem, spacing_px=16)
+    assert np.isnan(lut.lookup(160.0, 5.0)).all()
+    assert np.isnan(lut.lookup(-1.0, 5.0)).all()
+
+
+def test_service_rebuilds_beyond_tolerance():
+    dem, intr, extr = _setup()
+    svc = GroundLUTService(spacing_px=32)
+    svc.update(intr, PTZ(0.0, 0.0), extr, dem, wait=True)
+    first = svc.lut_for(intr, PTZ(0.0, 0.0), extr, dem)
+    assert first is not None
+    # Within tolerance: same LUT, no rebuild
+    svc.update(intr, PTZ(0.01, 0.0), extr, dem, wait=True)
+    assert svc.current() is first
+    # Beyond tolerance: the old LUT no longer answers and a new one is built
+    assert svc.lut_for(intr, PTZ(3.0, 0.0), extr, dem) is None
+    svc.update(intr, PTZ(3.0, 0.0), extr, dem, wait=True)
+    second = svc.lut_for(intr, PTZ(3.0, 0.0), extr, dem)
+    assert second is not None and second is not first
+    # The worker also computed the pose's footprint
+    assert second.footprint is not None and second.footprint is not first.footprint
+    assert not second.footprint.is_empty
+    svc.invalidate()
+    assert svc.current() is None
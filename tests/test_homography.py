@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from core.homography import apply_homography, dlt_homography, estimate_homography
+
+H_TRUE = np.array([[0.9, 0.05, 350000.0], [-0.03, 1.1, 3550000.0], [1e-5, 2e-5, 1.0]])
+
+
+def _pairs(n=40, seed=0, noise=0.0):
+    rng = np.random.default_rng(seed)
+    uv = np.column_stack([rng.uniform(0, 1920, n), rng.uniform(0, 1080, n)])
+    xy = apply_homography(H_TRUE, uv) + rng.normal(0, noise, (n, 2))
+    return uv, xy
+
+
+def test_normalized_dlt_exact_with_large_map_coordinates():
+    uv, xy = _pairs(4)
+    H = dlt_homography(uv, xy)
+    assert np.allclose(apply_homography(H, uv), xy, atol=1e-4)
+    uv, xy = _pairs(30)
+    assert np.allclose(dlt_homography(uv, xy), H_TRUE, rtol=1e-6, atol=1e-9)
+
+
+def test_apply_is_vectorized_and_flags_infinity():
+    uv = np.zeros((3, 5, 2))
+    assert apply_homography(H_TRUE, uv).shape == (3, 5, 2)
+    H = np.array([[1.0, 0, 0], [0, 1.0, 0], [1.0, 0, -1.0]])
+    out = apply_homography(H, [[1.0, 0.0], [2.0, 3.0]])
+    assert np.isnan(out[0]).all() and np.allclose(out[1], [2.0, 3.0])
+
+
+def test_msac_rejects_misclicks():
+    uv, xy = _pairs(30, noise=0.3)
+    xy[[3, 11, 20]] += [[40.0, -25.0], [-60.0, 10.0], [15.0, 90.0]]
+    fit = estimate_homography(uv, xy, threshold=2.0, seed=1)
+    assert fit.n_inliers == 27
+    assert not fit.inliers[[3, 11, 20]].any()
+    assert fit.rms < 1.0
+    assert np.all(fit.residuals[[3, 11, 20]] > 10.0)
+    probe = np.array([[960.0, 540.0], [10.0, 1000.0]])
+    assert np.allclose(apply_homography(fit.H, probe), apply_homography(H_TRUE, probe), atol=0.5)
+
+
+def test_needs_four_pairs():
+    with pytest.raises(ValueError):
+        estimate_homography([(0, 0), (1, 0), (0, 1)], [(0, 0), (1, 0), (0, 1)])
@@ -5,8 +5,12 @@ from core.i2g_core import (
     Intrinsics,
     Extrinsics,
     PTZ,
+    compile_camera,
     image_ray,
+    image_rays,
     intersect_ray_with_dem,
+    intersect_rays_with_dem,
+    project_world_to_image,
 )
 
 
@@ -56,6 +60,28 @@ def test_image_ray_missing_tilt_defaults_zero():
     assert np.allclose(dir_none, dir_zero)
 
 
+def test_image_rays_matches_image_ray():
+    """Batch rays must agree with the scalar implementation."""
+    intr = Intrinsics(640, 480, 500.0, 520.0, 310.0, 250.0)
+    extr = Extrinsics(5.0, -3.0, 12.0, 30.0, -10.0, 2.0, 4326)
+    ptz = PTZ(15.0, 5.0, None)
+    us = np.array([0, 100, 320, 639])
+    vs = np.array([0, 400, 240, 479])
+    origins, dirs = image_rays(us, vs, intr, ptz, extr)
+    assert origins.shape == (4, 3) and dirs.shape == (4, 3)
+    for i, (u, v) in enumerate(zip(us, vs)):
+        o, d = image_ray(int(u), int(v), intr, ptz, extr)
+        assert np.allclose(origins[i], o)
+        assert np.allclose(dirs[i], d)
+
+
+def test_image_rays_rejects_mismatched_shapes():
+    intr = Intrinsics.from_hfov(400, 300, 90.0)
+    extr = Extrinsics(0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 4326)
+    with pytest.raises(ValueError):
+        image_rays([1, 2], [1], intr, PTZ(), extr)
+
+
 def test_intersect_flat_dem():
     intr = Intrinsics.from_hfov(400, 300, 90.0)
     extr = Extrinsics(0.0, 0.0, 10.0, -90.0, 45.0, 0.0, 4326)
@@ -125,6 +151,53 @@ def test_intersect_dem_respects_meters_per_unit():
     assert pytest.approx(z, abs=1e-6) == 2.0
 
 
+def test_intersect_rays_matches_scalar():
+    """Batched intersection should reproduce the single-ray results."""
+    intr = Intrinsics.from_hfov(400, 300, 90.0)
+    extr = Extrinsics(0.0, 0.0, 30.0, 20.0, 30.0, 0.0, 4326)
+    us = np.array([0, 100, 200, 300, 399, 200])
+    vs = np.array([299, 250, 150, 200, 299, 0])
+    origins, dirs = image_rays(us, vs, intr, PTZ(0.0, 0.0, None), extr)
+
+    class WavyDem:
+        def elevation(self, x: float, y: float) -> float:
+            if x < -20.0:
+                return None
+            return 2.0 * np.sin(x / 15.0) + 0.05 * y
+
+    dem = WavyDem()
+    hits = intersect_rays_with_dem(origins, dirs, dem, max_range_m=300.0, step_m=10.0)
+    assert hits.shape == (len(us), 3)
+    for i in range(len(us)):
+        ref = intersect_ray_with_dem(origins[i], dirs[i], dem, max_range_m=300.0, step_m=10.0)
+        if ref is None:
+            assert np.all(np.isnan(hits[i]))
+        else:
+            assert np.allclose(hits[i], ref, atol=1e-9)
+    # The ray through the top row points above the horizon and never hits.
+    assert np.all(np.isnan(hits[-1]))
+
+
+def test_intersect_rays_uses_batch_sampler():
+    calls = []
+
+    class BatchFlatDem:
+        def elevation(self, x: float, y: float) -> float:
+            raise AssertionError("scalar path should not be used")
+
+        def elevations(self, xs, ys):
+            calls.append(len(xs))
+            return np.zeros(len(xs))
+
+    origin = np.array([0.0, 0.0, 10.0])
+    dirs = np.array([[1.0, 0.0, -1.0], [0.0, 1.0, -1.0], [0.0, 1.0, 1.0]])
+    hits = intersect_rays_with_dem(origin, dirs, BatchFlatDem(), max_range_m=100.0, step_m=5.0)
+    assert np.allclose(hits[0], [10.0, 0.0, 0.0], atol=1e-4)
+    assert np.allclose(hits[1], [0.0, 10.0, 0.0], atol=1e-4)
+    assert np.all(np.isnan(hits[2]))
+    assert calls and max(calls) <= len(dirs)
+
+
 def test_image_ray_uses_principal_point():
     """Shifting ``cx`` should change the ray direction."""
 
@@ -180,3 +253,78 @@ def test_epsg_round_trip_precision():
     lon2, lat2 = tr_rev.transform(X, Y)
     assert lon2 == pytest.approx(lon, abs=1e-9)
     assert lat2 == pytest.approx(lat, abs=1e-9)
+
+
+def test_project_world_to_image_inverts_image_ray():
+    intr = Intrinsics.from_hfov(640, 480, 60.0)
+    extr = Extrinsics(100.0, 200.0, 50.0, 30.0, 10.0, 2.0, 32636)
+    ptz = PTZ(15.0, -5.0, None)
+    us = np.array([0.0, 100.5, 320.0, 639.0])
+    vs = np.array([10.0, 240.0, 300.0, 479.0])
+    origins, dirs = image_rays(us, vs, intr, ptz, extr)
+    pts = origins + dirs * np.array([50.0, 120.0, 300.0, 900.0])[:, None]
+    behind = origins[0] - dirs[0] * 10.0
+    uv, vis = project_world_to_image(np.vstack([pts, behind]), intr, ptz, extr)
+    assert np.allclose(uv[:4], np.column_stack([us, vs]), atol=1e-6)
+    assert vis[:4].all()
+    assert np.isnan(uv[4]).all() and not vis[4]
+
+
+def test_project_world_to_image_occlusion():
+    class RidgeDem:
+        def elevation(self, x: float, y: float) -> float:
+            return 40.0 if 500.0 <= y <= 540.0 else 0.0
+
+    intr = Intrinsics.from_hfov(640, 480, 60.0)
+    extr = Extrinsics(0.0, 0.0, 30.0, 0.0, 5.0, 0.0, 32636)
+    pts = np.array([[0.0, 300.0, 0.0], [0.0, 1000.0, 0.0], [0.0, 1000.0, 200.0]])
+    _, vis = project_world_to_image(pts, intr, PTZ(0.0, 0.0), extr, dem=RidgeDem(), step_m=5.0)
+    assert vis.tolist() == [True, False, True]
+
+
+def test_compiled_camera_is_cached_and_immutable():
+    intr = Intrinsics.from_hfov(640, 480, 60.0)
+    extr = Extrinsics(1.0, 2.0, 3.0, 40.0, 5.0, 1.0, 32636)
+    a = compile_camera(intr, PTZ(10.0, 2.0), extr)
+    assert compile_camera(intr, PTZ(10.0, 2.0), extr) is a
+    assert compile_camera(intr, PTZ(10.5, 2.0), extr) is not a
+    assert np.allclose(a.R @ a.R_inv, np.eye(3))
+    with pytest.raises(AttributeError):
+        a.fx = 1.0
+    with pytest.raises(ValueError):
+        a.R[0, 0] = 2.0
+    o, d = a.ray(100.0, 50.0)
+    assert np.allclose(d, image_ray(100.0, 50.0, intr, PTZ(10.0, 2.0), extr)[1])
+
+
+def test_compiled_cameras_key_ray_maps_by_calibration():
+    from core.undistort import RayMap, compute_ray_map
+
+    intr = Intrinsics(64, 48, 60.0, 60.0, 32.0, 24.0)
+    extr = Extrinsics(1.0, 2.0, 3.0, 40.0, 5.0, 1.0, 32636)
+    dist = (-0.2, 0.0, 0.0, 0.0, 0.0)
+    arr = compute_ray_map(64, 48, 60.0, 60.0, 32.0, 24.0, dist)
+    a = compile_camera(intr, PTZ(1.0, 2.0), extr, RayMap(arr, "k", (60.0, 60.0, 32.0, 24.0), dist))
+    # An equal map in a new object (or array) shares the camera
+    same = RayMap(arr.copy(), "k", (60.0, 60.0, 32.0, 24.0), dist)
+    assert compile_camera(intr, PTZ(1.0, 2.0), extr, same) is a
+    zoomed = same.rescaled(120.0, 120.0, 32.0, 24.0)
+    assert compile_camera(intr, PTZ(1.0, 2.0), extr, zoomed) is not a
+    # Bare arrays carry no calibration and are never served from the cache
+    assert compile_camera(intr, PTZ(1.0, 2.0), extr, arr) is not compile_camera(intr, PTZ(1.0, 2.0), extr, arr)
+
+
+def test_geom3d_compiled_camera_matches_pose_rotation():
+    from geom3d import CameraIntrinsics, CameraPose, camera_ray_in_world, camera_rays_in_world
+
+    intr = CameraIntrinsics.from_fov(640, 480, 70.0)
+    pose = CameraPose(1.0, 2.0, 30.0, 20.0, -10.0, 3.0)
+    o, d = camera_ray_in_world(100, 400, intr, pose)
+    ref = pose.R_wc() @ np.array([(100 - intr.cx) / intr.fx, (400 - intr.cy) / intr.fy, 1.0])
+    assert np.allclose(d, ref / np.linalg.norm(ref))
+    assert np.allclose(o, pose.t_w())
+    os_, ds = camera_rays_in_world([100, 5], [400, 7], intr, pose)
+    assert np.allclose(ds[0], d) and os_.shape == (2, 3)
+    from core.i2g_core import compile_pose_camera
+    from geom3d import compiled_camera
+    assert compiled_camera(intr, pose) is compile_pose_camera(intr, pose)
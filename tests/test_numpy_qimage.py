@@ -0,0 +1,54 @@
+import gc
+
+import numpy as np
+import pytest
+
+QtGui = pytest.importorskip("PySide6.QtGui")
+
+from ui_map_tools import numpy_to_qimage
+
+
+def _address(img):
+    return int(np.frombuffer(img.constBits(), dtype=np.uint8, count=1).__array_interface__["data"][0])
+
+
+def test_strided_crop_shares_memory_and_outlives_array():
+    a = np.random.default_rng(0).integers(0, 255, (100, 120, 3), dtype=np.uint8)
+    crop = a[10:60:2, 5:90]
+    img = numpy_to_qimage(crop)
+    assert (img.width(), img.height(), img.bytesPerLine()) == (85, 25, 2 * 120 * 3)
+    assert _address(img) == crop.__array_interface__["data"][0]
+    expected = tuple(int(v) for v in a[10 + 2 * 4, 5 + 3])
+    del a, crop
+    gc.collect()
+    assert img.pixelColor(3, 4).getRgb()[:3] == expected
+
+
+@pytest.mark.parametrize("shape, dtype, fmt", [
+    ((5, 7), np.uint8, QtGui.QImage.Format_Grayscale8),
+    ((5, 7, 4), np.uint8, QtGui.QImage.Format_RGBA8888),
+    ((5, 7), np.uint16, QtGui.QImage.Format_Grayscale16),
+    ((5, 7, 4), np.uint16, QtGui.QImage.Format_RGBA64),
+])
+def test_formats_without_conversion(shape, dtype, fmt):
+    top = np.iinfo(dtype).max
+    a = np.zeros(shape, dtype=dtype)
+    a[2, 3] = top
+    img = numpy_to_qimage(a)
+    assert img.format() == fmt and _address(img) == a.__array_interface__["data"][0]
+    assert img.pixelColor(3, 2).getRgb() == (255, 255, 255, 255)
+    assert img.pixelColor(0, 0).red() == 0
+
+
+def test_read_only_map_flipped_and_unsupported(tmp_path):
+    p = tmp_path / "ov.npy"
+    np.save(p, np.arange(64, dtype=np.uint8).reshape(8, 8))
+    m = np.load(p, mmap_mode="r")
+    assert numpy_to_qimage(m).pixelColor(2, 1).red() == 10
+    flipped = numpy_to_qimage(np.asarray(m)[::-1])  # negative stride: copied
+    assert flipped.pixelColor(2, 1).red() == 50
+    assert numpy_to_qimage(np.zeros((0, 4), np.uint8)).isNull()
+    with pytest.raises(ValueError):
+        numpy_to_qimage(np.zeros((4, 4, 3), np.uint16))
+    with pytest.raises(ValueError):
+        numpy_to_qimage(np.zeros((4, 4), np.float32))
@@ -0,0 +1,65 @@
+import numpy as np
+
+from core.i2g_core import Extrinsics, Intrinsics, PTZ, compile_camera
+from core.pose_solver import PoseParams, PoseSolver, _model, solve_pose
+
+W, H = 1920, 1080
+CAM_XY = (1000.0, 2000.0)
+TRUE = PoseParams(yaw=37.0, pitch=12.0, roll=1.5, hfov_deg=48.0, z=85.0)
+
+
+def _observations(n=200, seed=0, noise=0.0):
+    rng = np.random.default_rng(seed)
+    pan = rng.uniform(-40, 40, n)
+    tilt = rng.uniform(-5, 5, n)
+    intr = Intrinsics.from_hfov(W, H, TRUE.hfov_deg)
+    extr = Extrinsics(CAM_XY[0], CAM_XY[1], TRUE.z, TRUE.yaw, TRUE.pitch, TRUE.roll, 32636)
+    uv = np.column_stack([rng.uniform(50, W - 50, n), rng.uniform(50, H - 50, n)])
+    ground = np.empty((n, 3))
+    for i in range(n):
+        cam = compile_camera(intr, PTZ(pan[i], tilt[i]), extr)
+        o, d = cam.ray(*uv[i])
+        ground[i] = o + d * rng.uniform(200, 800)
+    uv = uv + rng.normal(0, noise, uv.shape) if noise else uv
+    return uv, ground, pan, tilt
+
+
+def test_model_matches_core_projection_and_numeric_jacobian():
+    uv, ground, pan, tilt = _observations(10)
+    theta = TRUE.to_array()
+    pred, depth, J = _model(theta, ground, CAM_XY, pan, tilt, W, H)
+    assert np.allclose(pred, uv, atol=1e-6) and np.all(depth > 0)
+    eps = 1e-6
+    for k in range(5):
+        t = theta.copy(); t[k] += eps
+        num = (_model(t, ground, CAM_XY, pan, tilt, W, H, False)[0] - pred) / eps
+        assert np.allclose(J[:, :, k], num, rtol=1e-4, atol=1e-3)
+
+
+def test_joint_solve_recovers_pose_quickly():
+    uv, ground, pan, tilt = _observations(300, noise=0.5)
+    init = PoseParams(yaw=30.0, pitch=8.0, roll=0.0, hfov_deg=55.0, z=70.0)
+    fit = solve_pose(uv, ground, W, H, CAM_XY, init, pan=pan, tilt=tilt)
+    assert fit.converged
+    assert np.allclose(fit.params.to_array(), TRUE.to_array(), atol=[0.05, 0.05, 0.05, 0.05, 0.5])
+    assert 0.3 < fit.rms_px < 1.0
+    assert np.all(fit.sigma().to_array() < [0.05, 0.05, 0.05, 0.05, 0.5])
+    # Gauss-Newton from a rough start: a handful of iterations, not max_iter
+    assert fit.iterations <= 10
+
+
+def test_fixed_parameters_and_incremental_solver():
+    uv, ground, pan, tilt = _observations(40, seed=1)
+    init = PoseParams(yaw=35.0, pitch=10.0, roll=0.0, hfov_deg=48.0, z=85.0)
+    fit = solve_pose(uv, ground, W, H, CAM_XY, init, pan=pan, tilt=tilt, fixed=("hfov_deg", "z"))
+    assert fit.params.hfov_deg == 48.0 and fit.params.z == 85.0
+    assert fit.cov[3, 3] == 0.0 and fit.cov[4, 4] == 0.0
+    assert abs(fit.params.yaw - TRUE.yaw) < 1e-6
+
+    solver = PoseSolver(W, H, CAM_XY, init, huber_px=3.0)
+    assert solver.solve() is None
+    for i in range(40):
+        solver.add(uv[i, 0], uv[i, 1], ground[i], pan[i], tilt[i])
+        if i >= 3:
+            solver.solve()
+    assert np.allclose(solver.estimate.to_array(), TRUE.to_array(), atol=1e-4)
@@ -0,0 +1,36 @@
+import numpy as np
+
+from preset_store import PresetEntry, PresetStore
+
+
+def _entry(pan, tilt, zoom, tag=1.0):
+    return PresetEntry(pan=pan, tilt=tilt, zoom=zoom, H=(np.eye(3) * tag).tolist(),
+                       image_wh=(1920, 1080), epsg=32636)
+
+
+def test_nearest_within_tolerance_and_wraps_pan():
+    st = PresetStore(pan_step=0.5, tilt_step=0.5, zoom_step=0.01)
+    st.put(_entry(359.9, 10.0, 0.20, 1.0))
+    st.put(_entry(45.0, 10.0, 0.20, 2.0))
+    hit = st.nearest(0.1, 10.1, 0.205)
+    assert hit is not None and hit[0].pan == 359.9
+    assert st.nearest(45.2, 9.8, 0.2)[0].homography()[0, 0] == 2.0
+    assert st.nearest(46.0, 10.0, 0.2) is None          # pan too far
+    assert st.nearest(45.0, 10.0, 0.25) is None         # zoom too far
+    assert st.nearest(45.0, 10.0, None) is None         # zoom presence must agree
+
+
+def test_same_cell_replaces_and_round_trips(tmp_path):
+    path = tmp_path / "cam.presets.json"
+    st = PresetStore(path)
+    st.put(_entry(10.0, -5.0, None, 1.0))
+    st.put(_entry(10.1, -5.1, None, 3.0))
+    st.put(_entry(90.0, -5.0, None, 4.0))
+    assert len(st) == 2
+    st.save()
+    again = PresetStore.load(path)
+    assert len(again) == 2
+    e = again.get(10.0, -5.0, None)
+    assert e.image_wh == (1920, 1080) and e.homography()[1, 1] == 3.0
+    assert again.remove(90.0, -5.0, None) and len(again) == 1
+    assert len(PresetStore.load(tmp_path / "missing.json")) == 0
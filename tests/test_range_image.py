@@ -0,0 +1,78 @@
+import numpy as np
+
+from core.dem_grid import GridDemSampler
+from core.i2g_core import intersect_ray_with_dem
+from core.range_image import (
+    RangeImage,
+    build_range_image,
+    direction_from_angles,
+    load_or_build_range_image,
+    range_image_from_viewshed,
+)
+
+
+def _hills():
+    rows, cols = np.mgrid[0:240, 0:240]
+    z = 8.0 * np.sin(cols / 15.0) + 6.0 * np.cos(rows / 11.0) + 10.0
+    return GridDemSampler(z, (1.0, 0.0, 0.0, 0.0, -1.0, 240.0))
+
+
+ORIGIN = np.array([120.0, 120.0, 45.0])
+
+
+def test_lookup_matches_fine_march():
+    dem = _hills()
+    img = build_range_image(dem, ORIGIN, el_range=(-60.0, 5.0), res_deg=1.0,
+                            max_range_m=110.0, workers=1)
+    rng = np.random.default_rng(5)
+    for _ in range(25):
+        d = direction_from_angles(rng.uniform(0, 360), rng.uniform(-55, -10))
+        assert img.covers(d)
+        ref = intersect_ray_with_dem(ORIGIN, d, dem, max_range_m=110.0, step_m=0.25, refine_steps=40)
+        got = img.intersect(d, dem)
+        if ref is None:
+            assert got is None
+        else:
+            assert got is not None and np.allclose(got, ref, atol=1e-2)
+
+
+def test_sky_and_envelope():
+    dem = _hills()
+    img = build_range_image(dem, ORIGIN, az_range=(350.0, 370.0), el_range=(-30.0, 20.0),
+                            res_deg=2.0, max_range_m=100.0, workers=1)
+    assert not img.wraps
+    assert img.covers(direction_from_angles(5.0, -10.0))
+    assert not img.covers(direction_from_angles(90.0, -10.0))
+    up = direction_from_angles(0.0, 15.0)
+    assert img.bracket(up) is None and img.intersect(up, dem) is None
+
+
+def test_parallel_build_and_persistence(tmp_path):
+    dem = _hills()
+    kw = dict(el_range=(-80.0, 0.0), res_deg=2.0, max_range_m=80.0)
+    a = build_range_image(dem, ORIGIN, workers=1, **kw)
+    path = tmp_path / "mount.rangeimg.npz"
+    b = load_or_build_range_image(dem, ORIGIN, path, stamp="s", workers=2, **kw)
+    assert np.array_equal(a.ranges, b.ranges, equal_nan=True)
+    c = RangeImage.load(path, "s")
+    assert c is not None and c.matches(ORIGIN) and np.array_equal(c.ranges, a.ranges, equal_nan=True)
+    assert RangeImage.load(path, "other") is None
+
+
+def test_derived_from_viewshed_matches_fine_march():
+    from core.viewshed import compute_viewshed
+
+    dem = _hills()
+    vs = compute_viewshed(dem, ORIGIN, max_range_m=110.0, workers=1)
+    img = range_image_from_viewshed(vs, el_range=(-90.0, 5.0), res_deg=1.0)
+    assert img.cell == vs.step
+    rng = np.random.default_rng(7)
+    for _ in range(25):
+        d = direction_from_angles(rng.uniform(0, 360), rng.uniform(-89, -10))
+        ref = intersect_ray_with_dem(ORIGIN, d, dem, max_range_m=110.0, step_m=0.25, refine_steps=40)
+        got = img.intersect(d, dem)
+        if ref is None:
+            assert got is None
+        else:
+            assert got is not None and np.allclose(got, ref, atol=1e-2)
+    assert img.intersect(direction_from_angles(0.0, 4.0), dem) is None
@@ -0,0 +1,85 @@
+import threading
+
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+
+import dataset_pool
+import raster_loader
+
+
+@pytest.fixture
+def write_ramp(write_geotiff):
+    def write(path, w=900, h=600, overviews=(2, 4, 8)):
+        data = np.linspace(0.0, 50.0, w * h, dtype=np.float32).reshape(h, w)
+        return write_geotiff(path, data, overviews=overviews)
+    return write
+
+
+@pytest.fixture
+def dem(tmp_path, write_ramp):
+    dataset_pool.clear()
+    p = str(tmp_path / "dem.tif")
+    write_ramp(p)
+    yield p
+    dataset_pool.clear()
+
+
+def _borrowed():
+    return dataset_pool.pool_info()["borrowed"]
+
+
+def test_preview_then_layer(dem):
+    before = _borrowed()
+    load = raster_loader.start_raster_load(dem, max_size=300, preview_size=60)
+    preview = load.preview.result(timeout=10)
+    assert preview.image.shape == (40, 60) and preview.image.dtype == np.uint8
+    assert preview.size == (300, 200)
+    assert load.layer.result(timeout=10) is True
+    layer = load.take()
+    assert layer.downsampled_image().shape == (200, 300)
+    assert load.take() is None  # handed over once
+    assert _borrowed() == before + 1
+    load.cancel()  # cancelling after take leaves the receiver's layer alone
+    assert _borrowed() == before + 1
+    dataset_pool.release(layer)
+
+
+def test_cancelled_load_returns_layer_to_pool(dem):
+    before = _borrowed()
+    load = raster_loader.start_raster_load(dem, max_size=300)
+    load.layer.result(timeout=10)
+    load.cancel()
+    assert load.cancelled and load.take() is None
+    assert _borrowed() == before
+
+
+def test_cancel_before_start_skips_the_decode(dem):
+    gate = threading.Event()
+    # Occupy both workers so the load stays queued
+    blockers = [raster_loader.submit(gate.wait, 10) for _ in range(2)]
+    load = raster_loader.start_raster_load(dem)
+    load.cancel()
+    gate.set()
+    for b in blockers:
+        b.result(timeout=10)
+    assert load.layer.cancelled() and load.preview.cancelled()
+    assert dataset_pool.pool_info()["misses"] == 0
+
+
+def test_no_preview_without_overviews(tmp_path, write_ramp):
+    p = str(tmp_path / "plain.tif")
+    write_ramp(p, overviews=())
+    assert raster_loader.read_preview(p, max_size=300, preview_size=60) is None
+
+
+def test_tiles_do_not_wait_for_loads(dem):
+    gate = threading.Event()
+    blockers = [raster_loader.submit(gate.wait, 10) for _ in range(2)]
+    try:
+        assert raster_loader.submit_tile(lambda: 42).result(timeout=10) == 42
+    finally:
+        gate.set()
+        for b in blockers:
+            b.result(timeout=10)
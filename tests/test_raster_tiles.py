@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+
+from raster_layer import RasterLayer
+from raster_tiles import TileSource, ensure_overviews, overview_factors
+
+
+@pytest.fixture
+def write_tiled(write_geotiff):
+    def write(path, data):
+        return write_geotiff(path, data, res=0.5, tiled=True, blockxsize=64, blockysize=64)
+    return write
+
+
+def test_overview_factors_reach_a_single_tile():
+    assert overview_factors(1000, 600, 256) == [2, 4]
+    assert overview_factors(256, 100, 256) == []
+    assert overview_factors(257, 100, 256) == [2]
+
+
+def test_tiles_match_full_resolution_pixels(tmp_path, write_tiled):
+    p = str(tmp_path / "rgb.tif")
+    rng = np.random.default_rng(0)
+    data = rng.integers(0, 255, (3, 300, 500), dtype=np.uint8)
+    write_tiled(p, data)
+    src = TileSource(p, tile_size=128, build_overviews=False)
+    assert src.n_levels == 3 and src.grid(0) == (4, 3) and src.grid(2) == (1, 1)
+    assert src.tile_rect(0, 3, 2) == (384, 256, 500, 300)
+    t = src.tile(0, 3, 2)
+    assert t.shape == (44, 116, 3)
+    assert np.array_equal(t, np.moveaxis(data[:, 256:300, 384:500], 0, -1))
+    # Coarse levels are decimated to at most one tile
+    assert src.tile(2, 0, 0).shape == (75, 125, 3)
+    # Zoom → level, and the tiles of a view, nearest to its center first
+    assert src.level_for(2.0) == 0 and src.level_for(0.3) == 1 and src.level_for(0.01) == 2
+    assert src.tiles_in(0, 130, 10, 260, 140) == [(1, 0), (1, 1), (2, 0), (2, 1)]
+    src.close()
+
+
+def test_tile_cache_is_bounded(tmp_path, write_tiled):
+    p = str(tmp_path / "dem.tif")
+    write_tiled(p, np.arange(300 * 500, dtype=np.float32).reshape(1, 300, 500))
+    src = TileSource(p, tile_size=64, cache_bytes=3 * 64 * 64, stretch=(0.0, 150000.0),
+                     build_overviews=False)
+    for tx in range(5):
+        src.tile(0, tx, 0)
+    src.tile(0, 4, 0)
+    info = src.cache_info()
+    assert info["tiles"] == 3 and info["bytes"] <= info["max_bytes"]
+    assert info["hits"] == 1 and info["misses"] == 5
+    assert src.tile(0, 0, 0).dtype == np.uint8
+
+
+def test_layer_builds_external_overviews_and_shares_stretch(tmp_path, write_tiled):
+    p = str(tmp_path / "dem.tif")
+    data = np.linspace(0.0, 100.0, 600 * 900, dtype=np.float32).reshape(1, 600, 900)
+    write_tiled(p, data)
+    before = os.stat(p).st_mtime_ns
+    assert ensure_overviews(p, tile_size=256, min_size=512) == [2, 4]
+    assert os.path.exists(p + ".ovr") and os.stat(p).st_mtime_ns == before
+    layer = RasterLayer(p, max_size=256)
+    src = layer.tile_source()
+    assert src.stretch == layer.stretch and layer.over_scale == (900 / 256, 600 / 171)
+    assert src.overviews == [2, 4]
+    layer.close()
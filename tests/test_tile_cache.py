@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+
+from raster_layer import RasterLayer
+from tile_cache import TileCache, file_key
+
+
+@pytest.fixture
+def write_ramp(write_geotiff):
+    def write(path, value=0.0):
+        data = np.linspace(0.0, 80.0, 400 * 600, dtype=np.float32).reshape(400, 600) + value
+        return write_geotiff(path, data, res=2.0)
+    return write
+
+
+def test_reopened_layer_maps_cached_overview_and_tiles(tmp_path, write_ramp):
+    p = str(tmp_path / "dem.tif")
+    write_ramp(p)
+    cache = TileCache(tmp_path / "cache")
+    first = RasterLayer(p, max_size=150, cache=cache)
+    tile = first.tile_source().tile(0, 1, 0)
+    first.close()
+    assert cache.stats()["writes"] == 2 and cache.stats()["hits"] == 0
+
+    again = RasterLayer(p, max_size=150, cache=cache)
+    assert isinstance(again.rgb, np.memmap)
+    assert np.array_equal(again.rgb, first.rgb) and again.stretch == first.stretch
+    assert again.over_transform == first.over_transform
+    assert again.scene_to_geo(10.0, 20.0) == first.scene_to_geo(10.0, 20.0)
+    cached = again.tile_source().tile(0, 1, 0)
+    assert isinstance(cached, np.memmap) and np.array_equal(cached, tile)
+    assert cache.stats()["hits"] == 2
+    again.close()
+
+
+def test_rewritten_file_misses(tmp_path, write_ramp):
+    p = str(tmp_path / "dem.tif")
+    write_ramp(p)
+    key = file_key(p)
+    cache = TileCache(tmp_path / "cache")
+    RasterLayer(p, max_size=150, cache=cache).close()
+    write_ramp(p, 10.0)
+    st = os.stat(p)
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert file_key(p) != key
+    RasterLayer(p, max_size=150, cache=cache).close()
+    assert cache.stats()["hits"] == 0 and cache.stats()["misses"] == 2
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = TileCache(tmp_path / "cache", max_bytes=10**9)
+    img = np.zeros((64, 64), dtype=np.uint8)
+    for i in range(4):
+        cache.save_tile("k", "v", 0, i, 0, img)
+        p = cache._tile_path("k", "v", 0, i, 0)
+        os.utime(p, ns=(0, (i + 1) * 10**9))
+    size = cache.usage() // 4
+    assert cache.load_tile("k", "v", 0, 0, 0) is not None  # refreshes tile 0
+    cache.evict(2 * size)
+    assert cache.load_tile("k", "v", 0, 1, 0) is None and cache.load_tile("k", "v", 0, 2, 0) is None
+    assert cache.load_tile("k", "v", 0, 0, 0) is not None and cache.load_tile("k", "v", 0, 3, 0) is not None
+    assert cache.stats()["evictions"] == 2 and cache.usage() == 2 * size
+    cache.clear()
+    assert not (tmp_path / "cache" / "k").exists() and cache.usage() == 0
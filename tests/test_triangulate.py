@@ -0,0 +1,68 @@
+import numpy as np
+
+from core.i2g_core import Extrinsics, Intrinsics, PTZ, compile_camera
+from core.triangulate import triangulate_pixels, triangulate_rays
+from geom3d import CameraIntrinsics, CameraPose
+
+
+def _cams(baseline=400.0):
+    intr = Intrinsics.from_hfov(1920, 1080, 40.0)
+    a = compile_camera(intr, PTZ(0.0, 0.0), Extrinsics(0.0, 0.0, 30.0, 45.0, 0.0, 0.0, 32636))
+    b = compile_camera(intr, PTZ(0.0, 0.0), Extrinsics(baseline, 0.0, 30.0, 315.0, 0.0, 0.0, 32636))
+    return a, b
+
+
+def test_recovers_elevated_targets_from_pixels():
+    cams = _cams()
+    rng = np.random.default_rng(0)
+    pts = np.column_stack([rng.uniform(150, 250, 20), rng.uniform(180, 220, 20), rng.uniform(20, 80, 20)])
+    uv = np.stack([c.project(pts)[0] for c in cams], axis=1)
+    res = triangulate_pixels(cams, uv)
+    assert res.valid.all()
+    assert np.allclose(res.points, pts, atol=1e-6)
+    assert np.allclose(res.residuals, 0.0, atol=1e-6)
+    # Range-weighted covariance is symmetric positive definite
+    assert np.allclose(res.cov, np.transpose(res.cov, (0, 2, 1)))
+    assert np.all(np.linalg.eigvalsh(res.cov) > 0)
+
+
+def test_covariance_grows_with_narrow_baseline():
+    target = np.array([[200.0, 200.0, 40.0]])
+    wide = _cams(400.0)
+    narrow = _cams(40.0)
+    s_wide = triangulate_pixels(wide, np.stack([c.project(target)[0] for c in wide], axis=1)).sigma()
+    s_narrow = triangulate_pixels(narrow, np.stack([c.project(target)[0] for c in narrow], axis=1)).sigma()
+    assert np.linalg.norm(s_narrow) > 3 * np.linalg.norm(s_wide)
+
+
+def test_missing_parallel_and_behind_are_invalid():
+    o = np.array([[0.0, 0.0, 0.0], [10.0, 0.0, 0.0]])
+    d = np.array([
+        [[1.0, 1.0, 0.0], [-1.0, 1.0, 0.0]],          # meet at (5, 5, 0)
+        [[0.0, 1.0, 0.0], [0.0, 1.0, 0.0]],           # parallel
+        [[1.0, 1.0, 0.0], [np.nan, np.nan, np.nan]],  # one camera missing
+        [[-1.0, -1.0, 0.0], [1.0, -1.0, 0.0]],        # meet behind both
+    ])
+    res = triangulate_rays(o, d)
+    assert res.valid.tolist() == [True, False, False, False]
+    assert np.allclose(res.points[0], [5.0, 5.0, 0.0])
+    assert np.isnan(res.points[1:]).all()
+
+
+def test_bundle_camera_moves_site_frame_to_projected(tmp_path, monkeypatch):
+    import camera_models
+
+    monkeypatch.setattr(camera_models, "CALIB_DIR", tmp_path)
+    georef = {"origin_lat": 32.0, "origin_lon": 35.0, "origin_alt": 100.0,
+              "yaw_site_deg": 30.0, "projected_epsg": 32636}
+    camera_models.save_bundle("a", CameraIntrinsics.from_fov(640, 480, 50.0),
+                              CameraPose(10.0, 0.0, 5.0, 0.0, 0.0, 0.0), "", georef=georef)
+    cam, epsg = camera_models.bundle_camera("a")
+    assert epsg == 32636
+    from geom3d import GeoRef
+
+    g = GeoRef.from_dict(georef)
+    X0, Y0 = g.origin_projected()
+    assert np.allclose(cam.origin[2], 105.0)
+    # Local +x rotated by the site yaw
+    assert np.allclose(cam.origin[:2] - [X0, Y0], [10 * np.cos(np.radians(30)), 10 * np.sin(np.radians(30))])
@@ -0,0 +1,107 @@
+import os
+
+import numpy as np
+import pytest
+
+from app_state import Distortion
+from core import filecache
+from core.i2g_core import Extrinsics, Intrinsics, PTZ, image_ray, image_rays
+from core.undistort import (
+    RayMap,
+    calibration_key,
+    compute_ray_map,
+    distort_normalized,
+    load_ray_map,
+    lookup_rays,
+    prune_cache,
+    start_ray_map,
+    undistort_points,
+)
+
+K = dict(fx=500.0, fy=505.0, cx=161.0, cy=119.0)
+DIST = Distortion(k1=-0.21, k2=0.05, p1=0.001, p2=-0.0015, k3=None)
+
+
+def test_undistort_inverts_distortion():
+    rng = np.random.default_rng(0)
+    x = rng.uniform(-0.3, 0.3, 100)
+    y = rng.uniform(-0.25, 0.25, 100)
+    xd, yd = distort_normalized(x, y, DIST)
+    u = xd * K["fx"] + K["cx"]
+    v = yd * K["fy"] + K["cy"]
+    xu, yu = undistort_points(u, v, dist=DIST, **K)
+    assert np.allclose(xu, x, atol=1e-7) and np.allclose(yu, y, atol=1e-7)
+
+
+def test_ray_map_cache_is_memory_mapped(tmp_path):
+    m = load_ray_map(320, 240, dist=DIST, cache_dir=tmp_path, **K)
+    assert m.shape == (240, 320, 2) and m.dtype == np.float32
+    assert isinstance(m, np.memmap)
+    again = load_ray_map(320, 240, dist=DIST, cache_dir=tmp_path, **K)
+    assert np.array_equal(np.asarray(again), compute_ray_map(320, 240, dist=DIST, **K))
+    assert len(list(tmp_path.glob("*.npy"))) == 1
+    assert calibration_key(320, 240, dist=DIST, **K) != calibration_key(320, 240, dist=None, **K)
+
+
+def test_default_ray_map_cache_follows_the_cache_root(tmp_path):
+    filecache.set_cache_root(tmp_path)
+    load_ray_map(64, 48, dist=DIST, **K)
+    assert len(list((tmp_path / "raymaps").glob("raymap_64x48_*.npy"))) == 1
+
+
+def test_rays_follow_ray_map():
+    m = compute_ray_map(320, 240, dist=DIST, **K)
+    intr = Intrinsics(320, 240, **K)
+    extr = Extrinsics(0.0, 0.0, 10.0, 45.0, 5.0, 0.0, 32636)
+    ptz = PTZ(10.0, -2.0)
+    x, y = lookup_rays(m, 300, 20)
+    xu, yu = undistort_points(300, 20, dist=DIST, **K)
+    assert x == pytest.approx(xu, abs=1e-6) and y == pytest.approx(yu, abs=1e-6)
+
+    _, d = image_ray(300, 20, intr, ptz, extr, ray_map=m)
+    _, d_plain = image_ray(300, 20, intr, ptz, extr)
+    assert not np.allclose(d, d_plain)
+    _, ds = image_rays([300, 10.5], [20, 200.25], intr, ptz, extr, ray_map=m)
+    assert np.allclose(ds[0], d)
+    # Without distortion the map reproduces the pinhole rays
+    flat = compute_ray_map(320, 240, dist=None, **K)
+    _, d0 = image_ray(10.5, 200.25, intr, ptz, extr, ray_map=flat)
+    _, d1 = image_ray(10.5, 200.25, intr, ptz, extr)
+    assert np.allclose(d0, d1, atol=1e-6)
+
+
+def test_ray_map_is_rescaled_for_other_focal_lengths():
+    K0 = (K["fx"], K["fy"], K["cx"], K["cy"])
+    base = RayMap(compute_ray_map(320, 240, dist=DIST, **K), "k", K0, DIST)
+    us, vs = np.array([300.0, 10.5, 160.0]), np.array([20.0, 200.25, 119.0])
+    x0, y0 = undistort_points(us, vs, dist=DIST, **K)
+    assert np.allclose(lookup_rays(base, us, vs), (x0, y0), atol=1e-6)
+
+    # Zooming in keeps each pixel's undistorted offset
+    zoomed = base.rescaled(2 * K["fx"], 2 * K["fy"], K["cx"], K["cy"])
+    x, y = lookup_rays(zoomed, us, vs)
+    assert np.allclose(x, x0 / 2, atol=1e-6) and np.allclose(y, y0 / 2, atol=1e-6)
+    assert zoomed.cache_key != base.cache_key and zoomed.array is base.array
+
+    # Distortion measured at the new focal length is solved exactly
+    other = (-0.05, 0.01, 0.0, 0.0, 0.0)
+    exact = undistort_points(us, vs, 2 * K["fx"], 2 * K["fy"], K["cx"], K["cy"], other)
+    refined = base.rescaled(2 * K["fx"], 2 * K["fy"], K["cx"], K["cy"], other)
+    assert np.allclose(lookup_rays(refined, us, vs), exact, atol=1e-7)
+    # Before the map exists the rays are solved directly
+    pending = RayMap(None, "k", K0, DIST).rescaled(2 * K["fx"], 2 * K["fy"], K["cx"], K["cy"], other)
+    assert pending.key is None
+    assert np.allclose(lookup_rays(pending, us, vs), exact, atol=1e-9)
+
+
+def test_background_build_and_bounded_cache(tmp_path):
+    m = start_ray_map(64, 48, dist=DIST, cache_dir=tmp_path, **K).result(timeout=30)
+    assert isinstance(m, np.memmap) and m.shape == (48, 64, 2)
+    size = next(tmp_path.glob("*.npy")).stat().st_size
+    for fx in (510.0, 520.0):
+        load_ray_map(64, 48, fx, K["fy"], K["cx"], K["cy"], DIST, cache_dir=tmp_path)
+    assert len(list(tmp_path.glob("*.npy"))) == 3
+    first = tmp_path / f"raymap_64x48_{calibration_key(64, 48, dist=DIST, **K)}.npy"
+    os.utime(first, ns=(0, 0))
+    assert prune_cache(tmp_path, max_bytes=2 * size) == 1
+    assert not first.exists() and len(list(tmp_path.glob("*.npy"))) == 2
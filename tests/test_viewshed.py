@@ -0,0 +1,97 @@
+import math
+
+import numpy as np
+
+from core import filecache
+from core.dem_grid import GridDemSampler
+from core.i2g_core import intersect_ray_with_dem
+from core.viewshed import (
+    Viewshed,
+    cache_path,
+    compute_viewshed,
+    load_cached_viewshed,
+    load_or_compute_viewshed,
+    prune_cache,
+)
+
+
+def _ridge():
+    # 1 m cells, flat at 0 m with a 20 m wall at x = 100..104
+    z = np.zeros((200, 300))
+    z[:, 100:105] = 20.0
+    return GridDemSampler(z, (1.0, 0.0, 0.0, 0.0, -1.0, 200.0))
+
+
+ORIGIN = np.array([50.0, 100.0, 10.0])
+
+
+def test_ridge_hides_terrain_behind_it():
+    vs = compute_viewshed(_ridge(), ORIGIN, max_range_m=150.0, workers=1)
+    assert vs.is_visible([[80.0, 100.0, 0.0], [102.0, 100.0, 20.0]]).all()
+    assert not vs.is_visible([[160.0, 100.0, 0.0]])[0]
+    # Raster: cell row 100 (y = 99.5), column 160 is hidden and its line of
+    # sight ends at the wall
+    r, c = 100 - vs.window[0], 160 - vs.window[1]
+    assert not vs.visible[r, c]
+    assert 45.0 <= vs.distance[r, c] <= 55.0
+    r, c = 100 - vs.window[0], 70 - vs.window[1]
+    assert vs.visible[r, c]
+    assert abs(vs.distance[r, c] - math.hypot(20.5, 0.5)) < 1e-3
+
+
+def test_process_pool_matches_serial():
+    a = compute_viewshed(_ridge(), ORIGIN, max_range_m=120.0, n_azimuth=720, workers=1)
+    b = compute_viewshed(_ridge(), ORIGIN, max_range_m=120.0, n_azimuth=720, workers=2)
+    assert np.array_equal(a.horizon, b.horizon)
+    assert np.array_equal(a.visible, b.visible)
+
+
+def test_clamped_intersection_matches_plain_march():
+    dem = _ridge()
+    vs = compute_viewshed(dem, ORIGIN, max_range_m=400.0, workers=1)
+    rng = np.random.default_rng(3)
+    for _ in range(30):
+        d = np.array([rng.uniform(-1, 1), rng.uniform(-1, 1), rng.uniform(-0.4, 0.05)])
+        ref = intersect_ray_with_dem(ORIGIN, d, dem, max_range_m=400.0, step_m=1.0)
+        got = intersect_ray_with_dem(ORIGIN, d, dem, max_range_m=400.0, step_m=1.0, viewshed=vs)
+        if ref is None:
+            assert got is None
+        else:
+            assert got is not None and np.allclose(got, ref, atol=1e-3)
+
+
+def test_sky_ray_rejected_and_sidecar_round_trip(tmp_path):
+    dem = _ridge()
+    path = tmp_path / "vs.npz"
+    vs = load_or_compute_viewshed(dem, ORIGIN, path, stamp="a", max_range_m=100.0, workers=1)
+    t0, t1 = vs.ray_bounds([0.0, -1.0, 0.2])
+    assert t1 == math.inf and t0 * 1.0 > 90.0
+    assert intersect_ray_with_dem(ORIGIN, [0.0, -1.0, 0.2], dem, max_range_m=80.0, viewshed=vs) is None
+
+    again = Viewshed.load(path, "a")
+    assert again is not None and np.array_equal(again.horizon, vs.horizon)
+    assert Viewshed.load(path, "b") is None
+
+
+def test_cache_is_keyed_and_bounded(tmp_path):
+    dem = _ridge()
+    cache = tmp_path / "viewsheds"
+    a = load_cached_viewshed(dem, ORIGIN, "dem|1:2|50,100,10", cache, max_range_m=60.0, workers=1)
+    path = cache_path("dem|1:2|50,100,10", cache)
+    assert path.exists() and Viewshed.load(path, "dem|1:2|50,100,10") is not None
+    again = load_cached_viewshed(dem, ORIGIN, "dem|1:2|50,100,10", cache, workers=1)
+    assert np.array_equal(again.horizon, a.horizon)
+
+    other = ORIGIN + [5.0, 0.0, 0.0]
+    load_cached_viewshed(dem, other, "dem|1:2|55,100,10", cache, max_range_m=60.0, workers=1)
+    assert len(list(cache.glob("viewshed_*.npz"))) == 2
+    keep = cache_path("dem|1:2|55,100,10", cache)
+    assert prune_cache(cache, max_bytes=keep.stat().st_size, keep=keep) == 1
+    assert keep.exists() and not path.exists()
+
+
+def test_default_cache_follows_the_cache_root(tmp_path):
+    filecache.set_cache_root(tmp_path)
+    load_cached_viewshed(_ridge(), ORIGIN, "dem|1:2|50,100,10", max_range_m=60.0, workers=1)
+    assert cache_path("dem|1:2|50,100,10") == tmp_path / "viewsheds" / cache_path("dem|1:2|50,100,10").name
+    assert cache_path("dem|1:2|50,100,10").exists()
@@ -0,0 +1,46 @@
+import math
+
+import numpy as np
+import pytest
+
+from core.zoom_table import ZoomTable
+
+
+def _table():
+    zoom = [0.0, 0.2, 0.5, 1.0]
+    fx = [800.0, 1400.0, 3200.0, 12000.0]
+    return ZoomTable(zoom, fx, fx, [960.0] * 4, [540.0, 541.0, 543.0, 544.0],
+                     dist=[[-0.3, 0.1], [-0.2, 0.05], [-0.1, 0.0], [0.0, 0.0]],
+                     width=1920, height=1080)
+
+
+def test_interpolation_hits_samples_and_stays_monotone():
+    t = _table()
+    rows = t.interpolate([0.0, 0.2, 0.5, 1.0])
+    assert np.allclose(rows[:, 0], [800.0, 1400.0, 3200.0, 12000.0])
+    fx = t.interpolate(np.linspace(-0.1, 1.1, 241))[:, 0]
+    assert np.all(np.diff(fx) >= -1e-9)
+    assert fx[0] == pytest.approx(800.0) and fx[-1] == pytest.approx(12000.0)
+    p = t.lookup(0.35)
+    assert 1400.0 < p["fx"] < 3200.0
+    assert -0.2 < p["dist"]["k1"] < -0.1
+    assert p["hfov_deg"] == pytest.approx(math.degrees(2 * math.atan(960.0 / p["fx"])))
+
+
+def test_round_trip_through_dict():
+    t = _table()
+    t2 = ZoomTable.from_dict(t.to_dict())
+    z = np.linspace(0, 1, 17)
+    assert np.allclose(t.interpolate(z), t2.interpolate(z))
+
+
+def test_bundle_persists_zoom_table(tmp_path, monkeypatch):
+    import camera_models
+    from geom3d import CameraIntrinsics, CameraPose
+
+    monkeypatch.setattr(camera_models, "CALIB_DIR", tmp_path)
+    camera_models.save_bundle("cam", CameraIntrinsics.from_fov(1920, 1080, 60.0),
+                              CameraPose(0, 0, 10, 0, 0, 0), "dtm.tif", zoom_table=_table())
+    _, _, _, meta, _ = camera_models.load_bundle("cam")
+    t = camera_models.zoom_table_from_meta(meta)
+    assert t is not None and len(t) == 4
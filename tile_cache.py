@@ -0,0 +1,211 @@
+# tile_cache.py
+# -*- coding: utf-8 -*-
+# Persistent on-disk cache of decoded map rasters
+#
+# Every start used to decode the same orthophoto/DTM overview again, run a
+# percentile pass over it for the contrast stretch and re-read every map
+# tile.  TileCache keeps those results in a local directory: per raster (keyed
+# by a hash of its absolute path, size and mtime, so a rewritten file misses)
+# the overview image and rendered tiles as .npy files that later sessions
+# memory-map, and a small JSON with the stretch and geotransform.  Hits touch
+# the file's mtime; once the directory grows past its byte budget the least
+# recently used files are deleted.  Writes are atomic (temp file + rename)
+# and failures to write are ignored, so a read-only cache only costs speed.
+
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from core import filecache
+
+# Size budget of the default cache
+MAX_CACHE_BYTES = 2 * 1024 ** 3
+
+
+def file_key(path: Union[str, Path]) -> str:
+    """Cache key of a raster file: hash of absolute path, size and mtime."""
+    p = os.path.abspath(os.fspath(path))
+    st = os.stat(p)
+    text = f"{p}|{st.st_size}|{st.st_mtime_ns}"
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:20]
+
+
+def variant_key(*parts: Any) -> str:
+    """Short hash of rendering options (tile size, stretch, ...)."""
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:10]
+
+
+def default_cache_dir() -> Path:
+    """``tiles`` under :func:`core.filecache.cache_root`."""
+    return filecache.cache_root() / "tiles"
+
+
+class TileCache:
+    """Overview arrays, rendered tiles and raster metadata under ``root``."""
+
+    def __init__(self, root: Optional[Union[str, Path]] = None, max_bytes: int = MAX_CACHE_BYTES):
+        self.root = Path(root) if root is not None else default_cache_dir()
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._bytes: Optional[int] = None  # scanned lazily
+        self._lock = threading.Lock()
+
+    # ----- overview + metadata -----
+    def load_overview(self, key: str, max_size: int) -> Optional[Tuple[np.ndarray, Dict[str, Any]]]:
+        """Memory-mapped overview image and its metadata, or None."""
+        meta = self._load_json(self.root / key / f"overview_{int(max_size)}.json")
+        img = self._load_npy(self.root / key / f"overview_{int(max_size)}.npy") if meta else None
+        if img is None or list(img.shape[:2]) != list(meta.get("shape", [])):
+            self._count(False)
+            return None
+        self._count(True)
+        return img, meta
+
+    def save_overview(self, key: str, max_size: int, img: np.ndarray, meta: Dict[str, Any]) -> None:
+        meta = dict(meta, shape=[int(img.shape[0]), int(img.shape[1])])
+        if self._save_npy(self.root / key / f"overview_{int(max_size)}.npy", img):
+            self._save_bytes(self.root / key / f"overview_{int(max_size)}.json",
+                             json.dumps(meta).encode("utf-8"))
+
+    # ----- tiles -----
+    def _tile_path(self, key: str, variant: str, level: int, tx: int, ty: int) -> Path:
+        return self.root / key / f"tiles_{variant}" / f"{int(level)}_{int(tx)}_{int(ty)}.npy"
+
+    def load_tile(self, key: str, variant: str, level: int, tx: int, ty: int) -> Optional[np.ndarray]:
+        img = self._load_npy(self._tile_path(key, variant, level, tx, ty))
+        self._count(img is not None)
+        return img
+
+    def save_tile(self, key: str, variant: str, level: int, tx: int, ty: int, img: np.ndarray) -> None:
+        self._save_npy(self._tile_path(key, variant, level, tx, ty), img)
+
+    # ----- housekeeping -----
+    def usage(self) -> int:
+        """Bytes currently held in the cache directory."""
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(size for _, _, size in self._files())
+            return self._bytes
+
+    def stats(self) -> Dict[str, int]:
+        used = self.usage()
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "writes": self.writes,
+                    "evictions": self.evictions, "bytes": used, "max_bytes": self.max_bytes}
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """Delete least recently used files until the cache fits ``max_bytes``; returns bytes freed."""
+        budget = self.max_bytes if max_bytes is None else int(max_bytes)
+        removed, freed = filecache.prune(self.root, budget, "*.npy", recursive=True,
+                                         on_remove=self._removed)
+        with self._lock:
+            self._bytes = None  # recounted on the next usage()
+            self.evictions += removed
+        return freed
+
+    def _removed(self, p: Path) -> None:
+        # Metadata goes with its overview
+        if p.name.startswith("overview_"):
+            try:
+                p.with_suffix(".json").unlink()
+            except OSError:
+                pass
+        for d in (p.parent, p.parent.parent):
+            if d == self.root:
+                break
+            try:
+                d.rmdir()  # only succeeds once empty
+            except OSError:
+                break
+
+    def clear(self) -> None:
+        self.evict(0)
+        with self._lock:
+            self.hits = self.misses = self.writes = self.evictions = 0
+
+    # ----- files -----
+    def _files(self):
+        """``(mtime_ns, path, size)`` of every cached array."""
+        return filecache.scan(self.root, "*.npy", recursive=True)
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _load_json(self, p: Path) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(p.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _load_npy(self, p: Path) -> Optional[np.ndarray]:
+        try:
+            arr = np.load(p, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        filecache.touch(p)
+        return arr
+
+    def _save_npy(self, p: Path, arr: np.ndarray) -> bool:
+        self.usage()  # scan before the new file lands, so it is counted once
+        try:
+            old = p.stat().st_size  # overwrite
+        except OSError:
+            old = 0
+        try:
+            size = filecache.atomic_write(p, lambda f: np.save(f, np.ascontiguousarray(arr)))
+        except OSError:
+            return False
+        self._added(size - old)
+        return True
+
+    def _save_bytes(self, p: Path, data: bytes) -> None:
+        try:
+            filecache.atomic_write(p, lambda f: f.write(data))
+        except OSError:
+            pass
+
+    def _added(self, size: int) -> None:
+        self.usage()
+        with self._lock:
+            self.writes += 1
+            self._bytes += size
+            over = self._bytes > self.max_bytes
+        if over:
+            # Evict down to 90% so a full cache does not rescan on every write
+            self.evict(int(self.max_bytes * 0.9))
+
+
+_default: Optional[TileCache] = None
+_default_lock = threading.Lock()
+_disabled = False
+
+
+def default_cache() -> Optional[TileCache]:
+    """The process-wide cache in :func:`default_cache_dir`, or None when disabled."""
+    global _default
+    with _default_lock:
+        if _disabled:
+            return None
+        if _default is None:
+            _default = TileCache()
+        return _default
+
+
+def set_default_cache(cache: Optional[TileCache]) -> None:
+    """Replace the process-wide cache; ``None`` disables disk caching."""
+    global _default, _disabled
+    with _default_lock:
+        _default = cache
+        _disabled = cache is None
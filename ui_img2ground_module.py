@@ -9,12 +9,12 @@ viewing direction and field of view used during calibration.
 """
 
 from __future__ import annotations
-import sys, math, json
+import sys, os, math, json
 from pathlib import Path
 from typing import Optional, Dict, Any, Tuple, List, Protocol, TYPE_CHECKING
 
 import numpy as np
-from pyproj import Transformer
+from crs_cache import get_transformer
 import types
 import sys
 try:  # pragma: no cover - optional Qt/vlc dependencies
@@ -62,7 +62,7 @@ except Exception:  # pragma: no cover
     sys.modules.setdefault("PySide6.QtWidgets", QtWidgets)
     sys.modules.setdefault("PySide6.QtGui", QtGui)
 
-from camera_models import load_bundle, list_bundles, CALIB_DIR
+from camera_models import load_bundle, list_bundles, zoom_table_from_meta, CALIB_DIR
 from geom3d import GeoRef
 from core.i2g_core import (
     Intrinsics,
@@ -71,11 +71,20 @@ from core.i2g_core import (
     image_ray,
     intersect_ray_with_dem,
 )
+from core.footprint import Footprint
+from core.ground_lut import GroundLUTService
+from core.homography import apply_homography, estimate_homography
+from core.undistort import RayMap, calibration_key, distortion_coeffs, start_ray_map
+from core.range_image import start_range_image_from_viewshed
+from core.viewshed import start_viewshed
+from preset_store import PresetEntry, PresetStore
 from dtm import DTM
 
 if TYPE_CHECKING:  # pragma: no cover - type hints only
     from map_view import MapView
 from raster_layer import RasterLayer
+from raster_loader import start_raster_load
+import dataset_pool
 from app_state import app_state
 from onvif_ptz import PTZReading
 
@@ -118,28 +127,12 @@ class PTZClient(Protocol):
 # ---------------- math helpers ----------------
 def _homography_from_points(src: List[Tuple[float, float]],
                             dst: List[Tuple[float, float]]) -> np.ndarray:
-    n = min(len(src), len(dst))
-    if n < 4:
-        raise ValueError("Need at least 4 matching points")
-    A = []
-    for (u, v), (x, y) in zip(src[:n], dst[:n]):
-        A.append([u, v, 1, 0, 0, 0, -x*u, -x*v, -x])
-        A.append([0, 0, 0, u, v, 1, -y*u, -y*v, -y])
-    A = np.asarray(A, dtype=float)
-    _, _, VT = np.linalg.svd(A)
-    H = VT[-1, :].reshape(3, 3)
-    if abs(H[2, 2]) > 1e-12:
-        H = H / H[2, 2]
-    return H
+    """Robust normalized-DLT homography (see core.homography.estimate_homography)."""
+    return estimate_homography(src, dst).H
 
 def _apply_homography(H: np.ndarray, uv: Tuple[float, float]) -> Tuple[float, float]:
-    u, v = float(uv[0]), float(uv[1])
-    x = H[0, 0]*u + H[0, 1]*v + H[0, 2]
-    y = H[1, 0]*u + H[1, 1]*v + H[1, 2]
-    w = H[2, 0]*u + H[2, 1]*v + H[2, 2]
-    if abs(w) < 1e-12:
-        return (np.nan, np.nan)
-    return (x/w, y/w)
+    x, y = apply_homography(H, (float(uv[0]), float(uv[1])))
+    return (float(x), float(y))
 
 def _normalize_angle_deg(a: float) -> float:
     while a <= -180.0: a += 360.0
@@ -468,11 +461,17 @@ class Img2GroundModule(QtCore.QObject):
         self._dtm: Optional[DTM] = None
         self._map: Optional[MapView] = None
         self._ortho_layer: Optional[RasterLayer] = None
+        self._ortho_ref: Optional[RasterLayer] = None  # borrowed from dataset_pool
+        self._ortho_load = None  # ui_map_tools.RasterLoadWatcher of a background ortho load
+        self._ortho_preview: Optional[QtWidgets.QGraphicsPixmapItem] = None
         self._ortho_pix: Optional[QtWidgets.QGraphicsPixmapItem] = None
 
         # homography
         self._H: Optional[np.ndarray] = None
         self._calib_img_wh: Optional[Tuple[int,int]] = None
+        # per-preset homographies of the loaded bundle; pose the current H belongs to
+        self._preset_store: Optional[PresetStore] = None
+        self._H_pose: Optional[Tuple[float, float, Optional[float]]] = None
         self._frame_item: Optional[QtWidgets.QGraphicsPathItem] = None
 
         # PTZ
@@ -480,6 +479,10 @@ class Img2GroundModule(QtCore.QObject):
         self._ptz_last: PTZReading = PTZReading()
         self._yaw_offset_deg: Optional[float] = None
         self._hfov_deg: Optional[float] = None
+        self._zoom_table = None  # core.zoom_table.ZoomTable from the bundle
+        # lens undistortion maps: calibration key -> Future, and the last RayMap handed out
+        self._ray_map_jobs: Dict[str, Any] = {}
+        self._ray_map_cache: Optional[RayMap] = None
         self._fx_from_hfov: Optional[float] = None
         self._fov_items: List[QtWidgets.QGraphicsLineItem] = []
         self._azimuth_item: Optional[QtWidgets.QGraphicsLineItem] = None
@@ -487,6 +490,16 @@ class Img2GroundModule(QtCore.QObject):
         self._last_pan: Optional[float] = None
         self._intrinsics: Dict[str, Any] = {}
         self._cam_xy: Optional[Tuple[float, float]] = None
+        # pixel→ground LUT for the current pose (built in the background)
+        self._ground_lut = GroundLUTService()
+        # live ground footprint of the view (replaces the static FOV wedge)
+        self._footprint_shown: Optional[Footprint] = None
+        self._footprint_item: Optional[QtWidgets.QGraphicsPolygonItem] = None
+        # viewshed from the camera position (computed in the background) and
+        # the mount's polar range image, read off the same sweep
+        self._viewshed_key = None
+        self._viewshed_job = None
+        self._range_image_job = None
 
         # last pick
         self._last_geo = None
@@ -972,10 +985,17 @@ class Img2GroundModule(QtCore.QObject):
 
     def apply_ortho(self, layer: RasterLayer) -> None:
         try:
-            from ui_map_tools import numpy_to_qimage  # local import
+            from ui_map_tools import attach_tiles, numpy_to_qpixmap  # local import
+            w = self._ortho_load
+            if w is not None and w.path == getattr(layer, "path", None):
+                w.cancel()  # the same orthophoto arrived ready-made from Preparation
+            if layer is not self._ortho_ref:
+                # Hold our own reference: Preparation releases its layer when it loads another
+                ref = dataset_pool.acquire_raster_layer(layer.path, max_size=getattr(layer, "max_size", 2048))
+                dataset_pool.release(self._ortho_ref)
+                self._ortho_ref = layer = ref
             self._ortho_layer = layer
-            img = numpy_to_qimage(layer.downsampled_image())
-            pix = QtGui.QPixmap.fromImage(img)
+            pix = numpy_to_qpixmap(layer.downsampled_image())
             sc = self._ensure_scene()
             try:
                 n_before = len(sc.items())
@@ -984,6 +1004,7 @@ class Img2GroundModule(QtCore.QObject):
             print(f"[I2G.apply_ortho] before clear: items={n_before}")
             it = self._ortho_pix
             self._ortho_pix = None
+            self._ortho_preview = None
             try:
                 sc.clear()
             finally:
@@ -996,6 +1017,7 @@ class Img2GroundModule(QtCore.QObject):
             self._ortho_pix = QtWidgets.QGraphicsPixmapItem(pix)
             self._ortho_pix.setZValue(0)
             sc.addItem(self._ortho_pix)
+            attach_tiles(self._ortho_pix, layer)
             layer.pixmap_item = self._ortho_pix
             print(
                 f"[I2G.ortho] pixmap loaded? {not pix.isNull()} scene_has_items={len(self._map.scene().items())}"
@@ -1003,6 +1025,7 @@ class Img2GroundModule(QtCore.QObject):
             shared_state.orthophoto_path = layer.path
             self._log(f"Orthophoto loaded (EPSG={layer.ds.crs.to_epsg()})")
             self._remove_last_pick(); self._remove_video_frame_outline(); self._remove_fov_wedge()
+            self._remove_footprint()
             self._refresh_readiness()
             self._refresh_az_btn_state()
             self._refresh_level_btn_state()
@@ -1025,8 +1048,7 @@ class Img2GroundModule(QtCore.QObject):
             epsg_cam = cam.get("epsg")
             print(f"[I2G._draw_camera_marker] cam({X:.3f},{Y:.3f}) epsg_cam={epsg_cam} → epsg_here={epsg_here}")
             if epsg_here and epsg_cam and epsg_cam != epsg_here:
-                from pyproj import Transformer
-                tr = Transformer.from_crs(f"EPSG:{epsg_cam}", f"EPSG:{epsg_here}", always_xy=True)
+                tr = get_transformer(epsg_cam, epsg_here)
                 X, Y = tr.transform(X, Y)
                 print(f"[I2G._draw_camera_marker] transformed to ortho CRS → ({X:.3f},{Y:.3f})")
             self._cam_xy = (X, Y)
@@ -1040,11 +1062,36 @@ class Img2GroundModule(QtCore.QObject):
         if not path:
             self._open_prep_tab()
             return
+        w = self._ortho_load
+        if w is not None and w.active() and w.path == path:
+            return
+        if w is not None:
+            w.cancel()
+        from ui_map_tools import RasterLoadWatcher  # local import
+        # Decode in the background; a coarse preview is shown meanwhile
+        w = self._ortho_load = RasterLoadWatcher(start_raster_load(path, max_size=2048), self)
+        w.preview_ready.connect(self._show_ortho_preview)
+        w.layer_ready.connect(self._on_ortho_layer)
+        w.failed.connect(lambda msg: QtWidgets.QMessageBox.warning(None, "Orthophoto", f"Failed to load: {msg}"))
+
+    def _show_ortho_preview(self, preview) -> None:
+        from ui_map_tools import preview_item  # local import
+        sc = self._ensure_scene()
         try:
-            layer = RasterLayer(path, max_size=2048)
-            self.apply_ortho(layer)
-        except Exception as e:
-            QtWidgets.QMessageBox.warning(None, "Orthophoto", f"Failed to load: {e}")
+            if self._ortho_preview is not None and self._ortho_preview.scene() is not None:
+                sc.removeItem(self._ortho_preview)
+        except RuntimeError:
+            pass
+        self._ortho_preview = preview_item(preview)
+        self._ortho_preview.setZValue(0)
+        sc.addItem(self._ortho_preview)
+        if self._ortho_layer is None:
+            self._map.setSceneRect(QtCore.QRectF(0, 0, *preview.size))
+            self._map.fit()
+
+    def _on_ortho_layer(self, layer) -> None:
+        dataset_pool.release(self._ortho_ref); self._ortho_ref = layer
+        self.apply_ortho(layer)
 
     def _on_layers_changed(self, alias: str, layers: dict) -> None:
         if alias == getattr(app_state.current_camera, "alias", None):
@@ -1069,6 +1116,8 @@ class Img2GroundModule(QtCore.QObject):
         if ortho:
             ortho = self._resolve_path(ortho)
             self._set_ortho_layer(ortho)
+        elif self._ortho_load is not None:
+            self._ortho_load.cancel()  # the active camera has no orthophoto
         self._cam_xy = getattr(shared_state, "camera_proj", None)
         try:
             self._map.fit()
@@ -1089,10 +1138,11 @@ class Img2GroundModule(QtCore.QObject):
 
     def _load_dtm_path(self, path: str) -> None:
         try:
-            if self._dtm is not None:
-                self._dtm.close()
-            self._dtm = DTM(path)
+            dtm = dataset_pool.acquire_dtm(path)
+            dataset_pool.release(self._dtm)
+            self._dtm = dtm
             self._dtm_path = path
+            dtm.start_sampler()
         except Exception:
             pass
 
@@ -1141,13 +1191,16 @@ class Img2GroundModule(QtCore.QObject):
             else:
                 self._bundle = dict(res)
                 model_path = self._bundle.get("model_path") or self._bundle.get("terrain_path")
+            self._zoom_table = zoom_table_from_meta(self._bundle.get("meta"))
             if not model_path or not Path(model_path).exists():
                 QtWidgets.QMessageBox.warning(None, "Bundle", f"DTM path not found:\n{model_path}"); return
-            if self._dtm is not None:
-                self._dtm.close()
-            self._dtm = DTM(model_path)
+            dtm = dataset_pool.acquire_dtm(model_path)
+            dataset_pool.release(self._dtm)
+            self._dtm = dtm
             self._dtm_path = model_path
+            dtm.start_sampler()
             self._bundle_path = CALIB_DIR / f"{name}.json"
+            self._preset_store = PresetStore.load(CALIB_DIR / f"{name}.presets.json")
             self.lbl_bundle.setText(f"Loaded: {name}"); self._log(f"Bundle loaded: {name}")
         except Exception as e:
             QtWidgets.QMessageBox.warning(None, "Bundle", f"Failed to load bundle: {e}")
@@ -1268,6 +1321,9 @@ class Img2GroundModule(QtCore.QObject):
         self._refresh_readiness()
         self._refresh_az_btn_state()
         self._refresh_level_btn_state()
+        self._update_ground_lut()
+        self._update_footprint()
+        self._update_preset()
         
     # ----- FOV calib via PTZ -----
     def _get_pan_now(self):
@@ -1541,6 +1597,50 @@ class Img2GroundModule(QtCore.QObject):
         except Exception:
             pass
 
+    # ----- Live footprint -----
+    def _remove_footprint(self):
+        if self._footprint_item is not None:
+            try: self._footprint_item.scene().removeItem(self._footprint_item)
+            except Exception: pass
+            self._footprint_item = None
+        self._footprint_shown = None
+
+    def _update_footprint(self) -> None:
+        """Draw the ground footprint computed with the current pose's LUT.
+
+        The footprint is built on the LUT service's worker (see
+        _update_ground_lut); until it is ready the previous polygon stays.
+        """
+        if self._dtm is None or self._ortho_layer is None:
+            return
+        try:
+            model = self._ptz_camera_model()
+            dem = self._dtm.ready_sampler()
+            if model is None or dem is None:
+                return
+            intr, ptz, extr = model
+            lut = self._ground_lut.lut_for(intr, ptz, extr, dem)
+            fp = lut.footprint if lut is not None else None
+            if fp is None or fp is self._footprint_shown:
+                return
+            self._remove_footprint()
+            self._footprint_shown = fp
+            if fp.is_empty:
+                return
+            xs, ys = fp.polygon[:, 0], fp.polygon[:, 1]
+            epsg_layer = self._ortho_layer.ds.crs.to_epsg()
+            if epsg_layer and extr.epsg and epsg_layer != extr.epsg:
+                xs, ys = get_transformer(extr.epsg, epsg_layer).transform(xs, ys)
+            poly = QtGui.QPolygonF([QtCore.QPointF(*self._ortho_layer.geo_to_scene(float(x), float(y)))
+                                    for x, y in zip(xs, ys)])
+            self._remove_fov_wedge()
+            sc = self._ensure_scene()
+            pen = QtGui.QPen(QtGui.QColor(0, 255, 180), 2); pen.setCosmetic(True)
+            self._footprint_item = sc.addPolygon(poly, pen, QtGui.QBrush(QtGui.QColor(0, 255, 180, 40)))
+            self._footprint_item.setZValue(18)
+        except Exception:
+            pass
+
     # ----- Azimuth line drawing -----
     def _remove_azimuth_line(self):
         if self._azimuth_item is not None:
@@ -1564,9 +1664,7 @@ class Img2GroundModule(QtCore.QObject):
         try:
             epsg_layer = self._ortho_layer.ds.crs.to_epsg()
             if epsg_layer and epsg and epsg_layer != epsg:
-                tr = Transformer.from_crs(
-                    f"EPSG:{epsg}", f"EPSG:{epsg_layer}", always_xy=True
-                )
+                tr = get_transformer(epsg, epsg_layer)
                 x1, y1 = tr.transform(start[0], start[1])
                 x2, y2 = tr.transform(end[0], end[1])
             else:
@@ -1605,28 +1703,105 @@ class Img2GroundModule(QtCore.QObject):
             if res:
                 uvs, xys, (iw, ih) = res
                 try:
-                    H = _homography_from_points(uvs, xys)
-                    self._H = H
+                    fit = estimate_homography(uvs, xys)
+                    self._H = fit.H
                     self._calib_img_wh = (iw, ih)
-                    self.lbl_status.setText(f"Homography OK (pairs={len(uvs)}).")
+                    self._H_pose = None
+                    self._store_preset(fit)
+                    self.lbl_status.setText(
+                        f"Homography OK (pairs={len(uvs)}, inliers={fit.n_inliers}, rms={fit.rms:.2f})."
+                    )
+                    if fit.n_inliers < len(uvs):
+                        bad = [i + 1 for i in np.flatnonzero(~fit.inliers)]
+                        self._log(f"Homography: rejected pair(s) {bad}, residuals "
+                                  + ", ".join(f"{fit.residuals[i - 1]:.1f}" for i in bad))
                     self._draw_video_frame_outline()
                 except Exception as e:
                     QtWidgets.QMessageBox.warning(None, "Homography", f"Failed to compute H: {e}")
         try: self._player.set_pause(False)
         except Exception: pass
 
+    # ----- per-preset homographies -----
+    def _ptz_pose_now(self) -> Optional[Tuple[float, float, Optional[float]]]:
+        last = getattr(self, "_ptz_last", None)
+        if last is None or last.pan_deg is None or last.tilt_deg is None:
+            return None
+        zoom = last.zoom_norm if last.zoom_norm is not None else last.zoom_mm
+        return (float(last.pan_deg), float(last.tilt_deg), None if zoom is None else float(zoom))
+
+    def _scene_to_geo_matrix(self) -> Optional[np.ndarray]:
+        """3x3 affine taking ortho scene coordinates to the ortho CRS."""
+        layer = self._ortho_layer
+        if layer is None or getattr(layer, "over_transform", None) is None:
+            return None
+        t = layer.over_transform
+        # scene_to_geo samples pixel centers
+        return np.array([[t.a, t.b, t.c], [t.d, t.e, t.f], [0.0, 0.0, 1.0]]) @ \
+            np.array([[1.0, 0.0, 0.5], [0.0, 1.0, 0.5], [0.0, 0.0, 1.0]])
+
+    def _store_preset(self, fit) -> None:
+        """Remember the fresh homography for the current PTZ pose."""
+        pose = self._ptz_pose_now()
+        M = self._scene_to_geo_matrix()
+        if self._preset_store is None or pose is None or M is None:
+            return
+        try:
+            epsg = self._ortho_layer.ds.crs.to_epsg()
+            H_geo = M @ fit.H
+            H_geo = H_geo / H_geo[2, 2]
+            self._preset_store.put(PresetEntry(
+                pan=pose[0], tilt=pose[1], zoom=pose[2], H=H_geo.tolist(),
+                image_wh=self._calib_img_wh, epsg=epsg, rms=fit.rms, n_points=fit.n_inliers))
+            self._preset_store.save()
+            self._H_pose = pose
+            self._log(f"Preset stored: pan={pose[0]:.2f} tilt={pose[1]:.2f} zoom={pose[2]}")
+        except Exception as e:
+            self._log(f"Preset store failed: {e}")
+
+    def _update_preset(self) -> None:
+        """Switch to the stored homography of a known preset, or drop a stale one."""
+        store = self._preset_store
+        pose = self._ptz_pose_now()
+        if store is None or pose is None:
+            return
+        hit = store.nearest(*pose)
+        if self._H is not None and self._H_pose is not None:
+            # H measured at a pose: keep it only while the camera stays there
+            same = hit is not None and store.key(*self._H_pose) == store.key(hit[0].pan, hit[0].tilt, hit[0].zoom)
+            if same:
+                return
+            self._H = None; self._H_pose = None; self._calib_img_wh = None
+            self._remove_video_frame_outline()
+        elif self._H is not None:
+            return  # manual homography without pose: leave as is
+        if hit is None:
+            return
+        entry = hit[0]
+        M = self._scene_to_geo_matrix()
+        H_geo = entry.homography()
+        if M is None or H_geo is None or not entry.image_wh:
+            return
+        try:
+            epsg = self._ortho_layer.ds.crs.to_epsg()
+            if entry.epsg and epsg and int(entry.epsg) != int(epsg):
+                return
+        except Exception:
+            pass
+        self._H = np.linalg.inv(M) @ H_geo
+        self._calib_img_wh = tuple(entry.image_wh)
+        self._H_pose = (entry.pan, entry.tilt, entry.zoom)
+        self._draw_video_frame_outline()
+        self.lbl_status.setText(f"Preset homography (pan={entry.pan:.1f}°, tilt={entry.tilt:.1f}°).")
+
     def _draw_video_frame_outline(self):
         self._remove_video_frame_outline()
         if self._H is None or self._ortho_layer is None or not self._calib_img_wh:
             return
         iw, ih = self._calib_img_wh
-        corners = [(0,0), (iw-1,0), (iw-1,ih-1), (0,ih-1)]
-        pts = []
-        for u,v in corners:
-            xs, ys = _apply_homography(self._H, (u, v))
-            if not np.isfinite(xs) or not np.isfinite(ys):
-                return
-            pts.append(QtCore.QPointF(xs, ys))
+        corners = apply_homography(self._H, [(0, 0), (iw-1, 0), (iw-1, ih-1), (0, ih-1)])
+        if not np.all(np.isfinite(corners)):
+            return
+        pts = [QtCore.QPointF(float(xs), float(ys)) for xs, ys in corners]
         path = QtGui.QPainterPath(pts[0])
         for p in pts[1:]:
             path.lineTo(p)
@@ -1688,8 +1863,7 @@ class Img2GroundModule(QtCore.QObject):
         try:
             X, Y = self._ortho_layer.scene_to_geo(xs, ys)
             epsg = self._ortho_layer.ds.crs.to_epsg()
-            from pyproj import Transformer
-            tr = Transformer.from_crs(f"EPSG:{epsg}", "EPSG:4326", always_xy=True)
+            tr = get_transformer(epsg, 4326)
             lon, lat = tr.transform(X, Y)
             self._last_geo = {"lat": float(lat), "lon": float(lon), "epsg": epsg, "X": float(X), "Y": float(Y)}
             self.lbl_status.setText(f"MAP: lat={lat:.7f}, lon={lon:.7f} | XY(EPSG:{epsg})=({X:.2f}, {Y:.2f})")
@@ -1710,12 +1884,13 @@ class Img2GroundModule(QtCore.QObject):
         dlg = SinglePickDialog(img, self._root)
         if dlg.exec() == QtWidgets.QDialog.Accepted and dlg.picked_uv() is not None:
             uu, vv = dlg.picked_uv()
-            self._map_from_click(uu, vv, uv_in_calib_space=True)
+            # Deliberate snapshot picks are refined exactly against the DTM
+            self._map_from_click(uu, vv, uv_in_calib_space=True, exact=True)
         try: self._player.set_pause(False)
         except Exception: pass
 
     # ----- core mapping switch -----
-    def _map_from_click(self, u: int, v: int, uv_in_calib_space: bool = False):
+    def _map_from_click(self, u: int, v: int, uv_in_calib_space: bool = False, exact: bool = False):
         mode = self.cmb_mapping.currentText()
         prefer_h = (mode.startswith("Auto") or mode.startswith("Homography"))
         allow_ptz = (mode.startswith("Auto") or mode.startswith("PTZ"))
@@ -1729,7 +1904,7 @@ class Img2GroundModule(QtCore.QObject):
                 return
 
         if allow_ptz:
-            ok = self._map_by_ptz(u, v)
+            ok = self._map_by_ptz(u, v, exact=exact)
             if ok:
                 return
 
@@ -1755,15 +1930,26 @@ class Img2GroundModule(QtCore.QObject):
             return (None, None)
         return (xs, ys)
 
-    def _map_by_ptz(self, u: int, v: int) -> bool:
-        if not (self._bundle and self._ortho_layer and self._yaw_offset_deg is not None):
-            return False
+    def _ptz_camera_model(self) -> Optional[Tuple[Intrinsics, CorePTZ, Extrinsics]]:
+        """Camera model for the current bundle, calibration and PTZ reading."""
+        model = self._ptz_lens_model()
+        return None if model is None else model[:3]
+
+    def _ptz_lens_model(self) -> Optional[Tuple[Intrinsics, CorePTZ, Extrinsics, Tuple[float, ...]]]:
+        """:meth:`_ptz_camera_model` plus the lens distortion (k1, k2, p1, p2, k3) at the current zoom."""
+        if not (self._bundle and self._yaw_offset_deg is not None):
+            return None
         intr_d = self._bundle["intrinsics"]
         W = intr_d["width"]; H = intr_d["height"]
-        if self._hfov_deg is not None:
-            intr = Intrinsics.from_hfov(W, H, float(self._hfov_deg))
+        zoom_lens = self._zoom_intrinsics(W, H)
+        if zoom_lens is not None:
+            intr, dist = zoom_lens
         else:
-            intr = Intrinsics(W, H, intr_d["fx"], intr_d["fy"], intr_d["cx"], intr_d["cy"])
+            dist = self._spinbox_distortion()
+            if self._hfov_deg is not None:
+                intr = Intrinsics.from_hfov(W, H, float(self._hfov_deg))
+            else:
+                intr = Intrinsics(W, H, intr_d["fx"], intr_d["fy"], intr_d["cx"], intr_d["cy"])
 
         pose_d = self._bundle["pose"]
         pitch = pose_d.get("pitch_deg", pose_d.get("pitch", 0.0))
@@ -1774,8 +1960,7 @@ class Img2GroundModule(QtCore.QObject):
         cam_geo = georef.local_to_geographic(cam_local)
         prj = cam_geo.get("projected")
         if not prj:
-            self.lbl_status.setText("Project georef missing EPSG.")
-            return False
+            return None
         extr = Extrinsics(
             prj["x"],
             prj["y"],
@@ -1787,15 +1972,149 @@ class Img2GroundModule(QtCore.QObject):
         )
 
         ptz = CorePTZ(self._ptz_last.pan_deg, self._ptz_last.tilt_deg, None)
+        return intr, ptz, extr, dist
 
-        o, d = image_ray(u, v, intr, ptz, extr)
+    def _zoom_intrinsics(self, W: int, H: int) -> Optional[Tuple[Intrinsics, Tuple[float, ...]]]:
+        """Intrinsics and distortion interpolated from the bundle's zoom table at the current zoom."""
+        table = self._zoom_table
+        if table is None:
+            return None
+        z = getattr(self._ptz_last, table.source, None)
+        if z is None:
+            return None
+        return self._table_lens(table.lookup(z), W, H)
+
+    def _table_lens(self, p: Dict[str, Any], W: int, H: int) -> Tuple[Intrinsics, Tuple[float, ...]]:
+        """Zoom-table entry as intrinsics at the bundle resolution plus its distortion."""
+        table = self._zoom_table
+        # Scale to the bundle resolution if the table was measured at another one
+        sx = W / float(table.width) if table.width else 1.0
+        sy = H / float(table.height) if table.height else sx
+        intr = Intrinsics(W, H, p["fx"] * sx, p["fy"] * sy, p["cx"] * sx, p["cy"] * sy)
+        return intr, tuple(p["dist"][k] for k in ("k1", "k2", "p1", "p2", "k3"))
+
+    def _spinbox_distortion(self) -> Tuple[float, ...]:
+        """k1, k2, p1, p2, k3 from the calibration fields."""
+        try:
+            return (self.k1.value(), self.k2.value(), self.p1.value(), self.p2.value(), self.k3.value())
+        except Exception:
+            return (0.0, 0.0, 0.0, 0.0, 0.0)
+
+    def _ray_map_calibration(self, intr: Intrinsics, dist) -> Tuple[Tuple[float, ...], Tuple[float, ...]]:
+        """K and distortion the undistortion map is built for.
+
+        The zoom-table sample nearest the current zoom, or the bundle's
+        calibrated K with ``dist`` when there is no table.
+        """
+        table = self._zoom_table
+        z = getattr(self._ptz_last, table.source, None) if table is not None else None
+        if z is not None:
+            base, dist0 = self._table_lens(table.nearest(z), intr.width, intr.height)
+            return (base.fx, base.fy, base.cx, base.cy), dist0
+        intr_d = self._bundle["intrinsics"]
+        return (intr_d["fx"], intr_d["fy"], intr_d["cx"], intr_d["cy"]), tuple(dist)
+
+    def _lens_ray_map(self, intr: Intrinsics, dist) -> Optional[RayMap]:
+        """Lens rays for ``intr`` and ``dist`` (k1, k2, p1, p2, k3), or None if no distortion.
+
+        The W×H undistortion map is built once per calibration (see
+        _ray_map_calibration) on a background thread and rescaled to the
+        current focal length; until it is ready rays are undistorted directly.
+        """
+        dist = distortion_coeffs(dist)
+        if not any(dist):
+            return None
+        W, H = intr.width, intr.height
+        K0, dist0 = self._ray_map_calibration(intr, dist)
+        key = calibration_key(W, H, *K0, dist0)
+        jobs = self._ray_map_jobs
+        job = jobs.get(key)
+        if job is None:
+            while len(jobs) >= 8:
+                jobs.pop(next(iter(jobs)))
+            job = jobs[key] = start_ray_map(W, H, *K0, dist0)
+        array = job.result() if job.done() and job.exception() is None else None
+        rays = RayMap(array, key, K0, dist0).rescaled(intr.fx, intr.fy, intr.cx, intr.cy, dist)
+        # Same rays as last time: keep the object so the LUT is not invalidated
+        cached = self._ray_map_cache
+        if cached is not None and cached.cache_key == rays.cache_key:
+            return cached
+        self._ray_map_cache = rays
+        return rays
+
+    def _update_ground_lut(self) -> None:
+        """Start (re)building the pixel→ground LUT if the pose has moved."""
+        if self._dtm is None:
+            return
+        try:
+            # The sampler loads in the background (see _load_dtm_path); skip
+            # the poll until it is ready instead of reading the band here.
+            dem = self._dtm.ready_sampler()
+            if dem is None:
+                self._dtm.start_sampler()
+                return
+            model = self._ptz_lens_model()
+            if model is None:
+                return
+            self._update_viewshed(dem, model[2])
+            self._ground_lut.set_ray_map(self._lens_ray_map(model[0], model[3]))
+            self._ground_lut.set_viewshed(self._current_viewshed())
+            self._ground_lut.update(*model[:3], dem)
+        except Exception:
+            pass
+
+    def _update_viewshed(self, dem, extr: Extrinsics) -> None:
+        """Start the viewshed job for the camera position if it changed.
+
+        The range image is derived from the same sweep once it finishes.
+        """
+        origin = (round(extr.x, 1), round(extr.y, 1), round(extr.z, 1))
+        key = (id(dem), origin)
+        if key == self._viewshed_key:
+            return
+        self._viewshed_key = key
+        # Cached under cache/viewsheds, keyed by the DTM version and the mount
+        cache_key = None
+        try:
+            st = os.stat(self._dtm.path)
+            cache_key = (f"{os.path.abspath(self._dtm.path)}|{st.st_size}:{st.st_mtime_ns}"
+                         f"|{origin[0]:.1f},{origin[1]:.1f},{origin[2]:.1f}")
+        except OSError:
+            pass
+        self._viewshed_job = start_viewshed(dem, (extr.x, extr.y, extr.z), cache_key=cache_key)
+        self._range_image_job = start_range_image_from_viewshed(self._viewshed_job)
+
+    def _current_range_image(self):
+        """The finished range image for the current mount, or None."""
+        job = self._range_image_job
+        if job is None or not job.done() or job.exception() is not None:
+            return None
+        return job.result()
+
+    def _current_viewshed(self):
+        """The finished viewshed for the current camera position, or None."""
+        job = self._viewshed_job
+        if job is None or not job.done() or job.exception() is not None:
+            return None
+        return job.result()
+
+    def _map_by_ptz(self, u: int, v: int, exact: bool = False) -> bool:
+        if not (self._bundle and self._ortho_layer and self._yaw_offset_deg is not None):
+            return False
+        model = self._ptz_lens_model()
+        if model is None:
+            self.lbl_status.setText("Project georef missing EPSG.")
+            return False
+        intr, ptz, extr, dist = model
+
+        o, d = image_ray(u, v, intr, ptz, extr, ray_map=self._lens_ray_map(intr, dist))
 
         # ensure origin uses orthophoto EPSG
         epsg_o = extr.epsg
         try:
             epsg_ortho = self._ortho_layer.ds.crs.to_epsg() if self._ortho_layer else None
             if epsg_ortho and epsg_o and epsg_ortho != epsg_o:
-                tr = Transformer.from_crs(f"EPSG:{epsg_o}", f"EPSG:{epsg_ortho}", always_xy=True)
+                tr = get_transformer(epsg_o, epsg_ortho)
                 ox, oy = tr.transform(o[0], o[1])
                 o = np.array([ox, oy, o[2]], dtype=float)
                 epsg_o = epsg_ortho
@@ -1810,15 +2129,22 @@ class Img2GroundModule(QtCore.QObject):
             self.lbl_status.setText("No DTM: showing azimuth only.")
             return True
 
-        class _DtmSampler:
-            def __init__(self, dtm):
-                self._dtm = dtm
-                self.meters_per_unit = getattr(dtm, "meters_per_unit", 1.0)
-            def elevation(self, x: float, y: float):
-                return self._dtm.sample(x, y)
-
-        dem = _DtmSampler(self._dtm)
-        p = intersect_ray_with_dem(o, d, dem)
+        dem = self._dtm.ready_sampler()
+        if dem is None:
+            self._dtm.start_sampler()
+            self._remove_last_pick()
+            self.lbl_status.setText("DTM still loading: showing azimuth only.")
+            return True
+        same_crs = epsg_o == extr.epsg
+        rimg = self._current_range_image() if same_crs else None
+        lut = self._ground_lut.lut_for(intr, ptz, extr, dem) if same_crs else None
+        if rimg is not None and rimg.matches(o) and rimg.covers(d):
+            p = rimg.intersect(d, dem)
+        elif lut is not None:
+            p = lut.ground_point(u, v, exact=exact)
+        else:
+            vs = self._current_viewshed() if same_crs else None
+            p = intersect_ray_with_dem(o, d, dem, viewshed=vs)
         if p is None:
             self._remove_last_pick()
             self.lbl_status.setText("Missed DTM / No intersection.")
@@ -1826,7 +2152,7 @@ class Img2GroundModule(QtCore.QObject):
         x, y, z = p
         try:
             xs, ys = self._ortho_layer.geo_to_scene(x, y)
-            tr = Transformer.from_crs(f"EPSG:{extr.epsg}", "EPSG:4326", always_xy=True)
+            tr = get_transformer(extr.epsg, 4326)
             lon, lat = tr.transform(x, y)
             self._show_pick_on_map(xs, ys, text=f"{lat:.5f},{lon:.5f}")
             self.lbl_status.setText(f"PTZ: lat={lat:.7f}, lon={lon:.7f}, alt={z:.2f}")
@@ -1839,8 +2165,7 @@ class Img2GroundModule(QtCore.QObject):
         try:
             X, Y = self._ortho_layer.scene_to_geo(xs, ys)
             epsg = self._ortho_layer.ds.crs.to_epsg()
-            from pyproj import Transformer
-            tr = Transformer.from_crs(f"EPSG:{epsg}", "EPSG:4326", always_xy=True)
+            tr = get_transformer(epsg, 4326)
             lon, lat = tr.transform(X, Y)
             self._last_geo = {"lat": float(lat), "lon": float(lon), "epsg": epsg, "X": float(X), "Y": float(Y)}
             self.lbl_status.setText(f"CALIB: lat={lat:.7f}, lon={lon:.7f} | XY(EPSG:{epsg})=({X:.2f}, {Y:.2f})")
@@ -1878,9 +2203,11 @@ class Img2GroundModule(QtCore.QObject):
 
     # ----- reset / misc -----
     def _reset_calibration(self):
-        self._H = None; self._calib_img_wh = None; self._remove_video_frame_outline()
+        self._H = None; self._H_pose = None; self._calib_img_wh = None; self._remove_video_frame_outline()
         self._hfov_deg = None; self._fx_from_hfov = None; self._yaw_offset_deg = None; self._remove_fov_wedge()
+        self._remove_footprint()
         self._remove_last_pick(); self._remove_azimuth_line()
+        self._ground_lut.invalidate()
         self.lbl_status.setText("Calibration cleared.")
 
     def _update_metrics(self):
@@ -16,6 +16,7 @@ from ui_user_module import UserModule
 from project_io import export_project, load_project
 import shared_state
 from app_state import app_state
+from crs_cache import get_transformer, warm_site
 
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self):
@@ -183,6 +184,16 @@ class MainWindow(QtWidgets.QMainWindow):
             self.prep_module.apply_bundle(bundle)
         layers = data.get("layers", {})
         self.prep_module.apply_project_layers(layers.get("dtm"), layers.get("ortho"))
+        # Pre-build the site's CRS transformers so the first clicks are fast
+        epsgs = [(bundle or {}).get("georef", {}).get("projected_epsg"),
+                 (cam_pos or {}).get("epsg")]
+        layer = getattr(self.prep_module, "_ortho_layer", None)
+        try:
+            if layer is not None:
+                epsgs.append(layer.ds.crs.to_epsg())
+        except Exception:
+            pass
+        warm_site(*epsgs)
         if cam_pos:
             try:
                 layer = getattr(self.prep_module, "_ortho_layer", None)
@@ -191,8 +202,7 @@ class MainWindow(QtWidgets.QMainWindow):
                     X, Y = float(cam_pos.get("x", 0.0)), float(cam_pos.get("y", 0.0))
                     epsg_cam = cam_pos.get("epsg")
                     if epsg_here and epsg_cam and epsg_cam != epsg_here:
-                        from pyproj import Transformer
-                        tr = Transformer.from_crs(f"EPSG:{epsg_cam}", f"EPSG:{epsg_here}", always_xy=True)
+                        tr = get_transformer(epsg_cam, epsg_here)
                         X, Y = tr.transform(X, Y)
                     xs, ys = layer.geo_to_scene(X, Y)
                     self.prep_module.map.set_marker(xs, ys)
@@ -4,20 +4,216 @@ from PySide6 import QtCore, QtWidgets, QtGui
 import numpy as np
 
 
+# (dtype, channels) -> QImage format whose memory layout matches the array's
+_QIMAGE_FORMATS = {
+    (np.dtype(np.uint8), 1): QtGui.QImage.Format_Grayscale8,
+    (np.dtype(np.uint8), 3): QtGui.QImage.Format_RGB888,
+    (np.dtype(np.uint8), 4): QtGui.QImage.Format_RGBA8888,
+    (np.dtype(np.uint16), 1): QtGui.QImage.Format_Grayscale16,
+    (np.dtype(np.uint16), 4): QtGui.QImage.Format_RGBA64,
+}
+
+
+class ArrayImage(QtGui.QImage):
+    """
+    QImage שמצביע ישירות על הזיכרון של numpy array.
+
+    ``array`` keeps the pixels alive for as long as this image exists.  The
+    image does not own a copy, so it must be treated as read-only; use
+    ``QImage.copy()`` for an image that outlives the wrapper or is painted on.
+    """
+
+    def __init__(self, array: np.ndarray, buffer: np.ndarray, w: int, h: int, stride: int, fmt):
+        super().__init__(buffer.data, w, h, stride, fmt)
+        self.array = array
+        self._buffer = buffer
+
+
 def numpy_to_qimage(arr: np.ndarray) -> QtGui.QImage:
     """
-    המרה של numpy array ל-QImage.
-    תומך ב-Gray (HxW) וב-RGB (HxWx3, uint8).
+    המרה של numpy array ל-QImage ללא העתקה.
+    תומך ב-Gray (HxW) וב-RGB/RGBA (HxWx3, HxWx4), uint8 או uint16 (Gray/RGBA).
+
+    Rows may be strided (e.g. a crop or every other row of a larger image) as
+    long as the pixels within a row are packed; only other layouts (negative
+    or pixel strides, non-native byte order) are copied first.  The result is
+    an :class:`ArrayImage` that references ``arr``.
     """
     if arr.ndim == 2:
-        h, w = arr.shape
-        qimg = QtGui.QImage(arr.data, w, h, w, QtGui.QImage.Format_Grayscale8)
-        return qimg.copy()
-    if arr.ndim == 3 and arr.shape[2] == 3:
-        h, w, _ = arr.shape
-        qimg = QtGui.QImage(arr.data, w, h, 3 * w, QtGui.QImage.Format_RGB888)
-        return qimg.copy()
-    raise ValueError("Unsupported ndarray shape for qimage")
+        arr = arr[:, :, None]
+    if arr.ndim != 3:
+        raise ValueError("Unsupported ndarray shape for qimage")
+    h, w, ch = arr.shape
+    fmt = _QIMAGE_FORMATS.get((arr.dtype.newbyteorder("="), ch))
+    if fmt is None:
+        raise ValueError(f"Unsupported ndarray for qimage: {arr.dtype} with {ch} channels")
+    if h == 0 or w == 0:
+        return QtGui.QImage()
+    item = arr.dtype.itemsize
+    packed = arr.strides[2] == item and arr.strides[1] == ch * item and arr.strides[0] >= w * ch * item
+    if not (packed and arr.dtype.isnative):
+        arr = np.ascontiguousarray(arr, dtype=arr.dtype.newbyteorder("="))
+    stride = arr.strides[0] if h > 1 else w * ch * item
+    # One flat byte view from the first pixel to the end of the last row
+    span = (h - 1) * stride + w * ch * item
+    flat = np.lib.stride_tricks.as_strided(arr.reshape(h, w * ch).view(np.uint8), shape=(span,), strides=(1,))
+    return ArrayImage(arr, flat, w, h, stride, fmt)
+
+
+def numpy_to_qpixmap(arr: np.ndarray) -> QtGui.QPixmap:
+    """QPixmap of ``arr``; the pixmap upload is the only copy made."""
+    return QtGui.QPixmap.fromImage(numpy_to_qimage(arr))
+
+
+class TiledRasterItem(QtWidgets.QGraphicsItem):
+    """
+    שכבת אריחים ברזולוציה מלאה מעל תמונת ה-overview של RasterLayer.
+
+    The item lives in the overview's pixel coordinates (the scene coordinates
+    used by RasterLayer.scene_to_geo/geo_to_scene), usually as a child of the
+    overview pixmap item so it follows its visibility and removal.  When the
+    view zooms in beyond the overview's resolution, the tiles of the matching
+    pyramid level (raster_tiles.TileSource) that intersect the exposed area
+    are drawn.  Tiles not decoded yet are read on the raster worker pool and
+    appear as they arrive; requests for tiles that scrolled out of view are
+    dropped.
+    """
+
+    def __init__(self, layer, parent=None):
+        super().__init__(parent)
+        self._source = layer.tile_source()
+        self._sx, self._sy = layer.over_scale
+        self._rect = QtCore.QRectF(0, 0, self._source.width / self._sx, self._source.height / self._sy)
+        self._pending = {}  # (level, tx, ty) -> Future
+        self._poll = QtCore.QTimer()
+        self._poll.setInterval(30)
+        self._poll.timeout.connect(self._collect)
+        self.setFlag(QtWidgets.QGraphicsItem.ItemUsesExtendedStyleOption, True)
+        self.setZValue(0.5)
+
+    def boundingRect(self) -> QtCore.QRectF:
+        return self._rect
+
+    def level_for(self, painter: QtGui.QPainter) -> int:
+        """Pyramid level for the painter's zoom, or -1 if the overview is sharp enough."""
+        lod = QtWidgets.QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        level = self._source.level_for(lod / max(self._sx, self._sy))
+        return level if (1 << level) < max(self._sx, self._sy) else -1
+
+    def paint(self, painter: QtGui.QPainter, option, widget=None):
+        level = self.level_for(painter)
+        wanted = set()
+        r = option.exposedRect.intersected(self._rect)
+        inv, ok = painter.worldTransform().inverted()
+        if ok and painter.device() is not None:
+            # exposedRect may cover the whole item; never read beyond the device
+            r = r.intersected(inv.mapRect(QtCore.QRectF(painter.device().rect())))
+        if level >= 0 and not r.isEmpty():
+            src = self._source
+            for tx, ty in src.tiles_in(level, r.left() * self._sx, r.top() * self._sy,
+                                       r.right() * self._sx, r.bottom() * self._sy):
+                img = src.cached(level, tx, ty)
+                if img is None:
+                    wanted.add((level, tx, ty))
+                    continue
+                x0, y0, x1, y1 = src.tile_rect(level, tx, ty)
+                target = QtCore.QRectF(x0 / self._sx, y0 / self._sy, (x1 - x0) / self._sx, (y1 - y0) / self._sy)
+                painter.drawImage(target, numpy_to_qimage(img))
+        self._request(wanted)
+
+    def _request(self, wanted) -> None:
+        import raster_loader
+        for key in [k for k in self._pending if k not in wanted]:
+            if self._pending[key].cancel():
+                del self._pending[key]
+        for key in wanted:
+            if key not in self._pending:
+                self._pending[key] = raster_loader.submit_tile(self._source.tile, *key)
+        if self._pending and not self._poll.isActive():
+            self._poll.start()
+
+    def _collect(self) -> None:
+        done = [k for k, f in self._pending.items() if f.done()]
+        for k in done:
+            del self._pending[k]
+        if not self._pending:
+            self._poll.stop()
+        try:
+            if done and self.scene() is not None:
+                self.update()
+        except RuntimeError:  # the scene was cleared and the item deleted
+            self._poll.stop()
+            self._pending.clear()
+
+
+def attach_tiles(pixmap_item: QtWidgets.QGraphicsItem, layer):
+    """Add a TiledRasterItem for ``layer`` under its overview pixmap; None if unavailable."""
+    try:
+        return TiledRasterItem(layer, parent=pixmap_item)
+    except Exception as e:
+        print(f"[MapTiles] full-resolution tiles unavailable: {e}")
+        return None
+
+
+def preview_item(preview) -> QtWidgets.QGraphicsPixmapItem:
+    """Pixmap item showing a raster_loader.Preview stretched over its final overview's scene rect."""
+    img = preview.image
+    item = QtWidgets.QGraphicsPixmapItem(numpy_to_qpixmap(img))
+    item.setTransform(QtGui.QTransform.fromScale(preview.size[0] / img.shape[1], preview.size[1] / img.shape[0]))
+    item.setTransformationMode(QtCore.Qt.SmoothTransformation)
+    return item
+
+
+class RasterLoadWatcher(QtCore.QObject):
+    """
+    מעביר תוצאות של raster_loader.RasterLoad ל-thread של Qt.
+
+    ``preview_ready`` fires with the Preview, then ``layer_ready`` with the
+    RasterLayer (borrowed from dataset_pool; the receiver owns it and releases
+    it when replaced) or ``failed`` with the error text.  Nothing fires
+    after :meth:`cancel`.
+    """
+    preview_ready = QtCore.Signal(object)
+    layer_ready = QtCore.Signal(object)
+    failed = QtCore.Signal(str)
+
+    def __init__(self, load, parent=None):
+        super().__init__(parent)
+        self.load = load
+        self._preview_done = False
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(30)
+        self._timer.timeout.connect(self._poll)
+        self._timer.start()
+
+    @property
+    def path(self) -> str:
+        return self.load.path
+
+    def active(self) -> bool:
+        return self._timer.isActive()
+
+    def cancel(self) -> None:
+        self._timer.stop()
+        self.load.cancel()
+
+    def _poll(self) -> None:
+        load = self.load
+        if load.cancelled:
+            self._timer.stop(); return
+        if not self._preview_done and load.preview.done():
+            self._preview_done = True
+            if load.preview.exception() is None and load.preview.result() is not None and not load.layer.done():
+                self.preview_ready.emit(load.preview.result())
+        if not load.layer.done():
+            return
+        self._timer.stop()
+        err = load.layer.exception()
+        if err is not None:
+            self.failed.emit(str(err)); return
+        layer = load.take()
+        if layer is not None:
+            self.layer_ready.emit(layer)
 
 
 class MapView(QtWidgets.QGraphicsView):
@@ -13,6 +13,20 @@ from geom3d import CameraIntrinsics, CameraPose, GeoRef, geographic_to_local
 from app_state import app_state
 import shared_state
 from event_bus import bus
+from crs_cache import get_transformer
+import dataset_pool
+from raster_loader import start_raster_load
+
+
+def _remove_item(item) -> bool:
+    """Remove a graphics item from its scene; False if it is gone already."""
+    try:
+        if item is not None and item.scene() is not None:
+            item.scene().removeItem(item)
+            return True
+    except RuntimeError:
+        pass
+    return False
 
 
 class PrepModule(QtCore.QObject):
@@ -25,8 +39,14 @@ class PrepModule(QtCore.QObject):
         self._vlc = vlc_instance
         self._map_layer = None       # RasterLayer (DTM)
         self._ortho_layer = None     # RasterLayer (Ortho)
+        self._ortho_ref = None       # Ortho layer borrowed from dataset_pool
         self._dtm_pixmap = None
         self._ortho_pixmap = None
+        self._ortho_preview = None   # coarse ortho shown while loading
+        self._dtm_is_preview = False # _dtm_pixmap shows a coarse preview
+        self._dtm_load = None        # RasterLoadWatcher of the DTM map
+        self._ortho_load = None      # RasterLoadWatcher of the orthophoto
+        self._ortho_broadcast = False
         self._root = self._build_ui()
 
         shared_state.signal_camera_changed.connect(
@@ -182,18 +202,16 @@ class PrepModule(QtCore.QObject):
 
     def _read_epsg_from_dtm(self):
         try:
-            from dtm import DTM
             p = self.ed_dtm.text().strip()
             if not p:
                 QtWidgets.QMessageBox.information(None, "DTM", "Choose a DTM (GeoTIFF) first."); return
-            d = DTM(p)
-            epsg = d.info.crs_epsg
+            with dataset_pool.borrow_dtm(p) as d:
+                epsg = d.info.crs_epsg
             if epsg:
                 self.ed_epsg.setText(str(epsg))
                 self._log(f"DTM EPSG detected: {epsg}")
             else:
                 self._log("DTM EPSG not found in file.")
-            d.close()
             self._publish_layers(srs=str(epsg) if epsg else None)
         except Exception as e:
             QtWidgets.QMessageBox.warning(None, "DTM", f"Failed to read EPSG: {e}")
@@ -201,22 +219,19 @@ class PrepModule(QtCore.QObject):
 
     def _origin_from_dem_center(self):
         try:
-            from dtm import DTM
-            from pyproj import Transformer
             p = self.ed_dtm.text().strip()
             if not p:
                 QtWidgets.QMessageBox.information(None, "DTM", "Choose a DTM (GeoTIFF) first."); return
-            d = DTM(p)
-            l,b,r,t = d.info.bounds
+            with dataset_pool.borrow_dtm(p) as d:
+                l,b,r,t = d.info.bounds
+                epsg = d.info.crs_epsg
             cx = 0.5*(l+r); cy = 0.5*(b+t)
-            epsg = d.info.crs_epsg
             if epsg is None:
-                QtWidgets.QMessageBox.information(None, "DTM", "GeoTIFF has no CRS; cannot compute lat/lon."); d.close(); return
-            tr = Transformer.from_crs(f"EPSG:{epsg}", "EPSG:4326", always_xy=True)
+                QtWidgets.QMessageBox.information(None, "DTM", "GeoTIFF has no CRS; cannot compute lat/lon."); return
+            tr = get_transformer(epsg, 4326)
             lon, lat = tr.transform(cx, cy)
             self.ed_lon.setValue(lon); self.ed_lat.setValue(lat)
             self._log(f"Origin set from DEM center: lat={lat:.7f}, lon={lon:.7f}")
-            d.close()
         except Exception as e:
             QtWidgets.QMessageBox.warning(None, "DTM", f"Failed to set origin: {e}")
 
@@ -237,28 +252,62 @@ class PrepModule(QtCore.QObject):
 
     def _ensure_base_map(self):
         try:
-            from raster_layer import RasterLayer
-            from ui_map_tools import numpy_to_qimage
+            from ui_map_tools import RasterLoadWatcher
         except Exception as e:
             self._log(f"Map tools missing: {e}"); return
         p = self.ed_dtm.text().strip()
         if not p:
             return
 
+        self._ensure_scene()
+        w = self._dtm_load
+        if self._map_layer is None and not (w is not None and w.active() and w.path == p):
+            if w is not None:
+                w.cancel()
+            # Decode in the background; a coarse preview is shown meanwhile
+            w = self._dtm_load = RasterLoadWatcher(start_raster_load(p, max_size=2048), self)
+            w.preview_ready.connect(self._show_dtm_preview)
+            w.layer_ready.connect(self._on_dtm_layer)
+            w.failed.connect(lambda msg: self._log(f"Failed to load base DTM map: {msg}"))
+        self._update_layer_visibility()
+
+    def _show_dtm_preview(self, preview) -> None:
+        from ui_map_tools import preview_item
         sc = self._ensure_scene()
-        if self._map_layer is None:
-            try:
-                self._map_layer = RasterLayer(p, max_size=2048)
-                img = numpy_to_qimage(self._map_layer.downsampled_image())
-                self._dtm_pixmap = QtWidgets.QGraphicsPixmapItem(QtGui.QPixmap.fromImage(img))
-                self._dtm_pixmap.setZValue(0)
-                sc.addItem(self._dtm_pixmap)
-                self.map.setSceneRect(self._dtm_pixmap.boundingRect())
+        _remove_item(self._dtm_pixmap)
+        self._dtm_pixmap = preview_item(preview)
+        self._dtm_pixmap.setZValue(0)
+        self._dtm_is_preview = True
+        sc.addItem(self._dtm_pixmap)
+        self.map.setSceneRect(QtCore.QRectF(0, 0, *preview.size))
+        self.map.fit()
+        self._update_layer_visibility()
+
+    def _on_dtm_layer(self, layer) -> None:
+        from ui_map_tools import attach_tiles, numpy_to_qpixmap
+        try:
+            sc = self._ensure_scene()
+            had_preview = _remove_item(self._dtm_pixmap) and self._dtm_is_preview
+            self._dtm_is_preview = False
+            dataset_pool.release(self._map_layer)
+            self._map_layer = layer
+            self._dtm_pixmap = QtWidgets.QGraphicsPixmapItem(numpy_to_qpixmap(layer.downsampled_image()))
+            self._dtm_pixmap.setZValue(0)
+            sc.addItem(self._dtm_pixmap)
+            attach_tiles(self._dtm_pixmap, layer)
+            self.map.setSceneRect(self._dtm_pixmap.boundingRect())
+            if not had_preview:
                 self.map.fit()
-            except Exception as e:
-                self._log(f"Failed to load base DTM map: {e}")
+        except Exception as e:
+            self._log(f"Failed to load base DTM map: {e}")
         self._update_layer_visibility()
 
+    def _cancel_loads(self) -> None:
+        for w in (self._dtm_load, self._ortho_load):
+            if w is not None:
+                w.cancel()
+        self._dtm_load = self._ortho_load = None
+
     def _update_layer_visibility(self):
         def _safe_visible(item, flag):
             try:
@@ -280,8 +329,7 @@ class PrepModule(QtCore.QObject):
             X, Y = layer.scene_to_geo(xs, ys)
             epsg_layer = layer.ds.crs.to_epsg()
             # למעבר לערכים מקומיים (לשדות X/Y בטופס)
-            from pyproj import Transformer
-            tr_to_ll = Transformer.from_crs(f"EPSG:{epsg_layer}", "EPSG:4326", always_xy=True) if epsg_layer else None
+            tr_to_ll = get_transformer(epsg_layer, 4326) if epsg_layer else None
             if tr_to_ll is None:
                 QtWidgets.QMessageBox.information(None, "CRS", "Layer CRS unknown; cannot map to lat/lon.")
                 return
@@ -297,13 +345,12 @@ class PrepModule(QtCore.QObject):
             if self.chk_auto_z.isChecked() and self._map_layer is not None:
                 epsg_dtm = self._map_layer.ds.crs.to_epsg()
                 if epsg_layer != epsg_dtm:
-                    tr_to_dtm = Transformer.from_crs(f"EPSG:{epsg_layer}", f"EPSG:{epsg_dtm}", always_xy=True)
+                    tr_to_dtm = get_transformer(epsg_layer, epsg_dtm)
                     Xd, Yd = tr_to_dtm.transform(X, Y)
                 else:
                     Xd, Yd = X, Y
-                from dtm import DTM
-                d = DTM(self._map_layer.path)
-                z = d.sample(Xd, Yd); d.close()
+                with dataset_pool.borrow_dtm(self._map_layer.path) as d:
+                    z = d.sample(Xd, Yd)
                 if z is not None:
                     self.spn_z.setValue(z)
 
@@ -374,7 +421,7 @@ class PrepModule(QtCore.QObject):
         if dtm_path:
             self.ed_dtm.setText(dtm_path)
             shared_state.dtm_path = dtm_path
-            self._map_layer = None
+            dataset_pool.release(self._map_layer); self._map_layer = None
             try:
                 self._ensure_base_map()
             except Exception as e:
@@ -386,15 +433,37 @@ class PrepModule(QtCore.QObject):
 
     def _load_orthophoto_path(self, path: str, *, broadcast: bool = True):
         try:
-            from raster_layer import RasterLayer
-            from ui_map_tools import numpy_to_qimage
+            from ui_map_tools import RasterLoadWatcher
         except Exception as e:
             QtWidgets.QMessageBox.warning(None, "Orthophoto", f"Missing map tools: {e}")
             return
+        w = self._ortho_load
+        if w is not None and w.active() and w.path == path:
+            self._ortho_broadcast = self._ortho_broadcast or broadcast
+            return
+        if w is not None:
+            w.cancel()
+        self._ortho_broadcast = broadcast
+        w = self._ortho_load = RasterLoadWatcher(start_raster_load(path, max_size=2048), self)
+        w.preview_ready.connect(self._show_ortho_preview)
+        w.layer_ready.connect(self._on_ortho_layer)
+        w.failed.connect(lambda msg: QtWidgets.QMessageBox.warning(None, "Orthophoto", f"Failed to load: {msg}"))
+
+    def _show_ortho_preview(self, preview) -> None:
+        from ui_map_tools import preview_item
+        sc = self._ensure_scene()
+        _remove_item(self._ortho_preview)
+        self._ortho_preview = preview_item(preview)
+        self._ortho_preview.setZValue(1)
+        sc.addItem(self._ortho_preview)
+
+    def _on_ortho_layer(self, layer) -> None:
+        path = layer.path
         try:
-            layer = RasterLayer(path, max_size=2048)
+            dataset_pool.release(self._ortho_ref); self._ortho_ref = layer
             self.apply_ortho(layer)
-            if broadcast:
+            # Other tabs hear about the orthophoto only once it is ready
+            if self._ortho_broadcast:
                 self._publish_layers(ortho=path)
                 alias = getattr(app_state.current_camera, "alias", None) or "(default)"
                 bus.signal_ortho_changed.emit(alias, layer)
@@ -408,14 +477,13 @@ class PrepModule(QtCore.QObject):
 
     def apply_ortho(self, layer) -> None:
         try:
-            from ui_map_tools import numpy_to_qimage
+            from ui_map_tools import attach_tiles, numpy_to_qpixmap
         except Exception as e:
             QtWidgets.QMessageBox.warning(None, "Orthophoto", f"Missing map tools: {e}")
             return
         try:
             self._ortho_layer = layer
-            img = numpy_to_qimage(layer.downsampled_image())
-            pix = QtGui.QPixmap.fromImage(img)
+            pix = numpy_to_qpixmap(layer.downsampled_image())
             sc = self._ensure_scene()
             try:
                 n_before = len(sc.items())
@@ -426,6 +494,7 @@ class PrepModule(QtCore.QObject):
             ortho = self._ortho_pixmap
             self._dtm_pixmap = None
             self._ortho_pixmap = None
+            self._ortho_preview = None
             try:
                 sc.clear()
             finally:
@@ -439,6 +508,7 @@ class PrepModule(QtCore.QObject):
             self._ortho_pixmap = QtWidgets.QGraphicsPixmapItem(pix)
             self._ortho_pixmap.setZValue(1)
             sc.addItem(self._ortho_pixmap)
+            attach_tiles(self._ortho_pixmap, layer)
             shared_state.orthophoto_path = layer.path
             self._update_layer_visibility()
             self._log(f"Orthophoto loaded (EPSG={layer.ds.crs.to_epsg()})")
@@ -459,8 +529,7 @@ class PrepModule(QtCore.QObject):
             epsg_cam = cam.get("epsg")
             print(f"[Prep._draw_shared_camera_marker] cam({X:.3f},{Y:.3f}) epsg_cam={epsg_cam} → epsg_here={epsg_here}")
             if epsg_here and epsg_cam and epsg_cam != epsg_here:
-                from pyproj import Transformer
-                tr = Transformer.from_crs(f"EPSG:{epsg_cam}", f"EPSG:{epsg_here}", always_xy=True)
+                tr = get_transformer(epsg_cam, epsg_here)
                 X, Y = tr.transform(X, Y)
                 print(f"[Prep._draw_shared_camera_marker] transformed to ortho CRS → ({X:.3f},{Y:.3f})")
             xs, ys = self._ortho_layer.geo_to_scene(X, Y)
@@ -510,6 +579,7 @@ class PrepModule(QtCore.QObject):
     def _apply_layers_for(self, alias: str | None) -> None:
         if not alias:
             return
+        self._cancel_loads()  # layers of the previous camera are no longer wanted
         layers = shared_state.layers_for_camera.get(alias)
         if layers:
             self._apply_layers(layers)
@@ -520,7 +590,7 @@ class PrepModule(QtCore.QObject):
         if dtm:
             self.ed_dtm.setText(dtm)
             shared_state.dtm_path = dtm
-            self._map_layer = None
+            dataset_pool.release(self._map_layer); self._map_layer = None
             self._ensure_base_map()
         if ortho:
             self.ed_ortho.setText(ortho)
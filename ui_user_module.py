@@ -22,11 +22,14 @@ from PySide6 import QtCore, QtWidgets, QtGui
 from ui_img2ground_module import SinglePickDialog
 
 from ui_common import VlcVideoWidget
-from ui_map_tools import MapView, numpy_to_qimage
+from ui_map_tools import MapView, RasterLoadWatcher, attach_tiles, numpy_to_qpixmap, preview_item
 from raster_layer import RasterLayer
+import dataset_pool
+from raster_loader import start_raster_load
 from app_state import app_state
 import shared_state
 from event_bus import bus
+from crs_cache import get_transformer
 
 
 class UserTab(QtWidgets.QWidget):
@@ -41,6 +44,7 @@ class UserTab(QtWidgets.QWidget):
         self._last_pick_item: QtWidgets.QGraphicsItem | None = None
         self._last_pick_label: QtWidgets.QGraphicsSimpleTextItem | None = None
         self._ortho_layer: RasterLayer | None = None
+        self._ortho_load: RasterLoadWatcher | None = None
         self._dtm_path: str | None = None
 
         # ----- toolbar -----
@@ -135,21 +139,43 @@ class UserTab(QtWidgets.QWidget):
     def on_load_layers(self, dtm: str | None, ortho: str | None) -> None:
         shared_state.dtm_path = dtm or None
         shared_state.orthophoto_path = ortho or None
+        if dtm:
+            self._dtm_path = dtm
+        w = self._ortho_load
+        if w is not None and not (ortho and w.active() and w.path == ortho):
+            w.cancel()
+            self._ortho_load = None
+        if ortho and self._ortho_load is None:
+            # Decode in the background; a coarse preview is shown meanwhile
+            w = self._ortho_load = RasterLoadWatcher(start_raster_load(ortho, max_size=2048), self)
+            w.preview_ready.connect(self._show_ortho_preview)
+            w.layer_ready.connect(self._on_ortho_layer)
+            w.failed.connect(lambda msg: self._toast(f"Layer load failed: {msg}", error=True))
+        elif not ortho:
+            self._toast("Layers loaded")
+
+    def _show_ortho_preview(self, preview) -> None:
+        if self._ortho_layer is not None:
+            return  # keep showing the previous orthophoto until the new one is ready
+        sc = self.map.scene() or QtWidgets.QGraphicsScene()
+        sc.clear()
+        sc.addItem(preview_item(preview))
+        self.map.setScene(sc)
+        self.map.fit()
+
+    def _on_ortho_layer(self, layer) -> None:
         try:
-            if ortho:
-                self._ortho_layer = RasterLayer(ortho, max_size=2048)
-                img = numpy_to_qimage(self._ortho_layer.downsampled_image())
-                pix = QtGui.QPixmap.fromImage(img)
-                sc = self.map.scene() or QtWidgets.QGraphicsScene()
-                sc.clear()
-                sc.addPixmap(pix)
-                self.map.setScene(sc)
-                self.map.fit()
-                QtCore.QTimer.singleShot(50, self._draw_camera_marker)
-                if not self._az_item:
-                    self.on_toggle_azimuth()
-            if dtm:
-                self._dtm_path = dtm
+            dataset_pool.release(self._ortho_layer)
+            self._ortho_layer = layer
+            pix = numpy_to_qpixmap(self._ortho_layer.downsampled_image())
+            sc = self.map.scene() or QtWidgets.QGraphicsScene()
+            sc.clear()
+            attach_tiles(sc.addPixmap(pix), layer)
+            self.map.setScene(sc)
+            self.map.fit()
+            QtCore.QTimer.singleShot(50, self._draw_camera_marker)
+            if not self._az_item:
+                self.on_toggle_azimuth()
             self._toast("Layers loaded")
         except Exception as e:  # pragma: no cover - UI feedback
             self._toast(f"Layer load failed: {e}", error=True)
@@ -199,8 +225,7 @@ class UserTab(QtWidgets.QWidget):
             epsg_cam = cam.get("epsg")
             print(f"[User._draw_camera_marker] cam({X:.3f},{Y:.3f}) epsg_cam={epsg_cam} → epsg_here={epsg_here}")
             if epsg_here and epsg_cam and epsg_cam != epsg_here:
-                from pyproj import Transformer
-                tr = Transformer.from_crs(f"EPSG:{epsg_cam}", f"EPSG:{epsg_here}", always_xy=True)
+                tr = get_transformer(epsg_cam, epsg_here)
                 X, Y = tr.transform(X, Y)
                 print(f"[User._draw_camera_marker] transformed to ortho CRS → ({X:.3f},{Y:.3f})")
             xs, ys = self._ortho_layer.geo_to_scene(X, Y)
@@ -283,10 +308,9 @@ class UserTab(QtWidgets.QWidget):
         uu, vv = dlg.picked_uv()
         xs, ys = float(uu), float(vv)
         try:
-            from pyproj import Transformer
             X, Y = self._ortho_layer.scene_to_geo(xs, ys)
             epsg = self._ortho_layer.ds.crs.to_epsg()
-            tr = Transformer.from_crs(f"EPSG:{epsg}", "EPSG:4326", always_xy=True)
+            tr = get_transformer(epsg, 4326)
             lon, lat = tr.transform(X, Y)
             self._last_pick = (lon, lat)
             self._show_pick_on_map(xs, ys, text=f"{lat:.5f},{lon:.5f}")